@@ -0,0 +1,123 @@
+"""Bulk BaseService primitives vs. looped single-row calls.
+
+Runs against DATABASE_URL on a scratch table that is dropped afterwards:
+
+    python -m benchmarks.bench_bulk_crud --rows 5000
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import Column, Integer, String, select
+from sqlalchemy.orm import declarative_base
+
+from shared.database import TimestampMixin, engine, SessionLocal
+from shared.service import BaseService
+
+BenchBase = declarative_base()
+
+
+class BenchRow(BenchBase, TimestampMixin):
+    __tablename__ = "bench_bulk_rows"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    value = Column(Integer, nullable=False)
+
+
+service = BaseService(BenchRow)
+
+
+async def timed(label: str, rows: int, run: Callable[[], Awaitable[None]]) -> Tuple[str, float]:
+    started = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {elapsed * 1000:10.1f} ms  {rows / elapsed:12.0f} rows/s")
+    return label, elapsed
+
+
+async def bench(rows: int) -> None:
+    async with engine.begin() as connection:
+        await connection.run_sync(BenchBase.metadata.drop_all)
+        await connection.run_sync(BenchBase.metadata.create_all)
+
+    payload = [{"id": i, "name": f"row-{i}", "value": i} for i in range(1, rows + 1)]
+    ids = [row["id"] for row in payload]
+    results: List[Tuple[str, float, float]] = []
+
+    try:
+        for operation in ("create", "get", "update", "upsert", "delete"):
+            print(operation)
+            async with SessionLocal() as db:
+                if operation != "create":
+                    await service.create_many(db, payload)
+
+                async def looped():
+                    if operation == "create":
+                        for row in payload:
+                            await service.create(db, **row)
+                    elif operation == "get":
+                        for row_id in ids:
+                            await service.get(db, row_id)
+                    elif operation == "update":
+                        for row_id in ids:
+                            await service.update(db, row_id, value=0)
+                    elif operation == "upsert":
+                        # What callers do without upsert_many: read, then update or insert
+                        for row in payload:
+                            if await service.get(db, row["id"]):
+                                await service.update(db, row["id"], value=row["value"] + 1)
+                            else:
+                                await service.create(db, **row)
+                    else:
+                        for row_id in ids:
+                            await service.delete(db, row_id)
+
+                _, loop_time = await timed("looped single-row", rows, looped)
+                await db.rollback()
+
+            async with SessionLocal() as db:
+                if operation != "create":
+                    await service.create_many(db, payload)
+
+                async def bulk():
+                    if operation == "create":
+                        await service.create_many(db, payload)
+                    elif operation == "get":
+                        await service.get_many(db, ids)
+                    elif operation == "update":
+                        await service.update_many(db, [BenchRow.id <= rows], {"value": 0})
+                    elif operation == "upsert":
+                        await service.upsert_many(
+                            db, [{**row, "value": row["value"] + 1} for row in payload]
+                        )
+                    else:
+                        await service.delete_many(db, ids)
+
+                _, bulk_time = await timed(f"{operation}_many", rows, bulk)
+                remaining = (await db.execute(select(BenchRow.id).limit(1))).first()
+                assert (remaining is None) == (operation == "delete")
+                await db.rollback()
+
+            results.append((operation, loop_time, bulk_time))
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(BenchBase.metadata.drop_all)
+        await engine.dispose()
+
+    print()
+    print(f"{'operation':<10} {'looped ms':>12} {'bulk ms':>12} {'speedup':>9}")
+    for operation, loop_time, bulk_time in results:
+        print(f"{operation:<10} {loop_time * 1000:12.1f} {bulk_time * 1000:12.1f} {loop_time / bulk_time:8.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(bench(args.rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Hot queries as prepared statements vs. the ORM path.
+
+Runs the user lookup, the sensor ownership check and the measurement insert
+both ways, with a fresh session per call like a request gets, and reports
+wall and CPU time per call. Rows are created in a transaction that is rolled
+back at the end:
+
+    python -m benchmarks.bench_hot_queries --calls 5000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+# The apps import every model, so all relationships can be resolved
+import services.monitoring.main  # noqa: F401
+from services.auth.service import USER_BY_USERNAME, UserService
+from services.monitoring.service import INSERT_MEASUREMENT, SENSOR_OWNER, MeasurementService, SensorService
+from shared.database import SQLALCHEMY_DATABASE_URL, DatabaseSettings, create_engine_from_settings
+
+user_service = UserService()
+sensor_service = SensorService()
+measurement_service = MeasurementService()
+
+
+async def timed(
+    connection: AsyncConnection, calls: int, call: Callable[[AsyncSession], Awaitable[object]]
+) -> Tuple[float, float]:
+    """Wall and CPU microseconds per call"""
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(calls):
+        async with AsyncSession(bind=connection, expire_on_commit=False) as db:
+            assert await call(db) is not None
+    return (
+        (time.perf_counter() - wall) / calls * 1e6,
+        (time.process_time() - cpu) / calls * 1e6,
+    )
+
+
+async def bench(url: str, calls: int) -> None:
+    engine = create_engine_from_settings(url, DatabaseSettings(pool_size=1, max_overflow=0))
+    try:
+        async with engine.connect() as connection:
+            transaction = await connection.begin()
+            async with AsyncSession(bind=connection) as db:
+                user = await user_service.create(
+                    db, email="bench-hot@example.com", username="bench-hot", hashed_password="x" * 60,
+                    is_active=True, is_superuser=False,
+                )
+                sensor = await sensor_service.create(
+                    db, name="bench", sensor_type="temperature", is_active=True, user_id=user.id,
+                )
+
+            cases = [
+                (
+                    "user_by_username",
+                    lambda db: user_service.get_user_by_username(db, "bench-hot"),
+                    lambda db: USER_BY_USERNAME.fetchrow(db, "bench-hot"),
+                ),
+                (
+                    "sensor_owner",
+                    lambda db: sensor_service.get(db, sensor.id),
+                    lambda db: SENSOR_OWNER.fetchrow(db, sensor.id),
+                ),
+                (
+                    "insert_measurement",
+                    lambda db: measurement_service.create(db, sensor_id=sensor.id, value=34.5, battery_level=80.0),
+                    lambda db: INSERT_MEASUREMENT.fetchrow(db, sensor.id, 34.5, 80.0, datetime.utcnow()),
+                ),
+            ]
+            print(f"{calls} calls each, microseconds per call")
+            print(f"{'query':<20} {'orm wall':>9} {'orm cpu':>9} {'hot wall':>9} {'hot cpu':>9} {'cpu saved':>10}")
+            for name, orm, hot in cases:
+                # Warm-up: compiled statement cache on one side, prepared statement on the other
+                await timed(connection, 10, orm)
+                await timed(connection, 10, hot)
+                orm_wall, orm_cpu = await timed(connection, calls, orm)
+                hot_wall, hot_cpu = await timed(connection, calls, hot)
+                print(
+                    f"{name:<20} {orm_wall:>9.1f} {orm_cpu:>9.1f} {hot_wall:>9.1f} {hot_cpu:>9.1f}"
+                    f" {1 - hot_cpu / orm_cpu:>9.0%}"
+                )
+            await transaction.rollback()
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--url", default=SQLALCHEMY_DATABASE_URL)
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Lean projection reads vs. loading ORM entities for list endpoints.
+
+Measures time and memory per row for fetching and serializing a measurement
+list, on a scratch table that is dropped afterwards:
+
+    python -m benchmarks.bench_lean_reads --rows 10000
+"""
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Tuple
+
+from sqlalchemy import Column, Float, Integer, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+
+from services.monitoring.schemas import Measurement
+from shared.database import SQLALCHEMY_DATABASE_URL, TimestampMixin
+from shared.responses import respond, respond_trusted
+from shared.service import BaseService
+
+BenchBase = declarative_base()
+
+
+class BenchMeasurement(BenchBase, TimestampMixin):
+    __tablename__ = "bench_lean_measurements"
+
+    id = Column(Integer, primary_key=True)
+    sensor_id = Column(Integer, nullable=False, index=True)
+    value = Column(Float)
+    battery_level = Column(Float)
+
+
+service = BaseService(BenchMeasurement)
+
+
+async def entities(db: AsyncSession, rows: int) -> Tuple[list, Callable[[], bytes]]:
+    query = select(BenchMeasurement).filter(BenchMeasurement.sensor_id == 1).order_by(
+        BenchMeasurement.created_at.desc()
+    ).limit(rows)
+    result = (await db.execute(query)).scalars().all()
+    return result, lambda: respond(List[Measurement], result).body
+
+
+async def lean(db: AsyncSession, rows: int) -> Tuple[list, Callable[[], bytes]]:
+    query = service.select_fields(Measurement).filter(BenchMeasurement.sensor_id == 1).order_by(
+        BenchMeasurement.created_at.desc()
+    ).limit(rows)
+    result = await service.get_rows(db, query)
+    return result, lambda: respond_trusted(Measurement, result).body
+
+
+async def measure(
+    session_factory, rows: int, repeat: int,
+    fetch: Callable[[AsyncSession, int], Awaitable[Tuple[list, Callable[[], bytes]]]],
+) -> Tuple[float, float, float]:
+    """Best fetch time, best fetch+serialize time and bytes retained per row while the result is held"""
+    fetch_times, total_times = [], []
+    for _ in range(repeat):
+        async with session_factory() as db:
+            started = time.perf_counter()
+            result, serialize = await fetch(db, rows)
+            fetched = time.perf_counter()
+            serialize()
+            fetch_times.append(fetched - started)
+            total_times.append(time.perf_counter() - started)
+
+    async with session_factory() as db:
+        # Warm the connection and statement cache so only the result is counted
+        await fetch(db, rows)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        result, _ = await fetch(db, rows)
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        assert len(result) == rows
+    return min(fetch_times), min(total_times), retained / rows
+
+
+async def bench(url: str, rows: int, repeat: int) -> None:
+    engine = create_async_engine(url.replace("postgresql://", "postgresql+asyncpg://"))
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as connection:
+        await connection.run_sync(BenchBase.metadata.drop_all)
+        await connection.run_sync(BenchBase.metadata.create_all)
+    try:
+        now = datetime.utcnow()
+        async with engine.begin() as connection:
+            await connection.execute(insert(BenchMeasurement), [
+                {"sensor_id": 1, "value": 34.5 + i % 10 / 10, "battery_level": 80.0, "created_at": now - timedelta(minutes=i)}
+                for i in range(rows)
+            ])
+
+        print(f"{rows} rows, best of {repeat}")
+        print(f"{'path':<10} {'fetch ms':>10} {'+serialize ms':>14} {'bytes/row':>10}")
+        results = {}
+        for name, fetch in (("entities", entities), ("lean", lean)):
+            results[name] = await measure(session_factory, rows, repeat, fetch)
+            fetch_time, total_time, per_row = results[name]
+            print(f"{name:<10} {fetch_time * 1000:>10.1f} {total_time * 1000:>14.1f} {per_row:>10.0f}")
+        (entity_fetch, entity_total, entity_bytes), (lean_fetch, lean_total, lean_bytes) = results.values()
+        print(
+            f"lean is {entity_total / lean_total:.1f}x faster end to end"
+            f" ({entity_fetch / lean_fetch:.1f}x on fetch) and holds {entity_bytes / lean_bytes:.1f}x less memory per row"
+        )
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(BenchBase.metadata.drop_all)
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", default=SQLALCHEMY_DATABASE_URL)
+    args = parser.parse_args()
+    asyncio.run(bench(args.url, args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Cost of the in-process ingestion rate limit check.
+
+Runs check_ingestion_rate for many users and sensors, about as the monitoring
+service calls it per measurement. No database needed:
+
+    python -m benchmarks.bench_rate_limit --calls 200000
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from services.monitoring.main import check_ingestion_rate
+
+
+async def bench(calls: int, users: int, sensors_per_user: int) -> None:
+    accounts = [SimpleNamespace(id=i, plan="free") for i in range(users)]
+    limited = 0
+    started = time.perf_counter()
+    for i in range(calls):
+        try:
+            await check_ingestion_rate(accounts[i % users], i % sensors_per_user)
+        except HTTPException:
+            limited += 1
+    elapsed = time.perf_counter() - started
+    print(
+        f"{calls} checks over {users} users x {sensors_per_user} sensors:"
+        f" {elapsed / calls * 1e6:.2f} us per check, {limited} limited"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--sensors-per-user", type=int, default=6)
+    args = parser.parse_args()
+    asyncio.run(bench(args.calls, args.users, args.sensors_per_user))
+
+
+if __name__ == "__main__":
+    main()
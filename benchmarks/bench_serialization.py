@@ -0,0 +1,142 @@
+"""Response serialization: FastAPI's default path vs. shared.responses.
+
+Serializes 10k ORM rows per service list endpoint, no database needed:
+
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+# The apps import every model, so all relationships can be resolved
+import services.auth.main  # noqa: F401
+import services.hive.main  # noqa: F401
+import services.monitoring.main  # noqa: F401
+import services.notification.main  # noqa: F401
+from services.auth import models as auth_models, schemas as auth_schemas
+from services.hive import models as hive_models, schemas as hive_schemas
+from services.monitoring import models as monitoring_models, schemas as monitoring_schemas
+from services.notification import models as notification_models, schemas as notification_schemas
+from shared.responses import respond, respond_trusted
+
+NOW = datetime(2026, 10, 19, 12, 0, 0, 123456)
+
+
+def users(rows: int) -> List[Any]:
+    return [
+        auth_models.User(
+            id=i, email=f"user{i}@example.com", username=f"user{i}", hashed_password="x" * 60,
+            is_active=True, is_superuser=False, plan="free", created_at=NOW,
+        )
+        for i in range(rows)
+    ]
+
+
+def hives(rows: int) -> List[Any]:
+    return [
+        hive_models.Hive(
+            id=i, name=f"Hive {i}", location="Apiary 1", description=None, status="active", queen_year=2025,
+            frames_count=10, user_id=1, latitude=55.75, longitude=37.61, created_at=NOW, updated_at=NOW,
+        )
+        for i in range(rows)
+    ]
+
+
+def inspections(rows: int) -> List[Any]:
+    return [
+        hive_models.Inspection(
+            id=i, hive_id=1, temperature=34.5, humidity=61.0, weight=42.3, notes="Queen seen", user_id=1,
+            created_at=NOW - timedelta(days=i), updated_at=None,
+        )
+        for i in range(rows)
+    ]
+
+
+def measurements(rows: int) -> List[Any]:
+    return [
+        monitoring_models.Measurement(
+            id=i, sensor_id=1, value=34.5 + i % 10 / 10, battery_level=87.5,
+            created_at=NOW - timedelta(minutes=i), updated_at=None,
+        )
+        for i in range(rows)
+    ]
+
+
+def notifications(rows: int) -> List[Any]:
+    return [
+        notification_models.Notification(
+            id=i, user_id=1, template_id=1, notification_type=notification_models.NotificationType.EMAIL,
+            priority=notification_models.NotificationPriority.HIGH, subject="Alert: temperature_high",
+            body="Hive 1: Brood temperature 38.6 C", is_sent=True, sent_at=NOW.isoformat(), error_message=None,
+            attempts=1, next_attempt_at=NOW, digest_id=None, is_read=False, read_at=None,
+            created_at=NOW, updated_at=None,
+        )
+        for i in range(rows)
+    ]
+
+
+CASES = [
+    ("auth", auth_schemas.UserOut, users),
+    ("hive", hive_schemas.HiveResponse, hives),
+    ("hive", hive_schemas.InspectionResponse, inspections),
+    ("monitoring", monitoring_schemas.Measurement, measurements),
+    ("notification", notification_schemas.Notification, notifications),
+]
+
+
+def timed(run: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def fastapi_default(schema: Any, objects: List[Any], response_class) -> Callable[[], bytes]:
+    field = create_response_field(name="Response", type_=List[schema], mode="serialization")
+
+    def run() -> bytes:
+        content = asyncio.run(serialize_response(field=field, response_content=objects))
+        return response_class(content).body
+
+    return run
+
+
+def bench(rows: int, repeat: int) -> None:
+    print(f"{rows} rows, best of {repeat}")
+    print(f"{'service':<13} {'schema':<20} {'fastapi+json':>13} {'+orjson':>9} {'respond':>9} {'trusted':>9}")
+    for service, schema, factory in CASES:
+        objects = factory(rows)
+        baseline = fastapi_default(schema, objects, JSONResponse)
+        with_orjson = fastapi_default(schema, objects, ORJSONResponse)
+        once = lambda: respond(List[schema], objects).body  # noqa: E731
+        trusted = lambda: respond_trusted(schema, objects).body  # noqa: E731
+        # Same document either way
+        assert json.loads(baseline()) == json.loads(once())
+        times = [timed(run, repeat) for run in (baseline, with_orjson, once, trusted)]
+        print(
+            f"{service:<13} {schema.__name__:<20}"
+            + "".join(f" {t * 1000:>{13 if i == 0 else 9}.1f}" for i, t in enumerate(times))
+            + f"   ({times[0] / times[2]:.1f}x)"
+        )
+    print("times in ms; the factor compares respond with the default path")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""End-to-end HTTP load test against running services.
+
+Start the stack first (`docker compose up -d`), then for example:
+
+    python -m benchmarks.load_test --scenario ingestion --concurrency 64 --duration 30
+    python -m benchmarks.load_test --scenario dashboard --mode open --rate 500 --output dashboard.json
+    python -m benchmarks.load_test --scenario mixed --output new.json --baseline dashboard.json
+
+Closed loop keeps `--concurrency` requests in flight, each worker sending the next
+request as soon as the previous one returns. Open loop sends `--rate` requests per
+second whether or not earlier ones have finished, and measures latency from the
+scheduled send time, so a stalled server shows up as latency instead of a lower rate.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+SERVICE_URLS = {
+    "auth": os.getenv("AUTH_URL", "http://localhost:8000"),
+    "hive": os.getenv("HIVE_URL", "http://localhost:8001"),
+    "monitoring": os.getenv("MONITORING_URL", "http://localhost:8002"),
+    "notification": os.getenv("NOTIFICATION_URL", "http://localhost:8003"),
+}
+SENSOR_TYPES = ("temperature", "humidity", "weight")
+
+
+@dataclass
+class Beekeeper:
+    username: str
+    password: str
+    headers: Dict[str, str]
+    hive_ids: List[int] = field(default_factory=list)
+    sensor_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class Fixture:
+    clients: Dict[str, httpx.AsyncClient]
+    beekeepers: List[Beekeeper]
+    template_id: Optional[int] = None
+
+
+Operation = Callable[[Fixture, Beekeeper, random.Random], Awaitable[httpx.Response]]
+
+
+async def post_measurement(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["monitoring"].post("/measurements/", headers=user.headers, json={
+        "sensor_id": rng.choice(user.sensor_ids),
+        "value": round(rng.gauss(34.5, 1.5), 2),
+        "battery_level": round(rng.uniform(20, 100), 1),
+    })
+
+
+async def post_alert(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    sensor_index = rng.randrange(len(user.sensor_ids))
+    return await fx.clients["monitoring"].post("/alerts/", headers=user.headers, json={
+        "alert_type": "temperature",
+        "message": "Temperature out of range",
+        "sensor_id": user.sensor_ids[sensor_index],
+        "hive_id": user.hive_ids[sensor_index // len(SENSOR_TYPES)],
+    })
+
+
+async def post_token(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["auth"].post("/token", data={"username": user.username, "password": user.password})
+
+
+async def get_hives(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["hive"].get("/hives/", headers=user.headers)
+
+
+async def get_hive(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["hive"].get(f"/hives/{rng.choice(user.hive_ids)}", headers=user.headers)
+
+
+async def get_sensor_stats(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["monitoring"].get(f"/sensors/{rng.choice(user.sensor_ids)}/stats/", headers=user.headers)
+
+
+async def get_measurements(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["monitoring"].get(
+        f"/sensors/{rng.choice(user.sensor_ids)}/measurements/", headers=user.headers
+    )
+
+
+async def get_alerts(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["monitoring"].get("/alerts/", headers=user.headers)
+
+
+async def get_notifications(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["notification"].get("/notifications/", headers=user.headers)
+
+
+async def get_notification_counts(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["notification"].get("/notifications/counts/", headers=user.headers)
+
+
+async def post_notification(fx: Fixture, user: Beekeeper, rng: random.Random) -> httpx.Response:
+    return await fx.clients["notification"].post("/notifications/", headers=user.headers, json={
+        "template_id": fx.template_id,
+        "notification_type": rng.choice(("email", "push")),
+        "priority": rng.choice(("low", "medium", "high")),
+        "subject": "Hive check",
+        "body": "Weight dropped by 2 kg since yesterday",
+    })
+
+
+# Weighted operation mixes; weights are relative within a scenario
+SCENARIOS: Dict[str, List[Tuple[Operation, int]]] = {
+    # Sensor gateways pushing readings, with the occasional alert
+    "ingestion": [(post_measurement, 97), (post_alert, 3)],
+    # Beekeepers' dashboards refreshing
+    "dashboard": [
+        (get_hives, 25), (get_hive, 25), (get_sensor_stats, 20), (get_measurements, 10),
+        (get_alerts, 10), (get_notification_counts, 10),
+    ],
+    # Everyone logging in at once, e.g. after a token expiry
+    "login": [(post_token, 1)],
+    "notifications": [(post_notification, 40), (get_notification_counts, 40), (get_notifications, 20)],
+    "mixed": [
+        (post_measurement, 60), (get_hives, 8), (get_hive, 8), (get_sensor_stats, 6), (get_alerts, 4),
+        (get_notification_counts, 6), (post_notification, 3), (post_token, 5),
+    ],
+}
+
+
+def _check(response: httpx.Response) -> dict:
+    if response.is_error:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text}")
+    return response.json()
+
+
+async def login(clients: Dict[str, httpx.AsyncClient], username: str, password: str) -> Dict[str, str]:
+    token = _check(await clients["auth"].post("/token", data={"username": username, "password": password}))
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+async def create_beekeeper(
+    clients: Dict[str, httpx.AsyncClient], run_id: str, index: int, hives: int, rng: random.Random
+) -> Beekeeper:
+    username, password = f"bench_{run_id}_{index}", "bench-password"
+    _check(await clients["auth"].post("/users/", json={
+        "email": f"{username}@bench.example.com", "username": username, "password": password,
+    }))
+    user = Beekeeper(username, password, await login(clients, username, password))
+    for number in range(hives):
+        hive = _check(await clients["hive"].post("/hives/", headers=user.headers, json={
+            "name": f"Hive {number + 1}",
+            "location": "Bench apiary",
+            "queen_year": rng.randint(2021, 2026),
+            "frames_count": rng.choice((8, 10, 12)),
+            "latitude": round(rng.uniform(55.5, 56.0), 5),
+            "longitude": round(rng.uniform(37.3, 37.9), 5),
+        }))
+        user.hive_ids.append(hive["id"])
+    sensors = _check(await clients["monitoring"].post("/sensors/bulk/", headers=user.headers, json=[
+        {"name": f"{sensor_type} {hive_id}", "sensor_type": sensor_type, "hive_id": hive_id}
+        for hive_id in user.hive_ids for sensor_type in SENSOR_TYPES
+    ]))
+    user.sensor_ids = [sensor["id"] for sensor in sensors]
+    return user
+
+
+async def setup(clients: Dict[str, httpx.AsyncClient], args, rng: random.Random) -> Fixture:
+    run_id = uuid.uuid4().hex[:8]
+    beekeepers = await asyncio.gather(*(
+        create_beekeeper(clients, run_id, index, args.hives_per_user, random.Random(rng.random()))
+        for index in range(args.users)
+    ))
+    fixture = Fixture(clients, list(beekeepers))
+    if args.admin_user:
+        headers = await login(clients, args.admin_user, args.admin_password)
+        template = _check(await clients["notification"].post("/templates/", headers=headers, json={
+            "name": f"bench_{run_id}", "subject": "Hive check", "body": "{{ hive.name }}",
+            "notification_type": "email",
+        }))
+        fixture.template_id = template["id"]
+    return fixture
+
+
+class Recorder:
+    def __init__(self, warmup_until: float):
+        self.warmup_until = warmup_until
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.dropped = 0
+
+    def record(self, name: str, scheduled: float, status: str, ok: bool) -> None:
+        if scheduled < self.warmup_until:
+            return
+        self.latencies.setdefault(name, []).append(time.perf_counter() - scheduled)
+        self.errors[name] = self.errors.get(name, 0) + (not ok)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def call(fx: Fixture, recorder: Recorder, operation: Operation, rng: random.Random, scheduled: float):
+    user = rng.choice(fx.beekeepers)
+    try:
+        response = await operation(fx, user, rng)
+        recorder.record(operation.__name__, scheduled, str(response.status_code), not response.is_error)
+    except httpx.HTTPError as exc:
+        recorder.record(operation.__name__, scheduled, type(exc).__name__, False)
+
+
+async def closed_loop(fx: Fixture, recorder: Recorder, mix, args, rng: random.Random, deadline: float):
+    operations, weights = zip(*mix)
+
+    async def worker(seed: float):
+        worker_rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            operation = worker_rng.choices(operations, weights)[0]
+            await call(fx, recorder, operation, worker_rng, time.perf_counter())
+
+    await asyncio.gather(*(worker(rng.random()) for _ in range(args.concurrency)))
+
+
+async def open_loop(fx: Fixture, recorder: Recorder, mix, args, rng: random.Random, deadline: float):
+    operations, weights = zip(*mix)
+    pending = set()
+    scheduled = time.perf_counter()
+    while scheduled < deadline:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(pending) >= args.max_outstanding:
+            # The client is the bottleneck now; count it rather than queueing unboundedly
+            recorder.dropped += 1
+        else:
+            operation = rng.choices(operations, weights)[0]
+            task = asyncio.create_task(call(fx, recorder, operation, random.Random(rng.random()), scheduled))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        scheduled += rng.expovariate(args.rate) if args.poisson else 1 / args.rate
+    if pending:
+        await asyncio.wait(pending)
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    # Nearest rank
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 1),
+        "mean_ms": round(sum(ordered) / count * 1000, 2) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if count else 0.0,
+    }
+
+
+def build_report(recorder: Recorder, args, elapsed: float) -> dict:
+    operations = {
+        name: {**summarize(latencies, recorder.errors[name], elapsed), "statuses": recorder.statuses[name]}
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "scenario": args.scenario,
+        "mode": args.mode,
+        "concurrency": args.concurrency if args.mode == "closed" else None,
+        "rate": args.rate if args.mode == "open" else None,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": revision,
+        "dropped": recorder.dropped,
+        "total": summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "operations": operations,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"{'operation':<26} {'requests':>9} {'rps':>9} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in [*report["operations"].items(), ("total", report["total"])]:
+        print(
+            f"{name:<26} {stats['requests']:>9} {stats['throughput_rps']:>9.1f} {stats['error_rate'] * 100:>6.2f}"
+            f" {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        )
+    if report["dropped"]:
+        print(f"{report['dropped']} arrivals dropped at --max-outstanding")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions against a saved run: p95 up or throughput down by more than `tolerance`, or new errors"""
+    regressions = []
+    print(f"\nvs baseline {baseline.get('revision')} ({baseline.get('started_at')})")
+    if (baseline["scenario"], baseline["mode"]) != (report["scenario"], report["mode"]):
+        print(f"warning: baseline is a {baseline['mode']}-loop {baseline['scenario']} run")
+    print(f"{'operation':<26} {'p95 ms':>19} {'rps':>19}")
+    pairs = [(name, stats, baseline["operations"].get(name)) for name, stats in report["operations"].items()]
+    for name, stats, base in pairs + [("total", report["total"], baseline["total"])]:
+        if not base:
+            continue
+        print(
+            f"{name:<26} {base['p95_ms']:>8.2f} -> {stats['p95_ms']:>8.2f}"
+            f" {base['throughput_rps']:>8.1f} -> {stats['throughput_rps']:>8.1f}"
+        )
+        if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {stats['p95_ms']} ms")
+        if base["throughput_rps"] and stats["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {stats['throughput_rps']} rps")
+        if stats["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {base['error_rate']} -> {stats['error_rate']}")
+    return regressions
+
+
+async def run(args) -> int:
+    rng = random.Random(args.seed)
+    mix = SCENARIOS[args.scenario]
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.max_outstanding), max_keepalive_connections=None)
+    clients = {
+        name: httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout)
+        for name, url in SERVICE_URLS.items()
+    }
+    try:
+        fixture = await setup(clients, args, rng)
+        if fixture.template_id is None:
+            # Creating templates needs a superuser
+            mix = [(operation, weight) for operation, weight in mix if operation is not post_notification]
+        started = time.perf_counter()
+        recorder = Recorder(started + args.warmup)
+        deadline = started + args.warmup + args.duration
+        loop = closed_loop if args.mode == "closed" else open_loop
+        await loop(fixture, recorder, mix, args, rng, deadline)
+        report = build_report(recorder, args, time.perf_counter() - recorder.warmup_until)
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=32, help="closed loop: requests in flight")
+    parser.add_argument("--rate", type=float, default=200.0, help="open loop: requests per second")
+    parser.add_argument("--poisson", action="store_true", help="open loop: exponential inter-arrival times")
+    parser.add_argument("--max-outstanding", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--hives-per-user", type=int, default=5)
+    parser.add_argument("--admin-user", help="superuser for notification scenarios (creates a template)")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Add coordinates and geohash index to hives
+
+Revision ID: 002_add_hive_coordinates
+Revises: 001_create_all_tables
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002_add_hive_coordinates'
+down_revision = '001_create_all_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('hives', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('hives', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('hives', sa.Column('geohash', sa.String(length=12, collation='C'), nullable=True))
+    op.create_index('ix_hives_user_id_geohash', 'hives', ['user_id', 'geohash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hives_user_id_geohash', table_name='hives')
+    op.drop_column('hives', 'geohash')
+    op.drop_column('hives', 'longitude')
+    op.drop_column('hives', 'latitude')
@@ -0,0 +1,34 @@
+"""Add partial index on unsent notifications
+
+Revision ID: 003_pending_notifications_index
+Revises: 002_add_hive_coordinates
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003_pending_notifications_index'
+down_revision = '002_add_hive_coordinates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Built concurrently: the notifications table can be large and is written constantly
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_pending',
+            'notifications',
+            ['created_at'],
+            unique=False,
+            postgresql_where=sa.text('is_sent = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_pending', table_name='notifications', postgresql_concurrently=True)
@@ -0,0 +1,45 @@
+"""Add next_attempt_at and per-priority pending index to notifications
+
+Revision ID: 004_notification_scheduling
+Revises: 003_pending_notifications_index
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_notification_scheduling'
+down_revision = '003_pending_notifications_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE notifications SET next_attempt_at = created_at WHERE is_sent = false")
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_pending', table_name='notifications', postgresql_concurrently=True)
+        op.create_index(
+            'ix_notifications_pending',
+            'notifications',
+            ['priority', 'next_attempt_at'],
+            unique=False,
+            postgresql_where=sa.text('is_sent = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_pending', table_name='notifications', postgresql_concurrently=True)
+        op.create_index(
+            'ix_notifications_pending',
+            'notifications',
+            ['created_at'],
+            unique=False,
+            postgresql_where=sa.text('is_sent = false'),
+            postgresql_concurrently=True,
+        )
+    op.drop_column('notifications', 'next_attempt_at')
@@ -0,0 +1,66 @@
+"""Add retry attempts and dead-letter table for notifications
+
+Revision ID: 005_notification_retries
+Revises: 004_notification_scheduling
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_notification_retries'
+down_revision = '004_notification_scheduling'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table(
+        'notification_dead_letters',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('notification_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notification_type', sa.String(), nullable=False),
+        sa.Column('priority', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['notification_id'], ['notifications.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('notification_id')
+    )
+    op.create_index(op.f('ix_notification_dead_letters_id'), 'notification_dead_letters', ['id'], unique=False)
+
+    # Dead-lettered rows have next_attempt_at = NULL and are left out of the pending index
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_pending', table_name='notifications', postgresql_concurrently=True)
+        op.create_index(
+            'ix_notifications_pending',
+            'notifications',
+            ['priority', 'next_attempt_at'],
+            unique=False,
+            postgresql_where=sa.text('is_sent = false AND next_attempt_at IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_pending', table_name='notifications', postgresql_concurrently=True)
+        op.create_index(
+            'ix_notifications_pending',
+            'notifications',
+            ['priority', 'next_attempt_at'],
+            unique=False,
+            postgresql_where=sa.text('is_sent = false'),
+            postgresql_concurrently=True,
+        )
+    op.drop_index(op.f('ix_notification_dead_letters_id'), table_name='notification_dead_letters')
+    op.drop_table('notification_dead_letters')
+    op.drop_column('notifications', 'attempts')
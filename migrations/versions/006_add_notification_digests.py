@@ -0,0 +1,68 @@
+"""Add notification digests
+
+Revision ID: 006_notification_digests
+Revises: 005_notification_retries
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_notification_digests'
+down_revision = '005_notification_retries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notification_settings', sa.Column('digest_enabled', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.add_column('notification_settings', sa.Column('digest_window_minutes', sa.Integer(), server_default='60', nullable=False))
+
+    op.create_table(
+        'notification_digests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notification_type', sa.String(), nullable=False),
+        sa.Column('window_end', sa.DateTime(), nullable=False),
+        sa.Column('item_count', sa.Integer(), nullable=False),
+        sa.Column('flushed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_notification_digests_id'), 'notification_digests', ['id'], unique=False)
+    op.create_index(
+        'ux_notification_digests_open',
+        'notification_digests',
+        ['user_id', 'notification_type'],
+        unique=True,
+        postgresql_where=sa.text('flushed_at IS NULL'),
+    )
+    op.create_index(
+        'ix_notification_digests_due',
+        'notification_digests',
+        ['window_end'],
+        unique=False,
+        postgresql_where=sa.text('flushed_at IS NULL'),
+    )
+
+    op.add_column('notifications', sa.Column('digest_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_notifications_digest_id', 'notifications', 'notification_digests', ['digest_id'], ['id']
+    )
+    op.create_index(op.f('ix_notifications_digest_id'), 'notifications', ['digest_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_notifications_digest_id'), table_name='notifications')
+    op.drop_constraint('fk_notifications_digest_id', 'notifications', type_='foreignkey')
+    op.drop_column('notifications', 'digest_id')
+    op.drop_index('ix_notification_digests_due', table_name='notification_digests')
+    op.drop_index('ux_notification_digests_open', table_name='notification_digests')
+    op.drop_index(op.f('ix_notification_digests_id'), table_name='notification_digests')
+    op.drop_table('notification_digests')
+    op.drop_column('notification_settings', 'digest_window_minutes')
+    op.drop_column('notification_settings', 'digest_enabled')
@@ -0,0 +1,33 @@
+"""Add geohash-leading hive index for region audiences
+
+Revision ID: 007_hive_geohash_index
+Revises: 006_notification_digests
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_hive_geohash_index'
+down_revision = '006_notification_digests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Region-wide lookups across all owners (broadcast audiences)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_hives_geohash_user_id',
+            'hives',
+            ['geohash', 'user_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_hives_geohash_user_id', table_name='hives', postgresql_concurrently=True)
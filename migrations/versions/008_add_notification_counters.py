@@ -0,0 +1,48 @@
+"""Add notification read state and unread counters
+
+Revision ID: 008_notification_counters
+Revises: 007_hive_geohash_index
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_notification_counters'
+down_revision = '007_hive_geohash_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('is_read', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.add_column('notifications', sa.Column('read_at', sa.DateTime(), nullable=True))
+
+    op.create_table(
+        'notification_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('notification_type', sa.String(), nullable=False),
+        sa.Column('priority', sa.String(), nullable=False),
+        sa.Column('unread', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'notification_type', 'priority')
+    )
+
+    # Everything that exists so far is unread
+    op.execute(
+        """
+        INSERT INTO notification_counters (user_id, notification_type, priority, unread)
+        SELECT user_id, notification_type, priority, count(*)
+        FROM notifications
+        WHERE user_id IS NOT NULL AND notification_type IS NOT NULL AND priority IS NOT NULL
+        GROUP BY user_id, notification_type, priority
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_counters')
+    op.drop_column('notifications', 'read_at')
+    op.drop_column('notifications', 'is_read')
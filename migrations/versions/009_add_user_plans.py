@@ -0,0 +1,24 @@
+"""Add rate limit plans to users
+
+Revision ID: 009_user_plans
+Revises: 008_notification_counters
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_user_plans'
+down_revision = '008_notification_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('plan', sa.String(), server_default='free', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'plan')
@@ -4,15 +4,25 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db, pool_status
+from shared.responses import ORJSONResponse
+from shared.metrics import instrument
 from . import models, schemas, security
 from .service import UserService
 
-app = FastAPI(title="Auth Service", version="1.0.0")
+app = FastAPI(
+    title="Auth Service", version="1.0.0", default_response_class=ORJSONResponse
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 user_service = UserService()
 
 
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool usage and checkout wait times"""
+    return pool_status()
+
+
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -58,7 +68,7 @@ async def read_users_me(
 @app.get("/users/{user_id}", response_model=schemas.UserOut)
 async def read_user(
     user_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     db_user = await user_service.get_user(db, user_id)
     if db_user is None:
@@ -79,4 +89,7 @@ async def update_user(
     db_user = await user_service.update_user(db, user_id, user)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return db_user 
\ No newline at end of file
+    return db_user 
+
+
+instrument(app, "auth")
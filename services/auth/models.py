@@ -10,4 +10,6 @@ class User(Base, TimestampMixin):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
-    is_superuser = Column(Boolean, default=False) 
\ No newline at end of file
+    is_superuser = Column(Boolean, default=False)
+    # Rate limit tier, see shared.rate_limit
+    plan = Column(String, default="free", server_default="free", nullable=False) 
\ No newline at end of file
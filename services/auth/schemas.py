@@ -28,6 +28,7 @@ class UserInDB(UserBase):
 
 class UserOut(UserBase):
     id: int
+    plan: str = "free"
 
 
 class Token(BaseSchema):
@@ -5,11 +5,19 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from shared.database import get_db
+from shared.hot_queries import hot_query
 from shared.service import BaseService
+from shared.tracing import span
 from . import models, schemas, security
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Runs for every authenticated request in every service
+USER_BY_USERNAME = hot_query(
+    "user_by_username",
+    f"SELECT {', '.join(models.User.__table__.columns.keys())} FROM users WHERE username = $1",
+)
+
 
 class UserService(BaseService[models.User]):
     def __init__(self):
@@ -27,17 +35,14 @@ class UserService(BaseService[models.User]):
 
     async def create_user(self, db: AsyncSession, user: schemas.UserCreate) -> models.User:
         hashed_password = security.get_password_hash(user.password)
-        db_user = models.User(
+        return await self.create(
+            db,
             email=user.email,
             username=user.username,
             hashed_password=hashed_password,
             is_active=user.is_active,
             is_superuser=user.is_superuser
         )
-        db.add(db_user)
-        await db.commit()
-        await db.refresh(db_user)
-        return db_user
 
     async def authenticate_user(
         self, db: AsyncSession, username: str, password: str
@@ -54,20 +59,24 @@ class UserService(BaseService[models.User]):
         db: AsyncSession = Depends(get_db),
         token: str = Depends(oauth2_scheme)
     ) -> models.User:
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        with span("get_current_user"):
+            credentials_exception = HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
         
-        token_data = security.verify_token(token)
-        if token_data is None:
-            raise credentials_exception
+            token_data = security.verify_token(token)
+            if token_data is None:
+                raise credentials_exception
             
-        user = await self.get_user_by_username(db, username=token_data.username)
-        if user is None:
-            raise credentials_exception
-        return user
+            if USER_BY_USERNAME.enabled:
+                user = await USER_BY_USERNAME.fetchrow(db, token_data.username)
+            else:
+                user = await self.get_user_by_username(db, username=token_data.username)
+            if user is None:
+                raise credentials_exception
+            return user
 
     async def update_user(
         self, db: AsyncSession, user_id: int, user_update: schemas.UserUpdate
@@ -0,0 +1,109 @@
+import math
+from typing import List, Set, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9  # ~5 m cells, enough for an apiary
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+MAX_COVER_CELLS = 32
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Cell (height, width) in degrees for a geohash of the given length"""
+    total_bits = 5 * precision
+    lat_bits = total_bits // 2
+    lon_bits = total_bits - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def _wrap_longitude(longitude: float) -> float:
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def _clamp_latitude(latitude: float) -> float:
+    return max(-90.0, min(90.0, latitude))
+
+
+def radius_to_degrees(latitude: float, radius_km: float) -> Tuple[float, float]:
+    lat_delta = radius_km / KM_PER_DEGREE
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    lon_delta = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+    return lat_delta, lon_delta
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_cells(
+    min_lat: float, min_lon: float, max_lat: float, max_lon: float
+) -> List[str]:
+    """Smallest set of geohash prefixes (at most MAX_COVER_CELLS) covering the box"""
+    lon_span = max_lon - min_lon if max_lon >= min_lon else max_lon + 360.0 - min_lon
+    lat_span = max_lat - min_lat
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.ceil(lon_span / width) + 1
+        if rows * cols <= MAX_COVER_CELLS or precision == 1:
+            break
+    cells: Set[str] = set()
+    lat = min_lat
+    while True:
+        lon_offset = 0.0
+        while True:
+            cells.add(encode(_clamp_latitude(lat), _wrap_longitude(min_lon + lon_offset), precision))
+            if lon_offset >= lon_span:
+                break
+            lon_offset = min(lon_offset + width, lon_span)
+        if lat >= max_lat or lat_span == 0:
+            break
+        lat = min(lat + height, max_lat)
+    return sorted(cells)
+
+
+def radius_cells(latitude: float, longitude: float, radius_km: float) -> List[str]:
+    lat_delta, lon_delta = radius_to_degrees(latitude, radius_km)
+    min_lat = _clamp_latitude(latitude - lat_delta)
+    max_lat = _clamp_latitude(latitude + lat_delta)
+    if lon_delta >= 180.0 or min_lat <= -90.0 or max_lat >= 90.0:
+        # The circle spans every meridian (or a pole); wrapped bounds would collapse to one column
+        return bbox_cells(min_lat, -180.0, max_lat, 180.0)
+    return bbox_cells(min_lat, _wrap_longitude(longitude - lon_delta), max_lat, _wrap_longitude(longitude + lon_delta))
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Type
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.base_models import BaseSchema
+from . import schemas
+from .service import HiveService, InspectionService
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+# (row number, parsed row or None, parse error or None)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+def _is_ndjson(upload: UploadFile) -> bool:
+    filename = (upload.filename or "").lower()
+    return upload.content_type in NDJSON_CONTENT_TYPES or filename.endswith((".ndjson", ".jsonl"))
+
+
+def _iter_csv(stream: io.TextIOWrapper) -> Iterator[ParsedRow]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # Empty cells mean "not set" so optional fields fall back to their defaults
+        data = {key: value for key, value in row.items() if key and value not in ("", None)}
+        yield reader.line_num, data, None
+
+
+def _iter_ndjson(stream: io.TextIOWrapper) -> Iterator[ParsedRow]:
+    for line_num, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(data, dict):
+            yield line_num, None, "Row must be a JSON object"
+            continue
+        yield line_num, data, None
+
+
+def _iter_rows(upload: UploadFile) -> Iterator[ParsedRow]:
+    # The upload is spooled to disk by Starlette; read it line by line instead of all at once
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    if _is_ndjson(upload):
+        return _iter_ndjson(stream)
+    return _iter_csv(stream)
+
+
+def _read_chunk(rows: Iterator[ParsedRow]) -> List[ParsedRow]:
+    return list(islice(rows, CHUNK_SIZE))
+
+
+def _format_errors(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    ]
+
+
+class _ImportRun:
+    def __init__(self):
+        self.report = schemas.ImportReport()
+
+    def fail(self, row: int, errors: List[str]) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(schemas.ImportRowError(row=row, errors=errors))
+        else:
+            self.report.errors_truncated = True
+
+    def validate(self, chunk: List[ParsedRow], schema: Type[BaseSchema]) -> List[Tuple[int, Any]]:
+        valid = []
+        for row, data, parse_error in chunk:
+            self.report.total_rows += 1
+            if parse_error:
+                self.fail(row, [parse_error])
+                continue
+            try:
+                valid.append((row, schema.model_validate(data)))
+            except ValidationError as e:
+                self.fail(row, _format_errors(e))
+        return valid
+
+
+async def _run_import(
+    upload: UploadFile,
+    schema: Type[BaseSchema],
+    write_chunk: Callable[[_ImportRun, List[Tuple[int, Any]]], Any],
+) -> schemas.ImportReport:
+    run = _ImportRun()
+    rows = _iter_rows(upload)
+    while True:
+        chunk = await run_in_threadpool(_read_chunk, rows)
+        if not chunk:
+            break
+        valid = run.validate(chunk, schema)
+        if valid:
+            run.report.imported += await write_chunk(run, valid)
+    run.report.errors.sort(key=lambda error: error.row)
+    return run.report
+
+
+async def import_hives(
+    db: AsyncSession, upload: UploadFile, user_id: int, hive_service: HiveService
+) -> schemas.ImportReport:
+    async def write_chunk(run: _ImportRun, valid: List[Tuple[int, schemas.HiveCreate]]) -> int:
+        return await hive_service.copy_hives(db, [hive for _, hive in valid], user_id)
+
+    return await _run_import(upload, schemas.HiveCreate, write_chunk)
+
+
+async def import_inspections(
+    db: AsyncSession,
+    upload: UploadFile,
+    user_id: int,
+    hive_service: HiveService,
+    inspection_service: InspectionService,
+) -> schemas.ImportReport:
+    async def write_chunk(
+        run: _ImportRun, valid: List[Tuple[int, schemas.InspectionImport]]
+    ) -> int:
+        # One ownership query per chunk instead of one per row
+        owned = await hive_service.get_owned_hive_ids(
+            db, user_id, (inspection.hive_id for _, inspection in valid)
+        )
+        accepted = []
+        for row, inspection in valid:
+            if inspection.hive_id in owned:
+                accepted.append(inspection)
+            else:
+                run.fail(row, [f"hive_id: Hive {inspection.hive_id} not found"])
+        return await inspection_service.copy_inspections(db, accepted, user_id)
+
+    return await _run_import(upload, schemas.InspectionImport, write_chunk)
@@ -1,20 +1,31 @@
 from typing import List
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db, pool_status
+from shared.responses import ORJSONResponse, respond, respond_trusted
+from shared.admission import BULK
+from shared.metrics import INGESTED, instrument
 from services.auth.service import UserService
 from services.auth.models import User
-from . import schemas
+from . import schemas, importer
 from .service import HiveService, InspectionService
 
-app = FastAPI(title="Hive Service", version="1.0.0")
+app = FastAPI(
+    title="Hive Service", version="1.0.0", default_response_class=ORJSONResponse
+)
 
 hive_service = HiveService()
 inspection_service = InspectionService()
 user_service = UserService()
 
 
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool usage and checkout wait times"""
+    return pool_status()
+
+
 @app.post("/hives/", response_model=schemas.HiveResponse)
 async def create_hive(
     hive: schemas.HiveCreate,
@@ -22,32 +33,79 @@ async def create_hive(
     current_user: User = Depends(user_service.get_current_user)
 ):
     db_hive = await hive_service.create_hive(db=db, hive=hive, user_id=current_user.id)
-    return schemas.HiveResponse.model_validate(db_hive)
+    return respond(schemas.HiveResponse, db_hive)
+
+
+@app.post("/hives/import/", response_model=schemas.ImportReport)
+async def import_hives(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Bulk import hives from a CSV or NDJSON file"""
+    report = await importer.import_hives(db, file, current_user.id, hive_service)
+    INGESTED.labels("hive", "hive").inc(report.imported)
+    return report
 
 
 @app.get("/hives/", response_model=List[schemas.HiveResponse])
 async def read_hives(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
     hives = await hive_service.get_hives_by_user(
         db, user_id=current_user.id, skip=skip, limit=limit
     )
-    return [schemas.HiveResponse.model_validate(hive) for hive in hives]
+    return respond(List[schemas.HiveResponse], hives)
+
+
+@app.get("/hives/nearby/", response_model=List[schemas.HiveNearby])
+async def read_hives_nearby(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=500),
+    limit: int = Query(100, gt=0, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Hives within radius_km of a point, nearest first"""
+    hives = await hive_service.get_hives_nearby(
+        db, current_user.id, latitude, longitude, radius_km, limit
+    )
+    return respond_trusted(schemas.HiveNearby, hives)
+
+
+@app.get("/hives/within/", response_model=List[schemas.HiveResponse])
+async def read_hives_within(
+    min_latitude: float = Query(..., ge=-90, le=90),
+    min_longitude: float = Query(..., ge=-180, le=180),
+    max_latitude: float = Query(..., ge=-90, le=90),
+    max_longitude: float = Query(..., ge=-180, le=180),
+    limit: int = Query(100, gt=0, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Hives inside a bounding box; min_longitude > max_longitude crosses the antimeridian"""
+    if min_latitude > max_latitude:
+        raise HTTPException(status_code=422, detail="min_latitude must not exceed max_latitude")
+    hives = await hive_service.get_hives_in_bbox(
+        db, current_user.id, min_latitude, min_longitude, max_latitude, max_longitude, limit
+    )
+    return respond(List[schemas.HiveResponse], hives)
 
 
 @app.get("/hives/{hive_id}", response_model=schemas.HiveWithStats)
 async def read_hive(
     hive_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
     hive = await hive_service.get_hive_with_stats(db, hive_id, current_user.id)
     if hive is None:
         raise HTTPException(status_code=404, detail="Hive not found")
-    return hive
+    return respond(schemas.HiveWithStats, hive)
 
 
 @app.put("/hives/{hive_id}", response_model=schemas.HiveResponse)
@@ -63,10 +121,8 @@ async def update_hive(
     if db_hive.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    updated_hive = await hive_service.update(
-        db, hive_id, **hive.model_dump(exclude_unset=True)
-    )
-    return schemas.HiveResponse.model_validate(updated_hive)
+    updated_hive = await hive_service.update_hive(db, hive_id, hive)
+    return respond(schemas.HiveResponse, updated_hive)
 
 
 @app.post("/inspections/", response_model=schemas.InspectionResponse)
@@ -83,17 +139,21 @@ async def create_inspection(
     db_inspection = await inspection_service.create_inspection(
         db=db, inspection=inspection, user_id=current_user.id
     )
-    return {
-        "id": db_inspection.id,
-        "hive_id": db_inspection.hive_id,
-        "temperature": db_inspection.temperature,
-        "humidity": db_inspection.humidity,
-        "weight": db_inspection.weight,
-        "notes": db_inspection.notes,
-        "user_id": db_inspection.user_id,
-        "created_at": db_inspection.created_at,
-        "updated_at": db_inspection.updated_at
-    }
+    return respond(schemas.InspectionResponse, db_inspection)
+
+
+@app.post("/inspections/import/", response_model=schemas.ImportReport)
+async def import_inspections(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Bulk import inspections from a CSV or NDJSON file"""
+    report = await importer.import_inspections(
+        db, file, current_user.id, hive_service, inspection_service
+    )
+    INGESTED.labels("hive", "inspection").inc(report.imported)
+    return report
 
 
 @app.get("/hives/{hive_id}/inspections/", response_model=List[schemas.InspectionResponse])
@@ -101,7 +161,7 @@ async def read_inspections(
     hive_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
     # Проверяем, что улей принадлежит пользователю
@@ -112,17 +172,10 @@ async def read_inspections(
     inspections = await inspection_service.get_inspections_by_hive(
         db, hive_id=hive_id, user_id=current_user.id, skip=skip, limit=limit
     )
-    return [
-        {
-            "id": inspection.id,
-            "hive_id": inspection.hive_id,
-            "temperature": inspection.temperature,
-            "humidity": inspection.humidity,
-            "weight": inspection.weight,
-            "notes": inspection.notes,
-            "user_id": inspection.user_id,
-            "created_at": inspection.created_at,
-            "updated_at": inspection.updated_at
-        }
-        for inspection in inspections
-    ] 
\ No newline at end of file
+    return respond_trusted(schemas.InspectionResponse, inspections) 
+
+
+instrument(app, "hive", priorities={
+    "POST /hives/import/": BULK,
+    "POST /inspections/import/": BULK,
+})
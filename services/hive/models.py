@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 import enum
 from shared.database import Base, TimestampMixin
@@ -21,6 +21,16 @@ class Hive(Base, TimestampMixin):
     queen_year = Column(Integer)
     frames_count = Column(Integer)
     user_id = Column(Integer, ForeignKey("users.id"))
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # C collation keeps prefix range scans on the B-tree byte-ordered
+    geohash = Column(String(12, collation="C"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_hives_user_id_geohash", "user_id", "geohash"),
+        # Region-wide lookups across all owners (broadcast audiences)
+        Index("ix_hives_geohash_user_id", "geohash", "user_id"),
+    )
 
     # Relationships
     inspections = relationship("Inspection", back_populates="hive")
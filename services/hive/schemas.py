@@ -1,6 +1,6 @@
 from typing import Optional, List
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator, model_validator
+from datetime import datetime, timezone
 from shared.base_models import BaseSchema
 
 
@@ -15,6 +15,19 @@ class InspectionCreate(InspectionBase):
     hive_id: int
 
 
+class InspectionImport(InspectionCreate):
+    # Historical inspections keep their original date
+    created_at: Optional[datetime] = None
+
+    @field_validator("created_at")
+    @classmethod
+    def to_naive_utc(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Columns are TIMESTAMP WITHOUT TIME ZONE in UTC
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
 class InspectionUpdate(BaseSchema):
     temperature: Optional[float] = None
     humidity: Optional[float] = None
@@ -30,7 +43,18 @@ class InspectionResponse(InspectionBase):
     updated_at: Optional[datetime] = None
 
 
-class HiveBase(BaseSchema):
+class CoordinatesMixin(BaseSchema):
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def check_coordinates_pair(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be set together")
+        return self
+
+
+class HiveBase(CoordinatesMixin):
     name: str
     location: str
     status: str = "active"  # Простая строка вместо enum
@@ -43,7 +67,7 @@ class HiveCreate(HiveBase):
     pass
 
 
-class HiveUpdate(BaseSchema):
+class HiveUpdate(CoordinatesMixin):
     name: Optional[str] = None
     location: Optional[str] = None
     status: Optional[str] = None  # Простая строка
@@ -63,6 +87,10 @@ class HiveResponse(HiveBase):
         exclude = {"inspections"}
 
 
+class HiveNearby(HiveResponse):
+    distance_km: float
+
+
 class HiveWithInspections(HiveResponse):
     inspections: List[InspectionResponse] = []
 
@@ -71,4 +99,17 @@ class HiveWithStats(HiveWithInspections):
     avg_temperature: Optional[float] = None
     avg_humidity: Optional[float] = None
     avg_weight: Optional[float] = None
-    last_inspection_date: Optional[datetime] = None
\ No newline at end of file
+    last_inspection_date: Optional[datetime] = None
+
+
+class ImportRowError(BaseSchema):
+    row: int
+    errors: List[str]
+
+
+class ImportReport(BaseSchema):
+    total_rows: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    errors_truncated: bool = False
@@ -1,10 +1,58 @@
-from typing import List, Optional
-from sqlalchemy import select, func
+from typing import List, Optional, Sequence, Set, Iterable
+from datetime import datetime
+from sqlalchemy import Row, select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from shared.service import BaseService
-from . import models, schemas
+from . import models, schemas, geo
+
+
+def _geohash(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return geo.encode(latitude, longitude)
+
+
+def _cell_filter(column, cells: List[str]):
+    # Prefix match as a plain range so the B-tree is used even with bound parameters
+    return or_(*[
+        and_(column >= cell, column < cell[:-1] + chr(ord(cell[-1]) + 1))
+        for cell in cells
+    ])
+
+
+def _distance_km(latitude: float, longitude: float):
+    lat = func.radians(models.Hive.latitude)
+    lat0 = func.radians(latitude)
+    d_lat = lat - lat0
+    d_lon = func.radians(models.Hive.longitude) - func.radians(longitude)
+    a = (
+        func.power(func.sin(d_lat / 2), 2)
+        + func.cos(lat0) * func.cos(lat) * func.power(func.sin(d_lon / 2), 2)
+    )
+    return 2 * geo.EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
+
+
+def nearby_filter(latitude: float, longitude: float, radius_km: float):
+    """Hives within radius_km of the point: geohash cells for the index, exact distance after"""
+    return and_(
+        _cell_filter(models.Hive.geohash, geo.radius_cells(latitude, longitude, radius_km)),
+        _distance_km(latitude, longitude) <= radius_km,
+    )
+
+
+def bbox_filter(min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    if min_lon <= max_lon:
+        lon_filter = models.Hive.longitude.between(min_lon, max_lon)
+    else:
+        # Box crosses the antimeridian
+        lon_filter = or_(models.Hive.longitude >= min_lon, models.Hive.longitude <= max_lon)
+    return and_(
+        _cell_filter(models.Hive.geohash, geo.bbox_cells(min_lat, min_lon, max_lat, max_lon)),
+        models.Hive.latitude.between(min_lat, max_lat),
+        lon_filter,
+    )
 
 
 class HiveService(BaseService[models.Hive]):
@@ -14,11 +62,106 @@ class HiveService(BaseService[models.Hive]):
     async def create_hive(
         self, db: AsyncSession, hive: schemas.HiveCreate, user_id: int
     ) -> models.Hive:
-        db_hive = models.Hive(**hive.model_dump(), user_id=user_id)
-        db.add(db_hive)
-        await db.commit()
-        await db.refresh(db_hive)
-        return db_hive
+        return await self.create(
+            db,
+            **hive.model_dump(),
+            user_id=user_id,
+            geohash=_geohash(hive.latitude, hive.longitude),
+        )
+
+    async def update_hive(
+        self, db: AsyncSession, hive_id: int, hive: schemas.HiveUpdate
+    ) -> Optional[models.Hive]:
+        update_data = hive.model_dump(exclude_unset=True)
+        if "latitude" in update_data or "longitude" in update_data:
+            update_data["geohash"] = _geohash(hive.latitude, hive.longitude)
+        return await self.update(db, hive_id, **update_data)
+
+    async def get_hives_nearby(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: int = 100
+    ) -> Sequence[Row]:
+        """Rows with the HiveNearby fields, distance_km included, for respond_trusted"""
+        distance = _distance_km(latitude, longitude)
+        query = (
+            self.select_fields(schemas.HiveResponse)
+            .add_columns(distance.label("distance_km"))
+            .filter(self.model.user_id == user_id)
+            .filter(nearby_filter(latitude, longitude, radius_km))
+            .order_by(distance)
+            .limit(limit)
+        )
+        return await self.get_rows(db, query)
+
+    async def get_hives_in_bbox(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        min_lat: float,
+        min_lon: float,
+        max_lat: float,
+        max_lon: float,
+        limit: int = 100
+    ) -> List[models.Hive]:
+        query = (
+            select(self.model)
+            .filter(self.model.user_id == user_id)
+            .filter(bbox_filter(min_lat, min_lon, max_lat, max_lon))
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def get_owned_hive_ids(
+        self, db: AsyncSession, user_id: int, hive_ids: Iterable[int]
+    ) -> Set[int]:
+        hive_ids = set(hive_ids)
+        if not hive_ids:
+            return set()
+        query = (
+            select(self.model.id)
+            .filter(self.model.id.in_(hive_ids))
+            .filter(self.model.user_id == user_id)
+        )
+        result = await db.execute(query)
+        return set(result.scalars().all())
+
+    async def copy_hives(
+        self, db: AsyncSession, hives: List[schemas.HiveCreate], user_id: int
+    ) -> int:
+        now = datetime.utcnow()
+        records = [
+            (
+                hive.name,
+                hive.location,
+                hive.description,
+                hive.status,
+                hive.queen_year,
+                hive.frames_count,
+                hive.latitude,
+                hive.longitude,
+                _geohash(hive.latitude, hive.longitude),
+                user_id,
+                now,
+                now,
+            )
+            for hive in hives
+        ]
+        return await self.copy_many(
+            db,
+            (
+                "name", "location", "description", "status", "queen_year",
+                "frames_count", "latitude", "longitude", "geohash",
+                "user_id", "created_at", "updated_at",
+            ),
+            records,
+        )
 
     async def get_hives_by_user(
         self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
@@ -61,22 +204,6 @@ class HiveService(BaseService[models.Hive]):
         stats_result = await db.execute(stats_query)
         stats = stats_result.one()
 
-        # Create response dictionary
-        inspections = [
-            {
-                "id": inspection.id,
-                "hive_id": inspection.hive_id,
-                "temperature": inspection.temperature,
-                "humidity": inspection.humidity,
-                "weight": inspection.weight,
-                "notes": inspection.notes,
-                "user_id": inspection.user_id,
-                "created_at": inspection.created_at,
-                "updated_at": inspection.updated_at
-            }
-            for inspection in hive.inspections
-        ]
-
         return {
             "id": hive.id,
             "name": hive.name,
@@ -85,10 +212,12 @@ class HiveService(BaseService[models.Hive]):
             "status": hive.status,  # Убираем .value, просто используем строку
             "queen_year": hive.queen_year,
             "frames_count": hive.frames_count,
+            "latitude": hive.latitude,
+            "longitude": hive.longitude,
             "user_id": hive.user_id,
             "created_at": hive.created_at,
             "updated_at": hive.updated_at,
-            "inspections": inspections,
+            "inspections": hive.inspections,
             "avg_temperature": stats.avg_temperature,
             "avg_humidity": stats.avg_humidity,
             "avg_weight": stats.avg_weight,
@@ -103,25 +232,43 @@ class InspectionService(BaseService[models.Inspection]):
     async def create_inspection(
         self, db: AsyncSession, inspection: schemas.InspectionCreate, user_id: int
     ) -> models.Inspection:
-        db_inspection = models.Inspection(
-            **inspection.model_dump(),
-            user_id=user_id
+        return await self.create(db, **inspection.model_dump(), user_id=user_id)
+
+    async def copy_inspections(
+        self, db: AsyncSession, inspections: List[schemas.InspectionImport], user_id: int
+    ) -> int:
+        now = datetime.utcnow()
+        records = [
+            (
+                inspection.hive_id,
+                inspection.temperature,
+                inspection.humidity,
+                inspection.weight,
+                inspection.notes,
+                user_id,
+                inspection.created_at or now,
+                now,
+            )
+            for inspection in inspections
+        ]
+        return await self.copy_many(
+            db,
+            (
+                "hive_id", "temperature", "humidity", "weight", "notes",
+                "user_id", "created_at", "updated_at",
+            ),
+            records,
         )
-        db.add(db_inspection)
-        await db.commit()
-        await db.refresh(db_inspection)
-        return db_inspection
 
     async def get_inspections_by_hive(
         self, db: AsyncSession, hive_id: int, user_id: int, skip: int = 0, limit: int = 100
-    ) -> List[models.Inspection]:
+    ) -> Sequence[Row]:
         query = (
-            select(self.model)
+            self.select_fields(schemas.InspectionResponse)
             .filter(self.model.hive_id == hive_id)
             .filter(self.model.user_id == user_id)
             .order_by(self.model.created_at.desc())
             .offset(skip)
             .limit(limit)
         )
-        result = await db.execute(query)
-        return result.scalars().all() 
\ No newline at end of file
+        return await self.get_rows(db, query)
\ No newline at end of file
@@ -3,8 +3,13 @@ from fastapi import FastAPI, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from datetime import datetime
+import os
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db, pool_status
+from shared.responses import ORJSONResponse, respond, respond_trusted
+from shared.admission import BULK, INGESTION
+from shared.metrics import INGESTED, RATE_LIMITED, instrument
+from shared.rate_limit import RATE_LIMIT_ENABLED, RATE_LIMIT_REDIS, RateLimiter, retry_after
 from services.auth.service import UserService
 from services.auth.models import User
 # Импортируем модель Hive для правильной работы foreign key
@@ -12,18 +17,46 @@ from services.hive.models import Hive
 from . import schemas, models
 from .service import SensorService, MeasurementService, AlertService
 
-app = FastAPI(title="Monitoring Service", version="1.0.0")
+app = FastAPI(
+    title="Monitoring Service", version="1.0.0", default_response_class=ORJSONResponse
+)
 
 sensor_service = SensorService()
 measurement_service = MeasurementService()
 alert_service = AlertService()
 user_service = UserService()
 
-
-@app.get("/health")
-async def health():
-    """Health check endpoint"""
-    return {"status": "healthy", "service": "monitoring"}
+rate_limit_redis_url = os.getenv("REDIS_URL") if RATE_LIMIT_REDIS else None
+user_rate_limit = RateLimiter("user", redis_url=rate_limit_redis_url)
+sensor_rate_limit = RateLimiter("sensor", redis_url=rate_limit_redis_url)
+user_rate_limited = RATE_LIMITED.labels("monitoring", "user")
+sensor_rate_limited = RATE_LIMITED.labels("monitoring", "sensor")
+
+
+async def check_ingestion_rate(user: User, sensor_id: int) -> None:
+    """429 when the sensor or its owner is over the plan's rate; runs before any query"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    # Per (user, sensor), so nobody can drain someone else's sensor budget
+    wait = await sensor_rate_limit.acquire(user.plan, (user.id, sensor_id))
+    if wait:
+        sensor_rate_limited.inc()
+    else:
+        wait = await user_rate_limit.acquire(user.plan, user.id)
+        if wait:
+            user_rate_limited.inc()
+            # The sensor's token wasn't used
+            await sensor_rate_limit.refund(user.plan, (user.id, sensor_id))
+    if wait:
+        raise HTTPException(
+            status_code=429, detail="Rate limit exceeded", headers={"Retry-After": retry_after(wait)}
+        )
+
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool usage and checkout wait times"""
+    return pool_status()
 
 
 @app.post("/sensors/", response_model=schemas.Sensor)
@@ -35,19 +68,31 @@ async def create_sensor(
     return await sensor_service.create_sensor(db=db, sensor=sensor, user_id=current_user.id)
 
 
+@app.post("/sensors/bulk/", response_model=List[schemas.Sensor])
+async def create_sensors(
+    sensors: List[schemas.SensorCreate],
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Provision many sensors in one round-trip"""
+    created = await sensor_service.create_sensors(db=db, sensors=sensors, user_id=current_user.id)
+    return respond(List[schemas.Sensor], created)
+
+
 @app.get("/hives/{hive_id}/sensors/", response_model=List[schemas.Sensor])
 async def read_sensors(
     hive_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
-    return await sensor_service.get_sensors_by_hive(db, hive_id, current_user.id)
+    sensors = await sensor_service.get_sensors_by_hive(db, hive_id, current_user.id)
+    return respond(List[schemas.Sensor], sensors)
 
 
 @app.get("/sensors/{sensor_id}/stats/", response_model=schemas.SensorStats)
 async def read_sensor_stats(
     sensor_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
     stats = await sensor_service.get_sensor_stats(db, sensor_id, current_user.id)
@@ -62,12 +107,15 @@ async def create_measurement(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
+    await check_ingestion_rate(current_user, measurement.sensor_id)
     # Проверяем, что датчик принадлежит пользователю
-    sensor = await sensor_service.get(db, measurement.sensor_id)
+    sensor = await sensor_service.get_owner(db, measurement.sensor_id)
     if not sensor or sensor.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Sensor not found")
     
-    return await measurement_service.create_measurement(db=db, measurement=measurement)
+    db_measurement = await measurement_service.create_measurement(db=db, measurement=measurement)
+    INGESTED.labels("monitoring", "measurement").inc()
+    return db_measurement
 
 
 @app.get("/sensors/{sensor_id}/measurements/", response_model=List[schemas.Measurement])
@@ -76,17 +124,41 @@ async def read_measurements(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
     # Проверяем, что датчик принадлежит пользователю
-    sensor = await sensor_service.get(db, sensor_id)
+    sensor = await sensor_service.get_owner(db, sensor_id)
     if not sensor or sensor.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Sensor not found")
     
-    return await measurement_service.get_measurements_by_sensor(
+    measurements = await measurement_service.get_measurements_by_sensor(
         db, sensor_id, start_date, end_date, limit
     )
+    return respond_trusted(schemas.Measurement, measurements)
+
+
+@app.get("/rate-limits/me/", response_model=schemas.RateLimitUsage)
+async def read_rate_limits(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Ingestion limits of the current user's plan and the tokens left, overall and per sensor"""
+    sensor_ids = await sensor_service.get_sensor_ids(db, current_user.id)
+    user_rate, user_burst = user_rate_limit.limit(current_user.plan)
+    sensor_rate, sensor_burst = sensor_rate_limit.limit(current_user.plan)
+    (user_remaining,) = await user_rate_limit.usage(current_user.plan, [current_user.id])
+    sensor_remaining = await sensor_rate_limit.usage(
+        current_user.plan, [(current_user.id, sensor_id) for sensor_id in sensor_ids]
+    )
+    return {
+        "plan": current_user.plan,
+        "user": {"rate": user_rate, "burst": user_burst, "remaining": user_remaining},
+        "sensors": [
+            {"sensor_id": sensor_id, "rate": sensor_rate, "burst": sensor_burst, "remaining": remaining}
+            for sensor_id, remaining in zip(sensor_ids, sensor_remaining)
+        ],
+    }
 
 
 @app.post("/alerts/", response_model=schemas.Alert)
@@ -96,7 +168,7 @@ async def create_alert(
     current_user: User = Depends(user_service.get_current_user)
 ):
     # Проверяем, что датчик и улей принадлежат пользователю
-    sensor = await sensor_service.get(db, alert.sensor_id)
+    sensor = await sensor_service.get_owner(db, alert.sensor_id)
     if not sensor or sensor.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Sensor not found")
     
@@ -106,10 +178,22 @@ async def create_alert(
 @app.get("/alerts/", response_model=List[schemas.Alert])
 async def read_alerts(
     hive_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    alerts = await alert_service.get_active_alerts(db, current_user.id, hive_id)
+    return respond_trusted(schemas.Alert, alerts)
+
+
+@app.put("/alerts/resolve/", response_model=List[schemas.Alert])
+async def resolve_alerts(
+    resolve: schemas.AlertBulkResolve,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
-    return await alert_service.get_active_alerts(db, current_user.id, hive_id)
+    """Resolve several of the current user's alerts; unknown or foreign ids are skipped"""
+    alerts = await alert_service.resolve_alerts(db, resolve.ids, current_user.id)
+    return respond(List[schemas.Alert], alerts)
 
 
 @app.put("/alerts/{alert_id}/resolve/", response_model=schemas.Alert)
@@ -121,4 +205,12 @@ async def resolve_alert(
     alert = await alert_service.resolve_alert(db, alert_id, current_user.id)
     if alert is None:
         raise HTTPException(status_code=404, detail="Alert not found")
-    return alert
\ No newline at end of file
+    return alert
+
+
+instrument(app, "monitoring", priorities={
+    "POST /measurements/": INGESTION,
+    "POST /alerts/": INGESTION,
+    "POST /sensors/bulk/": BULK,
+    "PUT /alerts/resolve/": BULK,
+})
@@ -1,6 +1,6 @@
 from typing import Optional, List
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from shared.base_models import BaseSchema
 
 
@@ -59,6 +59,10 @@ class AlertUpdate(BaseSchema):
     is_resolved: bool
 
 
+class AlertBulkResolve(BaseSchema):
+    ids: List[int] = Field(..., min_length=1, max_length=10000)
+
+
 class Alert(AlertBase):
     id: int
     user_id: int
@@ -75,4 +79,17 @@ class SensorStats(BaseSchema):
     max_value: Optional[float]
     avg_value: Optional[float]
     battery_level: Optional[float]
-    last_measurement_time: Optional[datetime] 
\ No newline at end of file
+    last_measurement_time: Optional[datetime] 
+
+
+class RateLimitBucket(BaseSchema):
+    sensor_id: Optional[int] = None
+    rate: float
+    burst: float
+    remaining: float
+
+
+class RateLimitUsage(BaseSchema):
+    plan: str
+    user: RateLimitBucket
+    sensors: List[RateLimitBucket]
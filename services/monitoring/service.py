@@ -1,12 +1,22 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence
 from datetime import datetime, timedelta
-from sqlalchemy import select, func
+from sqlalchemy import Row, select, update, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from shared.hot_queries import hot_query
 from shared.service import BaseService
 from . import models, schemas
 
+SENSOR_OWNER = hot_query("sensor_owner", "SELECT id, user_id, hive_id FROM sensors WHERE id = $1")
+_MEASUREMENT_COLUMNS = ", ".join(models.Measurement.__table__.columns.keys())
+INSERT_MEASUREMENT = hot_query(
+    "insert_measurement",
+    "INSERT INTO measurements (sensor_id, value, battery_level, created_at, updated_at)"
+    f" VALUES ($1, $2, $3, $4, $4) RETURNING {_MEASUREMENT_COLUMNS}",
+    write=True,
+)
+
 
 class SensorService(BaseService[models.Sensor]):
     def __init__(self):
@@ -15,11 +25,27 @@ class SensorService(BaseService[models.Sensor]):
     async def create_sensor(
         self, db: AsyncSession, sensor: schemas.SensorCreate, user_id: int
     ) -> models.Sensor:
-        db_sensor = models.Sensor(**sensor.model_dump(), user_id=user_id)
-        db.add(db_sensor)
-        await db.commit()
-        await db.refresh(db_sensor)
-        return db_sensor
+        return await self.create(db, **sensor.model_dump(), user_id=user_id)
+
+    async def create_sensors(
+        self, db: AsyncSession, sensors: List[schemas.SensorCreate], user_id: int
+    ) -> List[models.Sensor]:
+        return await self.create_many(
+            db, [{**sensor.model_dump(), "user_id": user_id} for sensor in sensors]
+        )
+
+    async def get_sensor_ids(self, db: AsyncSession, user_id: int) -> List[int]:
+        query = select(self.model.id).filter(self.model.user_id == user_id).order_by(self.model.id)
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def get_owner(self, db: AsyncSession, sensor_id: int):
+        """Just enough of a sensor for ownership checks: id, user_id and hive_id"""
+        if SENSOR_OWNER.enabled:
+            return await SENSOR_OWNER.fetchrow(db, sensor_id)
+        query = select(self.model.id, self.model.user_id, self.model.hive_id).filter(self.model.id == sensor_id)
+        result = await db.execute(query)
+        return result.one_or_none()
 
     async def get_sensors_by_hive(
         self, db: AsyncSession, hive_id: int, user_id: int
@@ -82,11 +108,11 @@ class MeasurementService(BaseService[models.Measurement]):
     async def create_measurement(
         self, db: AsyncSession, measurement: schemas.MeasurementCreate
     ) -> models.Measurement:
-        db_measurement = models.Measurement(**measurement.model_dump())
-        db.add(db_measurement)
-        await db.commit()
-        await db.refresh(db_measurement)
-        return db_measurement
+        if INSERT_MEASUREMENT.enabled:
+            return await INSERT_MEASUREMENT.fetchrow(
+                db, measurement.sensor_id, measurement.value, measurement.battery_level, datetime.utcnow()
+            )
+        return await self.create(db, **measurement.model_dump())
 
     async def get_measurements_by_sensor(
         self,
@@ -95,8 +121,8 @@ class MeasurementService(BaseService[models.Measurement]):
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         limit: int = 100
-    ) -> List[models.Measurement]:
-        query = select(self.model).filter(self.model.sensor_id == sensor_id)
+    ) -> Sequence[Row]:
+        query = self.select_fields(schemas.Measurement).filter(self.model.sensor_id == sensor_id)
 
         if start_date:
             query = query.filter(self.model.created_at >= start_date)
@@ -104,8 +130,7 @@ class MeasurementService(BaseService[models.Measurement]):
             query = query.filter(self.model.created_at <= end_date)
 
         query = query.order_by(self.model.created_at.desc()).limit(limit)
-        result = await db.execute(query)
-        return result.scalars().all()
+        return await self.get_rows(db, query)
 
 
 class AlertService(BaseService[models.Alert]):
@@ -115,17 +140,13 @@ class AlertService(BaseService[models.Alert]):
     async def create_alert(
         self, db: AsyncSession, alert: schemas.AlertCreate, user_id: int
     ) -> models.Alert:
-        db_alert = models.Alert(**alert.model_dump(), user_id=user_id)
-        db.add(db_alert)
-        await db.commit()
-        await db.refresh(db_alert)
-        return db_alert
+        return await self.create(db, **alert.model_dump(), user_id=user_id)
 
     async def get_active_alerts(
         self, db: AsyncSession, user_id: int, hive_id: Optional[int] = None
-    ) -> List[models.Alert]:
+    ) -> Sequence[Row]:
         query = (
-            select(self.model)
+            self.select_fields(schemas.Alert)
             .filter(self.model.user_id == user_id)
             .filter(self.model.is_resolved == False)
         )
@@ -134,18 +155,28 @@ class AlertService(BaseService[models.Alert]):
             query = query.filter(self.model.hive_id == hive_id)
 
         query = query.order_by(self.model.created_at.desc())
-        result = await db.execute(query)
-        return result.scalars().all()
+        return await self.get_rows(db, query)
 
     async def resolve_alert(
         self, db: AsyncSession, alert_id: int, user_id: int
     ) -> Optional[models.Alert]:
-        alert = await self.get(db, alert_id)
-        if not alert or alert.user_id != user_id:
-            return None
+        # Ownership check and update in one statement
+        query = (
+            update(self.model)
+            .where(self.model.id == alert_id)
+            .where(self.model.user_id == user_id)
+            .values(is_resolved=True, updated_at=datetime.utcnow())
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
 
-        alert.is_resolved = True
-        alert.updated_at = datetime.utcnow()
-        await db.commit()
-        await db.refresh(alert)
-        return alert 
\ No newline at end of file
+    async def resolve_alerts(
+        self, db: AsyncSession, alert_ids: List[int], user_id: int
+    ) -> List[models.Alert]:
+        return await self.update_many(
+            db,
+            [self.model.id.in_(alert_ids), self.model.user_id == user_id, self.model.is_resolved == False],
+            {"is_resolved": True, "updated_at": datetime.utcnow()},
+        ) 
\ No newline at end of file
@@ -0,0 +1,101 @@
+import abc
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .models import NotificationType, NotificationPriority
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        # Permanent errors (bad address, rejected content) go straight to the dead-letter queue
+        self.permanent = permanent
+
+
+@dataclass
+class OutboundMessage:
+    notification_id: int
+    user_id: int
+    notification_type: NotificationType
+    priority: NotificationPriority
+    subject: str
+    body: str
+    recipient: Optional[str] = None  # email address / phone number, None for push
+
+
+class ChannelBackend(abc.ABC):
+    @abc.abstractmethod
+    async def send(self, message: OutboundMessage) -> None:
+        """Deliver one message; raises DeliveryError on failure"""
+
+    async def close(self) -> None:
+        pass
+
+
+class LoggingBackend(ChannelBackend):
+    """Local stand-in that only writes deliveries to the log"""
+
+    async def send(self, message: OutboundMessage) -> None:
+        logger.info(
+            "Delivered %s notification %s to user %s (%s): %s",
+            message.notification_type.value,
+            message.notification_id,
+            message.user_id,
+            message.recipient,
+            message.subject,
+        )
+
+
+class InMemoryBackend(ChannelBackend):
+    """Local stand-in for tests: keeps delivered messages, can simulate failures"""
+
+    def __init__(self, fail_with: Optional[str] = None):
+        self.sent: List[OutboundMessage] = []
+        self.fail_with = fail_with
+
+    async def send(self, message: OutboundMessage) -> None:
+        if self.fail_with:
+            raise DeliveryError(self.fail_with)
+        self.sent.append(message)
+
+
+class ChannelRegistry:
+    def __init__(self, backends: Dict[NotificationType, ChannelBackend]):
+        self.backends = backends
+
+    def get(self, notification_type: NotificationType) -> Optional[ChannelBackend]:
+        return self.backends.get(notification_type)
+
+    async def close(self) -> None:
+        for backend in self.backends.values():
+            await backend.close()
+
+    @classmethod
+    def from_env(cls) -> "ChannelRegistry":
+        backend_names = {
+            NotificationType.EMAIL: os.getenv("EMAIL_BACKEND", "logging"),
+            NotificationType.SMS: os.getenv("SMS_BACKEND", "logging"),
+            NotificationType.PUSH: os.getenv("PUSH_BACKEND", "logging"),
+        }
+        return cls({
+            notification_type: _build_backend(name)
+            for notification_type, name in backend_names.items()
+        })
+
+
+def _build_backend(name: str) -> ChannelBackend:
+    if name == "logging":
+        return LoggingBackend()
+    if name == "memory":
+        return InMemoryBackend()
+    if name == "smtp":
+        from .smtp import SMTPEmailBackend
+        return SMTPEmailBackend.from_env()
+    if name == "stream":
+        from .stream import StreamPushBackend
+        return StreamPushBackend()
+    raise ValueError(f"Unknown channel backend: {name}")
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import math
+import os
+import signal
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import start_http_server
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from shared.database import SessionLocal
+from . import models
+from .channels import ChannelRegistry, DeliveryError, OutboundMessage
+from .retry import CircuitBreakers, RetryPolicy
+from .scheduler import NotificationScheduler
+from .service import NotificationService, NotificationSettingsService, NotificationDigestService
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("DISPATCHER_BATCH_SIZE", "100"))
+CONCURRENCY = int(os.getenv("DISPATCHER_CONCURRENCY", "20"))
+POLL_INTERVAL = float(os.getenv("DISPATCHER_POLL_INTERVAL", "1.0"))
+SEND_TIMEOUT = float(os.getenv("DISPATCHER_SEND_TIMEOUT", "30.0"))
+# Claimed rows are not due again for this long. Never shorter than a batch can take:
+# ceil(batch / concurrency) rounds of sends, each up to the send timeout, plus LEASE_MARGIN
+LEASE_SECONDS = float(os.getenv("DISPATCHER_LEASE_SECONDS", "0"))
+LEASE_MARGIN = float(os.getenv("DISPATCHER_LEASE_MARGIN", "30.0"))
+# Port for the Prometheus endpoint of the worker (SMTP pool, DB pool); 0 = off
+METRICS_PORT = int(os.getenv("DISPATCHER_METRICS_PORT", "0"))
+
+
+def _recipient(
+    notification: models.Notification, settings: Optional[models.NotificationSettings]
+) -> Optional[str]:
+    """Address for the notification's channel, or None if the user can't receive it"""
+    if settings is None:
+        # Without settings only push (enabled by default, addressed by user id) can be delivered
+        if notification.notification_type == models.NotificationType.PUSH:
+            return str(notification.user_id)
+        return None
+    if notification.notification_type == models.NotificationType.EMAIL:
+        return settings.email_address if settings.email_enabled else None
+    if notification.notification_type == models.NotificationType.SMS:
+        return settings.phone_number if settings.sms_enabled else None
+    if notification.notification_type == models.NotificationType.PUSH:
+        return str(notification.user_id) if settings.push_enabled else None
+    return None
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        registry: ChannelRegistry,
+        scheduler: Optional[NotificationScheduler] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        session_factory: async_sessionmaker = SessionLocal,
+        batch_size: int = BATCH_SIZE,
+        concurrency: int = CONCURRENCY,
+        poll_interval: float = POLL_INTERVAL,
+        send_timeout: float = SEND_TIMEOUT,
+        lease_seconds: float = LEASE_SECONDS,
+    ):
+        self.registry = registry
+        self.scheduler = scheduler or NotificationScheduler()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers = CircuitBreakers()
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.send_timeout = send_timeout
+        self.lease_seconds = max(
+            lease_seconds, math.ceil(batch_size / concurrency) * send_timeout + LEASE_MARGIN
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.notification_service = NotificationService()
+        self.settings_service = NotificationSettingsService()
+        self.digest_service = NotificationDigestService()
+
+    def _build_message(
+        self,
+        notification: models.Notification,
+        settings: Optional[models.NotificationSettings],
+    ) -> OutboundMessage:
+        if self.registry.get(notification.notification_type) is None:
+            raise DeliveryError(
+                f"No backend for channel {notification.notification_type.value}", permanent=True
+            )
+        recipient = _recipient(notification, settings)
+        if recipient is None:
+            raise DeliveryError(
+                f"Channel {notification.notification_type.value} is disabled or has no address",
+                permanent=True,
+            )
+        return OutboundMessage(
+            notification_id=notification.id,
+            user_id=notification.user_id,
+            notification_type=notification.notification_type,
+            priority=notification.priority,
+            subject=notification.subject,
+            body=notification.body,
+            recipient=recipient,
+        )
+
+    async def _deliver(self, message: OutboundMessage) -> Optional[DeliveryError]:
+        """Send one message; returns the failure or None on success"""
+        backend = self.registry.get(message.notification_type)
+        breaker = self.breakers.get(message.notification_type)
+        async with self.semaphore:
+            try:
+                await asyncio.wait_for(backend.send(message), self.send_timeout)
+            except Exception as e:
+                logger.warning("Delivery of notification %s failed: %r", message.notification_id, e)
+                if isinstance(e, DeliveryError) and e.permanent:
+                    # The provider answered, so it is up
+                    breaker.record_success()
+                    return e
+                breaker.record_failure()
+                return e if isinstance(e, DeliveryError) else DeliveryError(
+                    str(e) or e.__class__.__name__
+                )
+        breaker.record_success()
+        return None
+
+    def _admit(self, notification: models.Notification) -> float:
+        """0 if the notification may be sent now, otherwise seconds to defer it"""
+        breaker = self.breakers.get(notification.notification_type)
+        # Breaker first, so rate-limit tokens are only spent on sends that will be attempted
+        if not breaker.acquire():
+            return breaker.retry_after()
+        delay = self.scheduler.acquire(notification.notification_type, notification.user_id)
+        if delay > 0:
+            # Not sending after all: a reserved half-open probe goes back
+            breaker.release()
+            return delay
+        return 0.0
+
+    async def _claim(self, db: AsyncSession) -> List[models.Notification]:
+        """Claim one batch across priority lanes, highest priority first"""
+        quotas = self.scheduler.lane_quotas(self.batch_size)
+        claimed: Dict[models.NotificationPriority, List[models.Notification]] = {}
+        for priority, quota in quotas:
+            claimed[priority] = list(await self.notification_service.claim_pending_notifications(
+                db, priority, limit=quota
+            ))
+
+        # Work-conserving: capacity left by drained lanes goes to busy ones in priority order
+        spare = self.batch_size - sum(len(rows) for rows in claimed.values())
+        for priority, quota in quotas:
+            if spare <= 0:
+                break
+            if len(claimed[priority]) < quota:
+                continue
+            extra = await self.notification_service.claim_pending_notifications(
+                db, priority, limit=spare,
+                exclude_ids=[notification.id for notification in claimed[priority]],
+            )
+            claimed[priority].extend(extra)
+            spare -= len(extra)
+
+        return [notification for priority, _ in quotas for notification in claimed[priority]]
+
+    async def _process_batch(self, db: AsyncSession) -> int:
+        # Short transaction: claim, then lease the rows by pushing next_attempt_at past the
+        # deliveries. Row locks and the pool connection are released before anything is sent,
+        # and a crashed worker's rows become due again once the lease runs out.
+        async with db.begin():
+            notifications = await self._claim(db)
+            if not notifications:
+                return 0
+            settings = await self.settings_service.get_settings_for_users(
+                db, (notification.user_id for notification in notifications)
+            )
+            now = datetime.utcnow()
+            lease_until = now + timedelta(seconds=self.lease_seconds)
+            await self.notification_service.defer_many(
+                db, {notification.id: lease_until for notification in notifications}
+            )
+
+        ready: List[Tuple[models.Notification, OutboundMessage]] = []
+        sent: Dict[int, Optional[str]] = {}
+        deferred: Dict[int, datetime] = {}
+        failures: List[Tuple[models.Notification, str, bool]] = []
+        for notification in notifications:
+            user_settings = settings.get(notification.user_id)
+            if not self.settings_service.accepts(
+                user_settings, notification.notification_type, notification.priority
+            ):
+                sent[notification.id] = "Suppressed by user notification settings"
+                continue
+            try:
+                message = self._build_message(notification, user_settings)
+            except DeliveryError as e:
+                failures.append((notification, str(e), e.permanent))
+                continue
+            delay = self._admit(notification)
+            if delay > 0:
+                deferred[notification.id] = now + timedelta(seconds=min(delay, 3600))
+            else:
+                ready.append((notification, message))
+
+        errors: List[Optional[DeliveryError]] = await asyncio.gather(*[
+            self._deliver(message) for _, message in ready
+        ])
+        for (notification, _), error in zip(ready, errors):
+            if error is None:
+                sent[notification.id] = None
+            else:
+                failures.append((notification, str(error), error.permanent))
+
+        async with db.begin():
+            # A worker that overran its lease may race another one that re-claimed the rows;
+            # only rows still carrying our lease get our results
+            leased = await self.notification_service.lock_leased(
+                db, [notification.id for notification in notifications], lease_until
+            )
+            if len(leased) < len(notifications):
+                logger.warning(
+                    "Lease expired for %d notifications, leaving their results to the new owner",
+                    len(notifications) - len(leased),
+                )
+                sent = {key: value for key, value in sent.items() if key in leased}
+                deferred = {key: value for key, value in deferred.items() if key in leased}
+                failures = [failure for failure in failures if failure[0].id in leased]
+            await self.notification_service.mark_many_as_sent(db, sent)
+            await self.notification_service.defer_many(db, deferred)
+            await self.notification_service.record_failures(db, failures, self.retry_policy)
+        return len(notifications)
+
+    async def run_once(self) -> int:
+        """Claim, deliver and record one batch; returns the number of claimed rows.
+
+        Deliveries run outside any transaction, between the claim and the result.
+        """
+        async with self.session_factory() as db:
+            # Closed digest windows become regular pending notifications first
+            async with db.begin():
+                await self.digest_service.flush_due_digests(db, limit=self.batch_size)
+            return await self._process_batch(db)
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            try:
+                processed = await self.run_once()
+            except Exception:
+                logger.exception("Dispatcher batch failed")
+                processed = 0
+            if processed < self.batch_size:
+                # Queue drained; wait before polling again
+                try:
+                    await asyncio.wait_for(stop_event.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    registry = ChannelRegistry.from_env()
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+    try:
+        await Dispatcher(registry, NotificationScheduler.from_env()).run(stop_event)
+    finally:
+        await registry.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,13 @@
-from typing import List
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from shared.database import get_db
+from shared.database import get_db, get_read_db, pool_status
+from shared.responses import ORJSONResponse, respond, respond_trusted
+from shared.admission import ADMIN, BULK, EXEMPT, INGESTION
+from shared.metrics import instrument, register_cache
 from services.auth.service import UserService
 from services.auth.models import User
 from . import schemas
@@ -11,8 +16,26 @@ from .service import (
     NotificationSettingsService,
     NotificationService,
 )
+from .stream import StreamHub, StreamPublisher, sse_frame
+from .templating import template_cache
 
-app = FastAPI(title="Notification Service", version="1.0.0")
+stream_hub = StreamHub()
+stream_publisher = StreamPublisher(stream_hub)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await stream_publisher.start()
+    yield
+    await stream_publisher.close()
+
+
+app = FastAPI(
+    title="Notification Service",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 template_service = NotificationTemplateService()
 settings_service = NotificationSettingsService()
@@ -20,6 +43,29 @@ notification_service = NotificationService()
 user_service = UserService()
 
 
+def _stream_events(notifications) -> List[dict]:
+    return [
+        {
+            "user_id": notification.user_id,
+            "event": "notification",
+            "data": schemas.Notification.model_validate(notification).model_dump_json(),
+            "event_id": notification.id,
+        }
+        for notification in notifications
+    ]
+
+
+def _resync_events(user_ids) -> List[dict]:
+    # COPY returns no rows to render; clients refetch GET /notifications/ on resync
+    return [{"user_id": user_id, "event": "resync", "data": "{}"} for user_id in user_ids]
+
+
+@app.get("/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool usage and checkout wait times"""
+    return pool_status()
+
+
 @app.post("/templates/", response_model=schemas.NotificationTemplate)
 async def create_template(
     template: schemas.NotificationTemplateCreate,
@@ -31,14 +77,30 @@ async def create_template(
     return await template_service.create_template(db=db, template=template)
 
 
+@app.put("/templates/{template_id}", response_model=schemas.NotificationTemplate)
+async def update_template(
+    template_id: int,
+    template: schemas.NotificationTemplateUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    db_template = await template_service.update_template(db, template_id, template)
+    if db_template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return db_template
+
+
 @app.get("/templates/", response_model=List[schemas.NotificationTemplate])
 async def read_templates(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
-    return await template_service.get_all(db, skip=skip, limit=limit)
+    templates = await template_service.get_all(db, skip=skip, limit=limit)
+    return respond(List[schemas.NotificationTemplate], templates)
 
 
 @app.get("/settings/me/", response_model=schemas.NotificationSettings)
@@ -83,9 +145,14 @@ async def update_user_settings(
     return updated_settings
 
 
-@app.post("/notifications/", response_model=schemas.Notification)
+@app.post(
+    "/notifications/",
+    response_model=schemas.Notification,
+    responses={204: {"description": "Dropped by the user's notification settings"}},
+)
 async def create_notification(
     notification: schemas.NotificationCreate,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
@@ -93,22 +160,141 @@ async def create_notification(
     template = await template_service.get(db, notification.template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
+
+    # Отбрасываем уведомления ниже min_priority до постановки в очередь
+    settings = await settings_service.get_user_settings(db, current_user.id)
+    if not settings_service.accepts(settings, notification.notification_type, notification.priority):
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
     
-    return await notification_service.create_notification(
-        db=db, notification=notification, user_id=current_user.id
+    db_notification = await notification_service.create_notification(
+        db=db, notification=notification, user_id=current_user.id, settings=settings
     )
+    # Background tasks run after the response, i.e. after the transaction has committed
+    background_tasks.add_task(stream_publisher.publish_many, _stream_events([db_notification]))
+    return db_notification
+
+
+@app.post("/notifications/render/", response_model=List[schemas.Notification])
+async def render_notifications(
+    render: schemas.NotificationRender,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Render a template server-side for one or more recipients"""
+    user_ids = list(dict.fromkeys(render.user_ids or [current_user.id]))
+    if user_ids != [current_user.id] and not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    template = await template_service.get(db, render.template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    settings = await settings_service.get_settings_for_users(db, user_ids)
+    recipients = [
+        user_id for user_id in user_ids
+        if settings_service.accepts(settings.get(user_id), template.notification_type, render.priority)
+    ]
+    context = await notification_service.build_render_context(
+        db, render, owner_id=None if current_user.is_superuser else current_user.id
+    )
+    notifications = await notification_service.create_rendered_notifications(
+        db, template, render.priority, recipients, context, settings
+    )
+    background_tasks.add_task(stream_publisher.publish_many, _stream_events(notifications))
+    return respond(List[schemas.Notification], notifications)
+
+
+@app.post("/notifications/broadcast/", response_model=schemas.BroadcastResult)
+async def broadcast_notification(
+    broadcast: schemas.NotificationBroadcast,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Send one template to every user in the audience (e.g. beekeepers in a region)"""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    template = await template_service.get(db, broadcast.template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    result, user_ids = await notification_service.broadcast(db, template, broadcast)
+    background_tasks.add_task(stream_publisher.publish_many, _resync_events(user_ids))
+    return result
 
 
 @app.get("/notifications/", response_model=List[schemas.Notification])
 async def read_notifications(
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(user_service.get_current_user)
 ):
-    return await notification_service.get_user_notifications(
+    notifications = await notification_service.get_user_notifications(
         db, current_user.id, skip=skip, limit=limit
     )
+    return respond_trusted(schemas.Notification, notifications)
+
+
+@app.get("/notifications/counts/", response_model=schemas.NotificationCounts)
+async def read_notification_counts(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    return await notification_service.counter_service.get_counts(db, current_user.id)
+
+
+@app.post("/notifications/read-all/", response_model=schemas.MarkReadResult)
+async def mark_all_notifications_read(
+    up_to_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    marked = await notification_service.mark_as_read(db, current_user.id, up_to_id=up_to_id)
+    return {"marked": marked}
+
+
+@app.post("/notifications/{notification_id}/read/", response_model=schemas.MarkReadResult)
+async def mark_notification_read(
+    notification_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    marked = await notification_service.mark_as_read(
+        db, current_user.id, notification_id=notification_id
+    )
+    return {"marked": marked}
+
+
+@app.get("/notifications/stream/", response_class=StreamingResponse)
+async def stream_notifications(
+    last_event_id: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    """Server-Sent Events feed of the current user's new notifications"""
+    subscriber = stream_hub.subscribe(current_user.id)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many open streams")
+    try:
+        backlog = []
+        if last_event_id is not None:
+            # Subscribed before reading, so nothing falls between the backlog and live events
+            missed = await notification_service.get_user_notifications_since(
+                db, current_user.id, last_event_id, limit=stream_hub.buffer_size
+            )
+            backlog = [
+                sse_frame(event["event"], event["data"], event["event_id"])
+                for event in _stream_events(missed)
+            ]
+    except Exception:
+        stream_hub.unsubscribe(subscriber)
+        raise
+    return StreamingResponse(
+        stream_hub.events(subscriber, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/notifications/pending/", response_model=List[schemas.Notification])
@@ -119,4 +305,46 @@ async def read_pending_notifications(
 ):
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return await notification_service.get_pending_notifications(db, limit=limit) 
\ No newline at end of file
+    notifications = await notification_service.get_pending_notifications(db, limit=limit)
+    return respond(List[schemas.Notification], notifications)
+
+
+@app.get("/notifications/dead-letters/", response_model=List[schemas.NotificationDeadLetter])
+async def read_dead_letters(
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    dead_letters = await notification_service.get_dead_letters(db, skip=skip, limit=limit)
+    return respond(List[schemas.NotificationDeadLetter], dead_letters)
+
+
+@app.post("/notifications/dead-letters/replay/", response_model=schemas.DeadLetterReplayResult)
+async def replay_dead_letters(
+    replay: schemas.DeadLetterReplay,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(user_service.get_current_user)
+):
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    replayed = await notification_service.replay_dead_letters(db, replay)
+    return {"replayed": replayed}
+
+
+instrument(app, "notification", priorities={
+    # Alerts from the other services
+    "POST /notifications/": INGESTION,
+    "POST /notifications/render/": BULK,
+    "POST /notifications/broadcast/": BULK,
+    "POST /notifications/dead-letters/replay/": BULK,
+    "GET /notifications/dead-letters/": ADMIN,
+    "GET /notifications/pending/": ADMIN,
+    "POST /templates/": ADMIN,
+    "PUT /templates/{template_id}": ADMIN,
+    # Held open for the whole session
+    "GET /notifications/stream/": EXEMPT,
+})
+register_cache("notification_templates", template_cache)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Enum, Index, DateTime, text
 import enum
 from shared.database import Base, TimestampMixin
 
@@ -15,6 +15,13 @@ class NotificationPriority(str, enum.Enum):
     HIGH = "high"
 
 
+PRIORITY_RANK = {
+    NotificationPriority.LOW: 0,
+    NotificationPriority.MEDIUM: 1,
+    NotificationPriority.HIGH: 2,
+}
+
+
 class NotificationTemplate(Base, TimestampMixin):
     __tablename__ = "notification_templates"
 
@@ -36,6 +43,9 @@ class NotificationSettings(Base, TimestampMixin):
     email_address = Column(String)
     phone_number = Column(String)
     min_priority = Column(Enum(NotificationPriority), default=NotificationPriority.MEDIUM)
+    # MEDIUM/LOW notifications are coalesced into one digest per channel and window
+    digest_enabled = Column(Boolean, default=False, server_default=text("false"), nullable=False)
+    digest_window_minutes = Column(Integer, default=60, server_default="60", nullable=False)
 
 
 class Notification(Base, TimestampMixin):
@@ -50,4 +60,70 @@ class Notification(Base, TimestampMixin):
     body = Column(String)
     is_sent = Column(Boolean, default=False)
     sent_at = Column(String, nullable=True)
-    error_message = Column(String, nullable=True) 
\ No newline at end of file
+    error_message = Column(String, nullable=True)
+    # Not claimed before this moment (rate-limit deferrals, retry backoff);
+    # NULL = dead-lettered or held in a digest. No default: the ORM leaves out None
+    # on INSERT, so a default would make held rows due. Every insert path sets it.
+    next_attempt_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    digest_id = Column(Integer, ForeignKey("notification_digests.id"), nullable=True, index=True)
+    is_read = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    read_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # One lane per priority; only due-able rows are indexed, so claiming stays O(batch)
+        Index(
+            "ix_notifications_pending",
+            "priority",
+            "next_attempt_at",
+            postgresql_where=text("is_sent = false AND next_attempt_at IS NOT NULL"),
+        ),
+    )
+
+
+class NotificationDigest(Base, TimestampMixin):
+    __tablename__ = "notification_digests"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    notification_type = Column(Enum(NotificationType), nullable=False)
+    window_end = Column(DateTime, nullable=False)
+    item_count = Column(Integer, nullable=False, default=0)
+    flushed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # At most one open digest per user and channel
+        Index(
+            "ux_notification_digests_open",
+            "user_id",
+            "notification_type",
+            unique=True,
+            postgresql_where=text("flushed_at IS NULL"),
+        ),
+        # Due digests are found by window_end, without scanning notifications
+        Index("ix_notification_digests_due", "window_end", postgresql_where=text("flushed_at IS NULL")),
+    )
+
+
+class NotificationDeadLetter(Base, TimestampMixin):
+    __tablename__ = "notification_dead_letters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    notification_id = Column(
+        Integer, ForeignKey("notifications.id", ondelete="CASCADE"), unique=True, nullable=False
+    )
+    user_id = Column(Integer, ForeignKey("users.id"))
+    notification_type = Column(Enum(NotificationType))
+    priority = Column(Enum(NotificationPriority))
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(String, nullable=True) 
+
+
+class NotificationCounter(Base):
+    """Unread notifications per user, channel and priority, kept in step with inserts and mark-read"""
+    __tablename__ = "notification_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    notification_type = Column(Enum(NotificationType), primary_key=True)
+    priority = Column(Enum(NotificationPriority), primary_key=True)
+    unread = Column(Integer, nullable=False, default=0, server_default="0")
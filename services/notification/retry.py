@@ -0,0 +1,101 @@
+import os
+import random
+import time
+from typing import Callable, Dict, Hashable
+
+MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "30"))
+MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "3600"))
+FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+
+class RetryPolicy:
+    """Exponential backoff with random jitter, never shorter than half the base delay"""
+
+    def __init__(
+        self,
+        max_attempts: int = MAX_ATTEMPTS,
+        base_delay: float = BASE_DELAY,
+        max_delay: float = MAX_DELAY,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def exhausted(self, attempts: int) -> bool:
+        return attempts >= self.max_attempts
+
+    def delay(self, attempts: int) -> float:
+        """Seconds to wait before the next try after `attempts` failed ones"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return random.uniform(self.base_delay / 2, max(ceiling, self.base_delay / 2))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """0 if a request may go through now, otherwise seconds until the next probe"""
+        if self.state == self.OPEN:
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if remaining > 0:
+                return remaining
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and self.probe_in_flight:
+            return self.reset_timeout
+        return 0.0
+
+    def acquire(self) -> bool:
+        """Reserve the single half-open probe; always True while closed"""
+        if self.retry_after() > 0:
+            return False
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = True
+        return True
+
+    def release(self) -> None:
+        """Give back a probe reserved by acquire that was never sent"""
+        self.probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+
+
+class CircuitBreakers:
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self.breakers: Dict[Hashable, CircuitBreaker] = {}
+
+    def get(self, key: Hashable) -> CircuitBreaker:
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(**self.breaker_options)
+        return breaker
@@ -0,0 +1,79 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+from shared.rate_limit import KeyedTokenBuckets, TokenBucket
+from .models import NotificationPriority, NotificationType, PRIORITY_RANK
+
+# Share of every batch reserved for each lane; unused capacity flows to the next lane
+DEFAULT_LANE_WEIGHTS = {
+    NotificationPriority.HIGH: 6,
+    NotificationPriority.MEDIUM: 3,
+    NotificationPriority.LOW: 1,
+}
+
+# (tokens per second, burst) roughly matching provider quotas
+DEFAULT_CHANNEL_LIMITS = {
+    NotificationType.EMAIL: (50.0, 100.0),
+    NotificationType.SMS: (10.0, 20.0),
+    NotificationType.PUSH: (500.0, 1000.0),
+}
+DEFAULT_RECIPIENT_LIMIT = (1.0 / 60, 10.0)
+
+# Buckets live in each dispatcher process, so every replica gets an equal share of the quota
+DISPATCHER_REPLICAS = max(1, int(os.getenv("DISPATCHER_REPLICAS", "1")))
+
+
+def _limit_from_env(name: str, default: Tuple[float, float], replicas: int = 1) -> Tuple[float, float]:
+    rate = float(os.getenv(f"{name}_RATE", default[0]))
+    burst = float(os.getenv(f"{name}_BURST", default[1]))
+    return rate / replicas, max(1.0, burst / replicas)
+
+
+class NotificationScheduler:
+    """Weighted priority lanes plus per-channel and per-recipient token buckets"""
+
+    def __init__(
+        self,
+        lane_weights: Optional[Dict[NotificationPriority, int]] = None,
+        channel_limits: Optional[Dict[NotificationType, Tuple[float, float]]] = None,
+        recipient_limit: Tuple[float, float] = DEFAULT_RECIPIENT_LIMIT,
+    ):
+        self.lane_weights = lane_weights or DEFAULT_LANE_WEIGHTS
+        self.channel_buckets = {
+            channel: TokenBucket(rate, burst)
+            for channel, (rate, burst) in (channel_limits or DEFAULT_CHANNEL_LIMITS).items()
+        }
+        self.recipient_buckets = KeyedTokenBuckets(*recipient_limit)
+
+    @classmethod
+    def from_env(cls, replicas: int = DISPATCHER_REPLICAS) -> "NotificationScheduler":
+        """Limits from *_RATE/*_BURST, split evenly across `replicas` dispatcher processes"""
+        channel_limits = {
+            channel: _limit_from_env(channel.name, default, replicas)
+            for channel, default in DEFAULT_CHANNEL_LIMITS.items()
+        }
+        recipient_limit = _limit_from_env("RECIPIENT", DEFAULT_RECIPIENT_LIMIT, replicas)
+        return cls(channel_limits=channel_limits, recipient_limit=recipient_limit)
+
+    def lane_quotas(self, batch_size: int) -> List[Tuple[NotificationPriority, int]]:
+        """Per-lane claim sizes for one batch, highest priority first"""
+        total_weight = sum(self.lane_weights.values())
+        lanes = sorted(self.lane_weights, key=lambda lane: -PRIORITY_RANK[lane])
+        return [
+            (lane, max(1, batch_size * self.lane_weights[lane] // total_weight))
+            for lane in lanes
+        ]
+
+    def acquire(self, channel: NotificationType, user_id: int) -> float:
+        """Take one token from the channel and recipient buckets; returns 0 or the delay"""
+        recipient_bucket = self.recipient_buckets.get((channel, user_id))
+        channel_bucket = self.channel_buckets.get(channel)
+        delay = recipient_bucket.delay()
+        if channel_bucket is not None:
+            delay = max(delay, channel_bucket.delay())
+        if delay > 0:
+            return delay
+        recipient_bucket.consume()
+        if channel_bucket is not None:
+            channel_bucket.consume()
+        return 0.0
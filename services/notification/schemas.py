@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from shared.base_models import BaseSchema
 from .models import NotificationType, NotificationPriority
 
@@ -16,6 +16,12 @@ class NotificationTemplateCreate(NotificationTemplateBase):
     pass
 
 
+class NotificationTemplateUpdate(BaseSchema):
+    subject: Optional[str] = None
+    body: Optional[str] = None
+    notification_type: Optional[NotificationType] = None
+
+
 class NotificationTemplate(NotificationTemplateBase):
     id: int
     created_at: datetime
@@ -29,6 +35,8 @@ class NotificationSettingsBase(BaseSchema):
     email_address: Optional[EmailStr] = None
     phone_number: Optional[str] = None
     min_priority: NotificationPriority = NotificationPriority.MEDIUM
+    digest_enabled: bool = False
+    digest_window_minutes: int = Field(60, ge=1, le=1440)
 
 
 class NotificationSettingsCreate(NotificationSettingsBase):
@@ -42,6 +50,8 @@ class NotificationSettingsUpdate(BaseSchema):
     email_address: Optional[EmailStr] = None
     phone_number: Optional[str] = None
     min_priority: Optional[NotificationPriority] = None
+    digest_enabled: Optional[bool] = None
+    digest_window_minutes: Optional[int] = Field(None, ge=1, le=1440)
 
 
 class NotificationSettings(NotificationSettingsBase):
@@ -63,11 +73,101 @@ class NotificationCreate(NotificationBase):
     pass
 
 
+class NotificationRender(BaseSchema):
+    template_id: int
+    priority: NotificationPriority
+    # Recipients; defaults to the current user. Other users require superuser rights
+    user_ids: Optional[List[int]] = None
+    # Objects exposed to placeholders as {{ hive.* }}, {{ sensor.* }}, {{ alert.* }}
+    hive_id: Optional[int] = None
+    sensor_id: Optional[int] = None
+    alert_id: Optional[int] = None
+    context: Dict[str, Any] = {}
+
+
 class Notification(NotificationBase):
     id: int
     user_id: int
     is_sent: bool
     sent_at: Optional[str] = None
     error_message: Optional[str] = None
+    attempts: int = 0
+    next_attempt_at: Optional[datetime] = None
+    digest_id: Optional[int] = None
+    is_read: bool = False
+    read_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class NotificationCounts(BaseSchema):
+    unread: int
+    by_type: Dict[NotificationType, int] = {}
+    by_priority: Dict[NotificationPriority, int] = {}
+
+
+class MarkReadResult(BaseSchema):
+    marked: int
+
+
+class NotificationDeadLetter(BaseSchema):
+    id: int
+    notification_id: int
+    user_id: int
+    notification_type: NotificationType
+    priority: NotificationPriority
+    attempts: int
+    last_error: Optional[str] = None
     created_at: datetime
-    updated_at: Optional[datetime] = None 
\ No newline at end of file
+
+
+class DeadLetterReplay(BaseSchema):
+    # Either explicit dead-letter ids or a channel filter; limit caps one replay call
+    ids: Optional[List[int]] = None
+    notification_type: Optional[NotificationType] = None
+    limit: int = 1000
+
+
+class DeadLetterReplayResult(BaseSchema):
+    replayed: int 
+
+
+class NearbyArea(BaseSchema):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    radius_km: float = Field(..., gt=0, le=500)
+
+
+class BoundingBox(BaseSchema):
+    min_latitude: float = Field(..., ge=-90, le=90)
+    min_longitude: float = Field(..., ge=-180, le=180)
+    max_latitude: float = Field(..., ge=-90, le=90)
+    max_longitude: float = Field(..., ge=-180, le=180)
+
+
+class BroadcastAudience(BaseSchema):
+    # All active users when empty; filters combine with AND
+    user_ids: Optional[List[int]] = None
+    # Owners of at least one hive in the area
+    nearby: Optional[NearbyArea] = None
+    within: Optional[BoundingBox] = None
+
+    @model_validator(mode="after")
+    def check_single_region(self):
+        if self.nearby is not None and self.within is not None:
+            raise ValueError("nearby and within are mutually exclusive")
+        return self
+
+
+class NotificationBroadcast(BaseSchema):
+    template_id: int
+    priority: NotificationPriority = NotificationPriority.MEDIUM
+    audience: BroadcastAudience = BroadcastAudience()
+    context: Dict[str, Any] = {}
+
+
+class BroadcastResult(BaseSchema):
+    # Recipients left after notification settings; digest users get theirs with the next digest
+    recipients: int
+    queued: int
+    held_in_digest: int
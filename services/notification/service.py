@@ -1,10 +1,25 @@
-from typing import List, Optional
-from datetime import datetime
-from sqlalchemy import select
+from collections import Counter
+from typing import Any, List, Optional, Dict, Iterable, Collection, Sequence, Set, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, Row, select, update, insert, delete, case, and_, or_, any_, literal, func
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from shared.service import BaseService
+from services.auth.models import User
+from services.hive.models import Hive
+from services.hive.service import nearby_filter, bbox_filter
+from services.monitoring.models import Sensor, Alert
 from . import models, schemas
+from .retry import RetryPolicy
+from .templating import template_cache, row_to_context
+
+
+BROADCAST_COLUMNS = (
+    "user_id", "template_id", "notification_type", "priority", "subject", "body",
+    "is_sent", "is_read", "next_attempt_at", "attempts", "digest_id", "created_at", "updated_at",
+)
 
 
 class NotificationTemplateService(BaseService[models.NotificationTemplate]):
@@ -14,11 +29,12 @@ class NotificationTemplateService(BaseService[models.NotificationTemplate]):
     async def create_template(
         self, db: AsyncSession, template: schemas.NotificationTemplateCreate
     ) -> models.NotificationTemplate:
-        db_template = models.NotificationTemplate(**template.model_dump())
-        db.add(db_template)
-        await db.commit()
-        await db.refresh(db_template)
-        return db_template
+        return await self.create(db, **template.model_dump())
+
+    async def update_template(
+        self, db: AsyncSession, template_id: int, template: schemas.NotificationTemplateUpdate
+    ) -> Optional[models.NotificationTemplate]:
+        return await self.update(db, template_id, **template.model_dump(exclude_unset=True))
 
     async def get_template_by_name(
         self, db: AsyncSession, name: str
@@ -42,81 +58,712 @@ class NotificationSettingsService(BaseService[models.NotificationSettings]):
     async def create_settings(
         self, db: AsyncSession, settings: schemas.NotificationSettingsCreate, user_id: int
     ) -> models.NotificationSettings:
-        db_settings = models.NotificationSettings(**settings.model_dump(), user_id=user_id)
-        db.add(db_settings)
-        await db.commit()
-        await db.refresh(db_settings)
-        return db_settings
+        return await self.create(db, **settings.model_dump(), user_id=user_id)
+
+    @staticmethod
+    def accepts(
+        settings: Optional[models.NotificationSettings],
+        notification_type: models.NotificationType,
+        priority: models.NotificationPriority,
+    ) -> bool:
+        """Whether the user wants this notification at all (channel enabled, priority high enough)"""
+        if settings is None:
+            return True
+        enabled = {
+            models.NotificationType.EMAIL: settings.email_enabled,
+            models.NotificationType.SMS: settings.sms_enabled,
+            models.NotificationType.PUSH: settings.push_enabled,
+        }.get(notification_type)
+        if enabled is False:
+            return False
+        min_priority = settings.min_priority or models.NotificationPriority.MEDIUM
+        return models.PRIORITY_RANK[priority] >= models.PRIORITY_RANK[min_priority]
+
+    async def get_settings_for_users(
+        self, db: AsyncSession, user_ids: Iterable[int]
+    ) -> Dict[int, models.NotificationSettings]:
+        user_ids = set(user_ids)
+        if not user_ids:
+            return {}
+        query = select(self.model).filter(self.model.user_id.in_(user_ids))
+        result = await db.execute(query)
+        return {settings.user_id: settings for settings in result.scalars().all()}
 
     async def update_settings(
         self, db: AsyncSession, user_id: int, settings: schemas.NotificationSettingsUpdate
     ) -> Optional[models.NotificationSettings]:
-        db_settings = await self.get_user_settings(db, user_id)
-        if not db_settings:
-            return None
-
         update_data = settings.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_settings, key, value)
+        if not update_data:
+            return await self.get_user_settings(db, user_id)
+        query = (
+            update(self.model)
+            .where(self.model.user_id == user_id)
+            .values(**update_data)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
+
+class NotificationDigestService(BaseService[models.NotificationDigest]):
+    def __init__(self):
+        super().__init__(models.NotificationDigest)
+
+    @staticmethod
+    def digestible(
+        settings: Optional[models.NotificationSettings], priority: models.NotificationPriority
+    ) -> bool:
+        # HIGH priority always goes out immediately
+        return bool(settings and settings.digest_enabled) and priority != models.NotificationPriority.HIGH
+
+    async def hold(
+        self,
+        db: AsyncSession,
+        notifications: List[models.Notification],
+        settings: Dict[int, models.NotificationSettings],
+    ) -> None:
+        """Attach digestible (not yet inserted) notifications to their user's open digest; the rest are due now"""
+        now = datetime.utcnow()
+        groups: Dict[Tuple[int, models.NotificationType], List[models.Notification]] = {}
+        for notification in notifications:
+            notification.next_attempt_at = now
+            if self.digestible(settings.get(notification.user_id), notification.priority):
+                key = (notification.user_id, notification.notification_type)
+                groups.setdefault(key, []).append(notification)
+        if not groups:
+            return
+
+        digest_ids = await self.open_digests(db, {
+            key: (settings[key[0]].digest_window_minutes, len(items))
+            for key, items in groups.items()
+        })
+        for key, digest_id in digest_ids.items():
+            for notification in groups[key]:
+                notification.digest_id = digest_id
+                notification.next_attempt_at = None
 
-        await db.commit()
-        await db.refresh(db_settings)
-        return db_settings
+    async def open_digests(
+        self,
+        db: AsyncSession,
+        entries: Dict[Tuple[int, models.NotificationType], Tuple[int, int]],
+    ) -> Dict[Tuple[int, models.NotificationType], int]:
+        """Upsert open digests for (user_id, channel) -> (window minutes, new items); returns their ids"""
+        now = datetime.utcnow()
+        digest_ids = {}
+        entries = list(entries.items())
+        # 6 bind parameters per row, chunked to stay under the 32767-parameter protocol limit
+        for start in range(0, len(entries), 5000):
+            stmt = pg_insert(self.model).values([
+                {
+                    "user_id": user_id,
+                    "notification_type": notification_type,
+                    "window_end": now + timedelta(minutes=window_minutes),
+                    "item_count": item_count,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for (user_id, notification_type), (window_minutes, item_count) in entries[start:start + 5000]
+            ])
+            # Join the open window if there is one; its window_end stays where it was
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "notification_type"],
+                index_where=self.model.flushed_at.is_(None),
+                set_={"item_count": self.model.item_count + stmt.excluded.item_count, "updated_at": now},
+            ).returning(self.model.id, self.model.user_id, self.model.notification_type)
+            result = await db.execute(stmt)
+            for digest_id, user_id, notification_type in result.all():
+                digest_ids[(user_id, notification_type)] = digest_id
+        return digest_ids
+
+    async def flush_due_digests(self, db: AsyncSession, limit: int = 100) -> int:
+        """Turn every digest whose window has closed into a single pending notification"""
+        now = datetime.utcnow()
+        query = (
+            select(self.model)
+            .filter(self.model.flushed_at.is_(None))
+            .filter(self.model.window_end <= now)
+            .order_by(self.model.window_end)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(query)
+        digests = result.scalars().all()
+        if not digests:
+            return 0
+
+        items_query = (
+            select(models.Notification)
+            .filter(models.Notification.digest_id.in_([digest.id for digest in digests]))
+            .filter(models.Notification.is_sent == False)
+            .order_by(models.Notification.created_at)
+        )
+        items_result = await db.execute(items_query)
+        items: Dict[int, List[models.Notification]] = {}
+        for item in items_result.scalars().all():
+            items.setdefault(item.digest_id, []).append(item)
+
+        summaries = []
+        for digest in digests:
+            digest_items = items.get(digest.id)
+            if not digest_items:
+                continue
+            priority = max(
+                (item.priority for item in digest_items), key=models.PRIORITY_RANK.__getitem__
+            )
+            summaries.append(models.Notification(
+                user_id=digest.user_id,
+                template_id=digest_items[0].template_id,
+                notification_type=digest.notification_type,
+                priority=priority,
+                subject=f"{len(digest_items)} new notifications",
+                body="\n".join(
+                    f"[{item.created_at:%Y-%m-%d %H:%M}] {item.subject}" for item in digest_items
+                ),
+                next_attempt_at=now,
+                # The items are already counted as unread, the summary is only their delivery
+                is_read=True,
+                read_at=now,
+            ))
+        db.add_all(summaries)
+
+        digest_ids = [digest.id for digest in digests]
+        # Items are delivered as part of the digest
+        await db.execute(
+            update(models.Notification)
+            .where(models.Notification.digest_id.in_(digest_ids))
+            .where(models.Notification.is_sent == False)
+            .values(is_sent=True, sent_at=now.isoformat(), updated_at=now)
+        )
+        await db.execute(
+            update(self.model)
+            .where(self.model.id.in_(digest_ids))
+            .values(flushed_at=now, updated_at=now)
+        )
+        await db.flush()
+        return len(summaries)
+
+
+CounterKey = Tuple[int, models.NotificationType, models.NotificationPriority]
+
+
+class NotificationCounterService(BaseService[models.NotificationCounter]):
+    def __init__(self):
+        super().__init__(models.NotificationCounter)
+
+    @staticmethod
+    def tally(notifications: Iterable[models.Notification]) -> Dict[CounterKey, int]:
+        return Counter(
+            (notification.user_id, notification.notification_type, notification.priority)
+            for notification in notifications
+            if not notification.is_read
+        )
+
+    async def increment(self, db: AsyncSession, counts: Dict[CounterKey, int]) -> None:
+        """Add new unread notifications to the counters in the caller's transaction"""
+        # Fixed key order, so concurrent fan-outs lock counter rows in the same order
+        entries = sorted(
+            (key, count) for key, count in counts.items() if count
+        )
+        for start in range(0, len(entries), 5000):
+            stmt = pg_insert(self.model).values([
+                {"user_id": user_id, "notification_type": notification_type, "priority": priority, "unread": count}
+                for (user_id, notification_type, priority), count in entries[start:start + 5000]
+            ])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "notification_type", "priority"],
+                set_={"unread": self.model.unread + stmt.excluded.unread},
+            )
+            await db.execute(stmt)
+
+    async def decrement(self, db: AsyncSession, counts: Dict[CounterKey, int]) -> None:
+        """Take read notifications off the counters; a missing counter row is created at 0"""
+        entries = sorted((key, count) for key, count in counts.items() if count)
+        if not entries:
+            return
+        read = case(
+            *[
+                (and_(
+                    self.model.user_id == user_id,
+                    self.model.notification_type == notification_type,
+                    self.model.priority == priority,
+                ), count)
+                for (user_id, notification_type, priority), count in entries
+            ],
+            else_=0,
+        )
+        stmt = pg_insert(self.model).values([
+            {"user_id": user_id, "notification_type": notification_type, "priority": priority, "unread": 0}
+            for (user_id, notification_type, priority), _ in entries
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "notification_type", "priority"],
+            set_={"unread": func.greatest(self.model.unread - read, 0)},
+        )
+        await db.execute(stmt)
+
+    async def get_counts(self, db: AsyncSession, user_id: int) -> Dict[str, Any]:
+        # At most one row per channel and priority, whatever the notification history size
+        query = (
+            select(self.model.notification_type, self.model.priority, self.model.unread)
+            .filter(self.model.user_id == user_id)
+            .filter(self.model.unread > 0)
+        )
+        result = await db.execute(query)
+        by_type: Dict[models.NotificationType, int] = {}
+        by_priority: Dict[models.NotificationPriority, int] = {}
+        for notification_type, priority, unread in result.all():
+            by_type[notification_type] = by_type.get(notification_type, 0) + unread
+            by_priority[priority] = by_priority.get(priority, 0) + unread
+        return {"unread": sum(by_type.values()), "by_type": by_type, "by_priority": by_priority}
 
 
 class NotificationService(BaseService[models.Notification]):
     def __init__(self):
         super().__init__(models.Notification)
+        self.digest_service = NotificationDigestService()
+        self.counter_service = NotificationCounterService()
 
     async def create_notification(
-        self, db: AsyncSession, notification: schemas.NotificationCreate, user_id: int
+        self,
+        db: AsyncSession,
+        notification: schemas.NotificationCreate,
+        user_id: int,
+        settings: Optional[models.NotificationSettings] = None,
     ) -> models.Notification:
         db_notification = models.Notification(
             **notification.model_dump(),
             user_id=user_id
         )
+        await self.digest_service.hold(db, [db_notification], {user_id: settings})
         db.add(db_notification)
-        await db.commit()
-        await db.refresh(db_notification)
+        await self.counter_service.increment(
+            db, {(user_id, db_notification.notification_type, db_notification.priority): 1}
+        )
+        # INSERT ... RETURNING fills id and server defaults, no refresh needed
+        await db.flush()
         return db_notification
 
+    async def build_render_context(
+        self, db: AsyncSession, render: schemas.NotificationRender, owner_id: Optional[int]
+    ) -> Dict[str, Any]:
+        """Placeholder context for hive/sensor/alert; owner_id=None skips the ownership filter"""
+        async def load(model, object_id):
+            query = select(model).filter(model.id == object_id)
+            if owner_id is not None:
+                query = query.filter(model.user_id == owner_id)
+            result = await db.execute(query)
+            return result.scalar_one_or_none()
+
+        alert = await load(Alert, render.alert_id) if render.alert_id else None
+        # An alert already points at its sensor and hive
+        sensor_id = render.sensor_id or (alert.sensor_id if alert else None)
+        hive_id = render.hive_id or (alert.hive_id if alert else None)
+        sensor = await load(Sensor, sensor_id) if sensor_id else None
+        hive = await load(Hive, hive_id) if hive_id else None
+
+        context = dict(render.context)
+        context.update(
+            alert=row_to_context(alert),
+            sensor=row_to_context(sensor),
+            hive=row_to_context(hive),
+        )
+        return context
+
+    async def create_rendered_notifications(
+        self,
+        db: AsyncSession,
+        template: models.NotificationTemplate,
+        priority: models.NotificationPriority,
+        user_ids: List[int],
+        context: Dict[str, Any],
+        settings: Optional[Dict[int, models.NotificationSettings]] = None,
+    ) -> List[models.Notification]:
+        """Render one template for many recipients: one compile (cached), one insert batch"""
+        compiled = template_cache.get(template)
+        notifications = []
+        for user_id in user_ids:
+            subject, body = compiled.render({**context, "user_id": user_id})
+            notifications.append(models.Notification(
+                user_id=user_id,
+                template_id=template.id,
+                notification_type=template.notification_type,
+                priority=priority,
+                subject=subject,
+                body=body,
+            ))
+        if notifications:
+            await self.digest_service.hold(db, notifications, settings or {})
+            db.add_all(notifications)
+            await self.counter_service.increment(db, self.counter_service.tally(notifications))
+            await db.flush()
+        return notifications
+
+    async def broadcast(
+        self,
+        db: AsyncSession,
+        template: models.NotificationTemplate,
+        broadcast: schemas.NotificationBroadcast,
+    ) -> Tuple[Dict[str, int], List[int]]:
+        """Fan one template out to an audience: one recipient query, one COPY for all rows.
+
+        Returns the counts and the recipients' user ids.
+        """
+        channel = template.notification_type
+        settings = models.NotificationSettings
+        enabled = {
+            models.NotificationType.EMAIL: settings.email_enabled,
+            models.NotificationType.SMS: settings.sms_enabled,
+            models.NotificationType.PUSH: settings.push_enabled,
+        }[channel]
+        # Same rules as NotificationSettingsService.accepts, evaluated in the join
+        allowed = [
+            priority for priority, rank in models.PRIORITY_RANK.items()
+            if rank <= models.PRIORITY_RANK[broadcast.priority]
+        ]
+        priority_ok = settings.min_priority.in_(allowed)
+        if models.NotificationPriority.MEDIUM in allowed:
+            # NULL min_priority means MEDIUM
+            priority_ok = or_(settings.min_priority.is_(None), priority_ok)
+        query = (
+            select(User.id, settings.digest_enabled, settings.digest_window_minutes)
+            .outerjoin(settings, settings.user_id == User.id)
+            .filter(User.is_active.is_not(False))
+            .filter(or_(
+                settings.id.is_(None),
+                and_(enabled.is_not(False), priority_ok),
+            ))
+        )
+        audience = broadcast.audience
+        if audience.user_ids is not None:
+            # One array parameter instead of one bind per id
+            query = query.filter(User.id == any_(literal(audience.user_ids, ARRAY(Integer))))
+        if audience.nearby is not None:
+            area = audience.nearby
+            region = nearby_filter(area.latitude, area.longitude, area.radius_km)
+            query = query.filter(User.id.in_(select(Hive.user_id).filter(region)))
+        elif audience.within is not None:
+            box = audience.within
+            region = bbox_filter(box.min_latitude, box.min_longitude, box.max_latitude, box.max_longitude)
+            query = query.filter(User.id.in_(select(Hive.user_id).filter(region)))
+        recipients = (await db.execute(query)).all()
+        if not recipients:
+            return {"recipients": 0, "queued": 0, "held_in_digest": 0}, []
+
+        digest_ids = await self.digest_service.open_digests(db, {
+            (recipient.id, channel): (recipient.digest_window_minutes, 1)
+            for recipient in recipients
+            if self.digest_service.digestible(recipient, broadcast.priority)
+        })
+
+        compiled = template_cache.get(template)
+        per_user = "user_id" in compiled.subject.placeholders | compiled.body.placeholders
+        shared = None if per_user else compiled.render(broadcast.context)
+        now = datetime.utcnow()
+        records = []
+        for recipient in recipients:
+            subject, body = shared or compiled.render({**broadcast.context, "user_id": recipient.id})
+            digest_id = digest_ids.get((recipient.id, channel))
+            records.append((
+                recipient.id, template.id, channel.name, broadcast.priority.name, subject, body,
+                False, False, None if digest_id else now, 0, digest_id, now, now,
+            ))
+        # Enum columns store member names, COPY bypasses the ORM conversion
+        await self.copy_many(db, BROADCAST_COLUMNS, records)
+        await self.counter_service.increment(db, {
+            (recipient.id, channel, broadcast.priority): 1 for recipient in recipients
+        })
+        return {
+            "recipients": len(records),
+            "queued": len(records) - len(digest_ids),
+            "held_in_digest": len(digest_ids),
+        }, [recipient.id for recipient in recipients]
+
     async def get_pending_notifications(
         self, db: AsyncSession, limit: int = 100
     ) -> List[models.Notification]:
+        priority_rank = case(*[
+            (self.model.priority == priority, rank)
+            for priority, rank in models.PRIORITY_RANK.items()
+        ])
         query = (
             select(self.model)
             .filter(self.model.is_sent == False)
-            .order_by(self.model.created_at)
+            .order_by(priority_rank.desc(), self.model.next_attempt_at)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def claim_pending_notifications(
+        self,
+        db: AsyncSession,
+        priority: models.NotificationPriority,
+        limit: int = 100,
+        exclude_ids: Collection[int] = (),
+    ) -> List[models.Notification]:
+        # Rows stay locked until the caller's transaction ends; other workers skip them
+        query = (
+            select(self.model)
+            .filter(self.model.is_sent == False)
+            .filter(self.model.priority == priority)
+            .filter(self.model.next_attempt_at <= datetime.utcnow())
+            .order_by(self.model.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if exclude_ids:
+            query = query.filter(self.model.id.notin_(exclude_ids))
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def record_failures(
+        self,
+        db: AsyncSession,
+        failures: List[Tuple[models.Notification, str, bool]],
+        retry_policy: Optional[RetryPolicy] = None,
+    ) -> int:
+        """Schedule retries for (notification, error, permanent) failures.
+
+        Exhausted or permanent failures are moved to the dead-letter table.
+        Returns the number of dead-lettered notifications.
+        """
+        retry_policy = retry_policy or RetryPolicy()
+        now = datetime.utcnow()
+        retries = []
+        dead = []
+        for notification, error_message, permanent in failures:
+            values = self._failure_values(notification, error_message, permanent, retry_policy, now)
+            if values["next_attempt_at"] is None:
+                dead.append((notification, values))
+            else:
+                retries.append(values)
+
+        if retries:
+            await db.execute(update(self.model), retries)
+        if dead:
+            await db.execute(update(self.model), [values for _, values in dead])
+            await self._dead_letter(db, dead, now)
+        return len(dead)
+
+    @staticmethod
+    def _failure_values(
+        notification: models.Notification,
+        error_message: str,
+        permanent: bool,
+        retry_policy: RetryPolicy,
+        now: datetime,
+    ) -> Dict[str, Any]:
+        """Row values after a failed attempt: the next retry, or next_attempt_at=None when dead-lettered"""
+        attempts = (notification.attempts or 0) + 1
+        values = {
+            "id": notification.id,
+            "attempts": attempts,
+            "error_message": error_message,
+            "updated_at": now,
+        }
+        if permanent or retry_policy.exhausted(attempts):
+            values["next_attempt_at"] = None
+        else:
+            values["next_attempt_at"] = now + timedelta(seconds=retry_policy.delay(attempts))
+        return values
+
+    async def _dead_letter(
+        self, db: AsyncSession, dead: List[Tuple[models.Notification, Dict[str, Any]]], now: datetime
+    ) -> None:
+        await db.execute(
+            insert(models.NotificationDeadLetter),
+            [
+                {
+                    "notification_id": notification.id,
+                    "user_id": notification.user_id,
+                    "notification_type": notification.notification_type,
+                    "priority": notification.priority,
+                    "attempts": values["attempts"],
+                    "last_error": values["error_message"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for notification, values in dead
+            ],
+        )
+
+    async def get_dead_letters(
+        self, db: AsyncSession, skip: int = 0, limit: int = 100
+    ) -> List[models.NotificationDeadLetter]:
+        query = (
+            select(models.NotificationDeadLetter)
+            .order_by(models.NotificationDeadLetter.id)
+            .offset(skip)
             .limit(limit)
         )
         result = await db.execute(query)
         return result.scalars().all()
 
+    async def replay_dead_letters(
+        self, db: AsyncSession, replay: schemas.DeadLetterReplay
+    ) -> int:
+        """Requeue dead-lettered notifications with a fresh attempt budget, in one statement"""
+        dead_letter = models.NotificationDeadLetter
+        selected = select(dead_letter.id).order_by(dead_letter.id).limit(replay.limit)
+        if replay.ids:
+            selected = selected.filter(dead_letter.id.in_(replay.ids))
+        if replay.notification_type:
+            selected = selected.filter(dead_letter.notification_type == replay.notification_type)
+
+        replayed = (
+            delete(dead_letter)
+            .where(dead_letter.id.in_(selected))
+            .returning(dead_letter.notification_id)
+            .cte("replayed")
+        )
+        query = (
+            update(self.model)
+            .where(self.model.id == replayed.c.notification_id)
+            .values(
+                attempts=0,
+                next_attempt_at=datetime.utcnow(),
+                error_message=None,
+                updated_at=datetime.utcnow(),
+            )
+            .returning(self.model.id)
+        )
+        result = await db.execute(query)
+        return len(result.all())
+
+    async def lock_leased(
+        self, db: AsyncSession, ids: Collection[int], lease_until: datetime
+    ) -> Set[int]:
+        """Lock and return the ids among `ids` whose lease (next_attempt_at) is still `lease_until`"""
+        if not ids:
+            return set()
+        query = (
+            select(self.model.id)
+            .filter(self.model.id.in_(ids))
+            .filter(self.model.next_attempt_at == lease_until)
+            .with_for_update()
+        )
+        result = await db.execute(query)
+        return set(result.scalars().all())
+
+    async def defer_many(
+        self, db: AsyncSession, next_attempts: Dict[int, datetime]
+    ) -> None:
+        """Push notifications back to the queue until the given moments"""
+        if not next_attempts:
+            return
+        await db.execute(
+            update(self.model),
+            [
+                {"id": notification_id, "next_attempt_at": next_attempt_at}
+                for notification_id, next_attempt_at in next_attempts.items()
+            ],
+        )
+
     async def mark_as_sent(
-        self, db: AsyncSession, notification_id: int, error_message: Optional[str] = None
+        self,
+        db: AsyncSession,
+        notification_id: int,
+        error_message: Optional[str] = None,
+        retry_policy: Optional[RetryPolicy] = None,
     ) -> Optional[models.Notification]:
+        if not error_message:
+            return await self.update(
+                db, notification_id, is_sent=True, sent_at=datetime.utcnow().isoformat()
+            )
+        # A failed delivery is retried (or dead-lettered), never marked as sent
         notification = await self.get(db, notification_id)
         if not notification:
             return None
-
-        notification.is_sent = True
-        notification.sent_at = datetime.utcnow().isoformat()
-        if error_message:
-            notification.error_message = error_message
-
-        await db.commit()
-        await db.refresh(notification)
+        now = datetime.utcnow()
+        values = self._failure_values(
+            notification, error_message, False, retry_policy or RetryPolicy(), now
+        )
+        query = (
+            update(self.model)
+            .where(self.model.id == values.pop("id"))
+            .values(**values)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(query)
+        notification = result.scalar_one()
+        if values["next_attempt_at"] is None:
+            await self._dead_letter(db, [(notification, values)], now)
         return notification
 
+    async def mark_many_as_sent(
+        self, db: AsyncSession, errors: Dict[int, Optional[str]]
+    ) -> None:
+        """Record delivery results for a batch (notification id -> error or None)"""
+        if not errors:
+            return
+        now = datetime.utcnow()
+        sent_at = now.isoformat()
+        # ORM bulk UPDATE by primary key: a single executemany for the whole batch
+        await db.execute(
+            update(self.model),
+            [
+                {
+                    "id": notification_id,
+                    "is_sent": True,
+                    "sent_at": sent_at,
+                    "error_message": error_message,
+                    "updated_at": now,
+                }
+                for notification_id, error_message in errors.items()
+            ],
+        )
+
     async def get_user_notifications(
         self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
-    ) -> List[models.Notification]:
+    ) -> Sequence[Row]:
         query = (
-            select(self.model)
+            self.select_fields(schemas.Notification)
             .filter(self.model.user_id == user_id)
             .order_by(self.model.created_at.desc())
             .offset(skip)
             .limit(limit)
         )
+        return await self.get_rows(db, query)
+
+    async def get_user_notifications_since(
+        self, db: AsyncSession, user_id: int, after_id: int, limit: int = 100
+    ) -> List[models.Notification]:
+        """Notifications a reconnecting stream missed, oldest first"""
+        query = (
+            select(self.model)
+            .filter(self.model.user_id == user_id, self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def mark_as_read(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        notification_id: Optional[int] = None,
+        up_to_id: Optional[int] = None,
+    ) -> int:
+        """Mark one or all unread notifications read and decrement the counters"""
+        query = (
+            update(self.model)
+            .where(self.model.user_id == user_id)
+            .where(self.model.is_read == False)
+        )
+        if notification_id is not None:
+            query = query.where(self.model.id == notification_id)
+        if up_to_id is not None:
+            # Leave notifications that arrived after the client loaded its list
+            query = query.where(self.model.id <= up_to_id)
+        query = (
+            query.values(is_read=True, read_at=datetime.utcnow())
+            .returning(self.model.notification_type, self.model.priority)
+            .execution_options(synchronize_session=False)
+        )
         result = await db.execute(query)
-        return result.scalars().all() 
\ No newline at end of file
+        marked = Counter((user_id, notification_type, priority) for notification_type, priority in result.all())
+        await self.counter_service.decrement(db, marked)
+        return sum(marked.values())
@@ -0,0 +1,240 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from email.message import EmailMessage
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiosmtplib
+
+from shared.metrics import register_smtp_pool
+from .channels import ChannelBackend, DeliveryError, OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionStats:
+    __slots__ = ("connection_id", "opened_at", "messages", "failures", "bytes_sent", "busy_seconds")
+
+    def __init__(self, connection_id: int):
+        self.connection_id = connection_id
+        self.opened_at = time.monotonic()
+        self.messages = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.busy_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "connection_id": self.connection_id,
+            "age_seconds": round(time.monotonic() - self.opened_at, 3),
+            "messages": self.messages,
+            "failures": self.failures,
+            "bytes_sent": self.bytes_sent,
+            # Throughput while the connection was actually sending
+            "messages_per_second": round(self.messages / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+        }
+
+
+class PooledSMTPConnection:
+    def __init__(self, client: aiosmtplib.SMTP, connection_id: int):
+        self.client = client
+        self.stats = SMTPConnectionStats(connection_id)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.client.is_connected
+
+    async def send(self, message: EmailMessage) -> None:
+        started = time.monotonic()
+        try:
+            await self.client.send_message(message)
+        except Exception:
+            self.stats.failures += 1
+            raise
+        finally:
+            self.stats.busy_seconds += time.monotonic() - started
+        self.stats.messages += 1
+        self.stats.bytes_sent += len(message.as_bytes())
+
+    async def close(self) -> None:
+        try:
+            await self.client.quit()
+        except Exception:
+            self.client.close()
+
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP connections, recycled after N messages or on errors"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: Optional[bool] = None,
+        max_size: int = 10,
+        max_messages_per_connection: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+        self.slots = asyncio.Semaphore(max_size)
+        # LIFO keeps the warmest connections busy and lets idle ones age out
+        self.idle: List[PooledSMTPConnection] = []
+        self.active: Dict[int, PooledSMTPConnection] = {}
+        self.retired: List[Dict[str, float]] = []
+        # Lifetime totals of closed connections; `retired` only keeps the last 100
+        self.retired_totals = SMTPConnectionStats(0)
+        self.recycled: Counter = Counter()
+        self.ids = itertools.count(1)
+
+    async def _connect(self) -> PooledSMTPConnection:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
+        )
+        await client.connect()
+        if self.username:
+            await client.login(self.username, self.password or "")
+        return PooledSMTPConnection(client, next(self.ids))
+
+    async def acquire(self) -> PooledSMTPConnection:
+        await self.slots.acquire()
+        try:
+            while self.idle:
+                connection = self.idle.pop()
+                if connection.is_connected:
+                    break
+                await self._retire(connection, "disconnected")
+            else:
+                connection = await self._connect()
+        except Exception:
+            self.slots.release()
+            raise
+        self.active[connection.stats.connection_id] = connection
+        return connection
+
+    async def release(self, connection: PooledSMTPConnection, discard: bool = False) -> None:
+        self.active.pop(connection.stats.connection_id, None)
+        try:
+            if discard or not connection.is_connected:
+                await self._retire(connection, "error")
+            elif connection.stats.messages >= self.max_messages_per_connection:
+                await self._retire(connection, "message limit")
+            else:
+                self.idle.append(connection)
+        finally:
+            self.slots.release()
+
+    async def _retire(self, connection: PooledSMTPConnection, reason: str) -> None:
+        stats = connection.stats.as_dict()
+        logger.info(
+            "Recycling SMTP connection %s (%s) after %s messages, %.2f msg/s",
+            stats["connection_id"], reason, stats["messages"], stats["messages_per_second"],
+        )
+        self.retired = (self.retired + [stats])[-100:]
+        self.recycled[reason] += 1
+        for field in ("messages", "failures", "bytes_sent", "busy_seconds"):
+            total = getattr(self.retired_totals, field) + getattr(connection.stats, field)
+            setattr(self.retired_totals, field, total)
+        await connection.close()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[PooledSMTPConnection]:
+        connection = await self.acquire()
+        # Anything that interrupts the body, including cancellation by a send timeout,
+        # may leave the SMTP transaction half done; only known-clean outcomes keep the connection
+        discard = True
+        try:
+            yield connection
+            discard = False
+        except aiosmtplib.SMTPRecipientsRefused:
+            # Refused at RCPT; the client resets the transaction before raising
+            discard = False
+            raise
+        except aiosmtplib.SMTPResponseException as e:
+            # The session may be in an undefined state after a server-side failure
+            discard = e.code >= 400 and e.code not in (450, 550, 551, 552, 553)
+            raise
+        finally:
+            await self.release(connection, discard=discard)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-connection stats plus lifetime totals over open and closed connections"""
+        open_connections = self.idle + list(self.active.values())
+        return {
+            "idle": [connection.stats.as_dict() for connection in self.idle],
+            "active": [connection.stats.as_dict() for connection in self.active.values()],
+            "retired": list(self.retired),
+            "totals": {
+                field: getattr(self.retired_totals, field)
+                + sum(getattr(connection.stats, field) for connection in open_connections)
+                for field in ("messages", "failures", "bytes_sent")
+            },
+            "recycled": dict(self.recycled),
+        }
+
+    async def close(self) -> None:
+        while self.idle:
+            await self._retire(self.idle.pop(), "shutdown")
+
+
+class SMTPEmailBackend(ChannelBackend):
+    def __init__(self, pool: SMTPConnectionPool, sender: str):
+        self.pool = pool
+        self.sender = sender
+
+    @classmethod
+    def from_env(cls) -> "SMTPEmailBackend":
+        username = os.getenv("SMTP_USER") or None
+        pool = SMTPConnectionPool(
+            hostname=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=username,
+            password=os.getenv("SMTP_PASSWORD") or None,
+            use_tls=os.getenv("SMTP_USE_TLS", "false").lower() == "true",
+            start_tls={"true": True, "false": False}.get(os.getenv("SMTP_START_TLS", "").lower()),
+            max_size=int(os.getenv("SMTP_POOL_SIZE", "10")),
+            max_messages_per_connection=int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100")),
+            timeout=float(os.getenv("SMTP_TIMEOUT", "30")),
+        )
+        register_smtp_pool("email", pool)
+        return cls(pool, sender=os.getenv("SMTP_FROM") or username or "noreply@apiary.local")
+
+    def _build(self, message: OutboundMessage) -> EmailMessage:
+        email = EmailMessage()
+        email["From"] = self.sender
+        email["To"] = message.recipient
+        email["Subject"] = message.subject
+        email["X-Notification-Id"] = str(message.notification_id)
+        email.set_content(message.body)
+        return email
+
+    async def send(self, message: OutboundMessage) -> None:
+        email = self._build(message)
+        try:
+            async with self.pool.connection() as connection:
+                await connection.send(email)
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(f"Recipient refused: {message.recipient}", permanent=True) from e
+        except aiosmtplib.SMTPResponseException as e:
+            # 5xx replies won't succeed on retry
+            raise DeliveryError(f"SMTP {e.code}: {e.message}", permanent=e.code >= 500) from e
+
+    async def close(self) -> None:
+        await self.pool.close()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from redis import asyncio as aioredis
+
+from .channels import ChannelBackend, DeliveryError, OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+STREAM_CHANNEL = os.getenv("STREAM_CHANNEL", "notifications:stream")
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "32"))
+STREAM_MAX_CONNECTIONS = int(os.getenv("STREAM_MAX_CONNECTIONS", "50000"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "20"))
+
+HEARTBEAT_FRAME = b": ping\n\n"
+# Sent instead of the dropped events when a client falls behind; it should refetch GET /notifications/
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+
+
+def sse_frame(event: str, data: str, event_id: Optional[int] = None) -> bytes:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class StreamSubscriber:
+    __slots__ = ("user_id", "queue")
+
+    def __init__(self, user_id: int, buffer_size: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(buffer_size)
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue a frame without blocking; a full buffer is replaced by a single resync event"""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+            return False
+
+
+class StreamHub:
+    """In-process registry of open streams; publishing never waits on a slow client"""
+
+    def __init__(
+        self,
+        buffer_size: int = STREAM_BUFFER_SIZE,
+        max_connections: int = STREAM_MAX_CONNECTIONS,
+        heartbeat_seconds: float = STREAM_HEARTBEAT_SECONDS,
+    ):
+        self.buffer_size = buffer_size
+        self.max_connections = max_connections
+        self.heartbeat_seconds = heartbeat_seconds
+        self.subscribers: Dict[int, Set[StreamSubscriber]] = {}
+        self.connections = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: int) -> Optional[StreamSubscriber]:
+        if self.connections >= self.max_connections:
+            return None
+        subscriber = StreamSubscriber(user_id, self.buffer_size)
+        self.subscribers.setdefault(user_id, set()).add(subscriber)
+        self.connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber) -> None:
+        user_subscribers = self.subscribers.get(subscriber.user_id)
+        if user_subscribers is None or subscriber not in user_subscribers:
+            return
+        user_subscribers.discard(subscriber)
+        if not user_subscribers:
+            del self.subscribers[subscriber.user_id]
+        self.connections -= 1
+
+    def deliver(self, user_id: int, frame: bytes) -> int:
+        delivered = 0
+        for subscriber in self.subscribers.get(user_id, ()):
+            if subscriber.offer(frame):
+                delivered += 1
+            else:
+                self.overflows += 1
+        return delivered
+
+    async def heartbeat(self) -> None:
+        # One timer for the whole node instead of one per idle connection
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            for user_subscribers in list(self.subscribers.values()):
+                for subscriber in user_subscribers:
+                    if subscriber.queue.empty():
+                        subscriber.queue.put_nowait(HEARTBEAT_FRAME)
+
+    async def events(self, subscriber: StreamSubscriber, backlog: Iterable[bytes] = ()) -> AsyncIterator[bytes]:
+        try:
+            yield b"retry: 5000\n\n"
+            for frame in backlog:
+                yield frame
+            while True:
+                yield await subscriber.queue.get()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+class StreamPublisher:
+    """Fans events out to every node over Redis pub/sub, or straight to the local hub without Redis"""
+
+    def __init__(self, hub: Optional[StreamHub] = None, redis_url: Optional[str] = REDIS_URL, channel: str = STREAM_CHANNEL):
+        self.hub = hub
+        self.channel = channel
+        self.redis = aioredis.from_url(redis_url) if redis_url else None
+        self.tasks: List[asyncio.Task] = []
+
+    @staticmethod
+    def _message(user_id: int, event: str, data: str, event_id: Optional[int] = None) -> str:
+        return json.dumps({"user_id": user_id, "event": event, "data": data, "id": event_id})
+
+    async def publish(self, user_id: int, event: str, data: str, event_id: Optional[int] = None) -> None:
+        if self.redis is None:
+            if self.hub is not None:
+                self.hub.deliver(user_id, sse_frame(event, data, event_id))
+            return
+        await self.redis.publish(self.channel, self._message(user_id, event, data, event_id))
+
+    async def publish_many(self, events: Iterable[dict]) -> None:
+        try:
+            if self.redis is None:
+                for event in events:
+                    await self.publish(**event)
+                return
+            # One round trip per 1000 events, a broadcast can reach every user
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for count, event in enumerate(events, 1):
+                    pipe.publish(self.channel, self._message(**event))
+                    if count % 1000 == 0:
+                        await pipe.execute()
+                await pipe.execute()
+        except aioredis.RedisError:
+            # Clients catch up via Last-Event-ID on reconnect, losing a live event is not fatal
+            logger.exception("Failed to publish stream events")
+
+    async def listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    payload = json.loads(message["data"])
+                    # A single shared channel: events for users without a stream on this node are dropped here
+                    if payload["user_id"] in self.hub.subscribers:
+                        self.hub.deliver(
+                            payload["user_id"], sse_frame(payload["event"], payload["data"], payload["id"])
+                        )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Stream subscription to %s lost, reconnecting", self.channel)
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def start(self) -> None:
+        if self.hub is not None:
+            self.tasks.append(asyncio.create_task(self.hub.heartbeat()))
+            if self.redis is not None:
+                self.tasks.append(asyncio.create_task(self.listen()))
+
+    async def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+class StreamPushBackend(ChannelBackend):
+    """Push delivery to open /notifications/stream/ connections, usable from the dispatcher"""
+
+    def __init__(self, publisher: Optional[StreamPublisher] = None):
+        self.publisher = publisher or StreamPublisher()
+
+    async def send(self, message: OutboundMessage) -> None:
+        if self.publisher.redis is None:
+            raise DeliveryError("REDIS_URL is not configured for stream push", permanent=True)
+        data = json.dumps({
+            "notification_id": message.notification_id,
+            "priority": message.priority.value,
+            "subject": message.subject,
+            "body": message.body,
+        })
+        try:
+            await self.publisher.publish(message.user_id, "push", data, message.notification_id)
+        except aioredis.RedisError as e:
+            raise DeliveryError(f"Redis publish failed: {e}") from e
+
+    async def close(self) -> None:
+        await self.publisher.close()
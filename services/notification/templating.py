@@ -0,0 +1,106 @@
+import enum
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from shared.tracing import span
+
+PLACEHOLDER = re.compile(r"\{\{\s*([A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)\s*\}\}")
+
+# A compiled template is a flat list of literal strings and placeholder paths
+Part = Union[str, Tuple[str, ...]]
+
+
+def _format(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return str(value.value)
+    if isinstance(value, float):
+        return format(value, "g")
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    return str(value)
+
+
+class CompiledTemplate:
+    __slots__ = ("parts", "placeholders")
+
+    def __init__(self, source: str):
+        self.parts: List[Part] = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source or ""):
+            if match.start() > position:
+                self.parts.append(source[position:match.start()])
+            self.parts.append(tuple(match.group(1).split(".")))
+            position = match.end()
+        if position < len(source or ""):
+            self.parts.append(source[position:])
+        self.placeholders = {".".join(part) for part in self.parts if isinstance(part, tuple)}
+
+    def render(self, context: Mapping[str, Any]) -> str:
+        chunks = []
+        for part in self.parts:
+            if isinstance(part, str):
+                chunks.append(part)
+                continue
+            value: Any = context
+            for key in part:
+                value = value.get(key) if isinstance(value, Mapping) else None
+                if value is None:
+                    break
+            chunks.append(_format(value))
+        return "".join(chunks)
+
+
+class CompiledNotificationTemplate:
+    __slots__ = ("subject", "body")
+
+    def __init__(self, subject: str, body: str):
+        self.subject = CompiledTemplate(subject)
+        self.body = CompiledTemplate(body)
+
+    def render(self, context: Mapping[str, Any]) -> Tuple[str, str]:
+        return self.subject.render(context), self.body.render(context)
+
+
+class TemplateCache:
+    """LRU of compiled templates per template id, recompiled when updated_at changes"""
+
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self.entries: "OrderedDict[int, Tuple[Optional[datetime], CompiledNotificationTemplate]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template) -> CompiledNotificationTemplate:
+        with span("cache.get", cache="notification_templates") as current:
+            entry = self.entries.get(template.id)
+            version = template.updated_at or template.created_at
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                self.entries.move_to_end(template.id)
+                if current is not None:
+                    current.attributes["cache.hit"] = True
+                return entry[1]
+            # New template or edited since it was compiled
+            self.misses += 1
+            compiled = CompiledNotificationTemplate(template.subject, template.body)
+            self.entries[template.id] = (version, compiled)
+            self.entries.move_to_end(template.id)
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+            if current is not None:
+                current.attributes["cache.hit"] = False
+            return compiled
+
+
+def row_to_context(row) -> Dict[str, Any]:
+    """Plain column values of an ORM row, so rendering never triggers lazy loads"""
+    if row is None:
+        return {}
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+
+template_cache = TemplateCache()
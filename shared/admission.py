@@ -0,0 +1,211 @@
+"""Admission control: per-priority concurrency limits that adapt to latency.
+
+Every route belongs to a priority class. In order, the classes are ingestion,
+interactive, admin and bulk. Each class gets its own concurrency limit, run
+AIMD-style:
+- A response slower than the class's target latency, or any 5xx, cuts the
+  limit by ADMISSION_BACKOFF. The cut also applies to every lower class, since
+  they all share one database pool.
+- Each on-time response while the class is busy adds about one slot per limit's
+  worth of responses.
+- Limits start at their maximum, so nothing is shed until responses slow down.
+
+Requests above the limit get 503 with Retry-After straight away, instead of
+queuing for the pool until everything times out together. Ingestion instead
+waits up to ADMISSION_INGESTION_QUEUE_TIMEOUT for a slot: readings keep flowing
+while dashboards and exports are shed.
+
+Turn it off with ADMISSION_ENABLED=false.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from fastapi.routing import APIRoute
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from starlette.responses import JSONResponse
+
+from shared.metrics import ADMISSION_LIMIT, ADMISSION_REJECTED
+
+INGESTION = "ingestion"
+INTERACTIVE = "interactive"
+ADMIN = "admin"
+BULK = "bulk"
+# Long-lived or trivial routes (event streams) that are never limited
+EXEMPT = "exempt"
+
+# Highest priority first
+PRIORITIES = (INGESTION, INTERACTIVE, ADMIN, BULK)
+
+
+class AdmissionSettings(BaseSettings):
+    """Limits per priority class, overridable through ADMISSION_* environment variables"""
+    model_config = SettingsConfigDict(env_prefix="ADMISSION_")
+
+    enabled: bool = True
+    backoff: float = 0.9
+    retry_after: int = 1
+    ingestion_queue_timeout: float = 2.0
+
+    ingestion_min: int = 20
+    ingestion_max: int = 200
+    ingestion_target_latency: float = 0.1
+    interactive_min: int = 4
+    interactive_max: int = 100
+    interactive_target_latency: float = 0.25
+    admin_min: int = 1
+    admin_max: int = 4
+    admin_target_latency: float = 1.0
+    bulk_min: int = 1
+    bulk_max: int = 8
+    bulk_target_latency: float = 5.0
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one priority class"""
+
+    def __init__(self, min_limit: int, max_limit: int, target_latency: float, backoff: float):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.last_decrease = float("-inf")
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    def try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a slot"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.try_acquire():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            waiter = loop.create_future()
+            self.waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        # The woken waiter competes for the slot again, so a lost wake-up never leaks one
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def increase(self) -> None:
+        # Only grow while the limit is actually in use
+        if self.in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def decrease(self, now: float) -> None:
+        # A burst of slow responses from one slowdown counts once
+        if now - self.last_decrease < self.target_latency:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+class AdmissionController:
+    def __init__(self, service: str, settings: AdmissionSettings):
+        self.service = service
+        self.settings = settings
+        self.limits: Dict[str, AdaptiveLimit] = {
+            priority: AdaptiveLimit(
+                getattr(settings, f"{priority}_min"),
+                getattr(settings, f"{priority}_max"),
+                getattr(settings, f"{priority}_target_latency"),
+                settings.backoff,
+            )
+            for priority in PRIORITIES
+        }
+        self.gauges = {priority: ADMISSION_LIMIT.labels(service, priority) for priority in PRIORITIES}
+        for priority, limit in self.limits.items():
+            self.gauges[priority].set(limit.limit)
+
+    def record(self, priority: str, latency: float, failed: bool) -> None:
+        limit = self.limits[priority]
+        if failed or latency > limit.target_latency:
+            now = time.monotonic()
+            for lower in PRIORITIES[PRIORITIES.index(priority):]:
+                self.limits[lower].decrease(now)
+                self.gauges[lower].set(self.limits[lower].limit)
+        else:
+            limit.increase()
+            self.gauges[priority].set(limit.limit)
+
+    def wrap(self, route: APIRoute, priority: str) -> None:
+        handler = route.app
+        limit = self.limits[priority]
+        rejected = ADMISSION_REJECTED.labels(self.service, priority)
+        queue_timeout = self.settings.ingestion_queue_timeout if priority == INGESTION else 0.0
+        overloaded = JSONResponse(
+            {"detail": "Service is overloaded, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(self.settings.retry_after)},
+        )
+
+        async def app(scope, receive, send):
+            admitted = limit.try_acquire() or (queue_timeout > 0 and await limit.acquire(queue_timeout))
+            if not admitted:
+                rejected.inc()
+                await overloaded(scope, receive, send)
+                return
+
+            status = 500
+
+            async def send_wrapper(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                await send(message)
+
+            started = time.perf_counter()
+            try:
+                await handler(scope, receive, send_wrapper)
+            finally:
+                limit.release()
+                self.record(priority, time.perf_counter() - started, status >= 500)
+
+        route.app = app
+
+
+def classify(route: APIRoute, method: str, priorities: Dict[str, str]) -> str:
+    """Class from `priorities` ("METHOD /path" or "/path" keys); /metrics routes are admin, the rest interactive"""
+    priority: Optional[str] = priorities.get(f"{method} {route.path}") or priorities.get(route.path)
+    if priority is not None:
+        return priority
+    if route.path.startswith("/metrics"):
+        return ADMIN
+    return INTERACTIVE
+
+
+def admit(routes, service: str, priorities: Dict[str, str], settings: Optional[AdmissionSettings] = None) -> None:
+    """Put every APIRoute in `routes` behind the admission controller"""
+    settings = settings or AdmissionSettings()
+    if not settings.enabled:
+        return
+    controller = AdmissionController(service, settings)
+    for route in routes:
+        if not isinstance(route, APIRoute):
+            continue
+        # One route, one method in this codebase
+        priority = classify(route, next(iter(route.methods)), priorities)
+        if priority != EXEMPT:
+            controller.wrap(route, priority)
@@ -0,0 +1,95 @@
+"""Hot queries: a few statements that run as prepared statements on the asyncpg connection.
+
+The statements that run on every request (the user lookup behind
+get_current_user, sensor ownership checks, the measurement insert) skip ORM
+statement construction, compilation and result processing. Each is prepared
+once per pooled connection and kept for the connection's lifetime. Rows come
+back as asyncpg records with attribute access, so `user.id` works as it does
+on an entity.
+
+Every query has an ORM fallback and is off by default. Turn queries on by name:
+HOT_QUERIES=user_by_username,sensor_owner (or HOT_QUERIES=all). Under
+PgBouncer (DB_PGBOUNCER=true) they stay off, because the server connection
+changes between transactions.
+
+They run in the session's transaction like any other statement, but they
+don't go through SQLAlchemy's cursor events, so they don't show up in
+db_queries_total or the query audit.
+
+How much they save is what benchmarks/bench_hot_queries.py measures; no
+numbers are recorded here, so measure before turning them on.
+"""
+import os
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import database_settings, driver_connection
+from .tracing import span
+
+HOT_QUERIES = {name.strip() for name in os.getenv("HOT_QUERIES", "").split(",") if name.strip()}
+
+
+class HotRecord(asyncpg.Record):
+    """asyncpg record whose columns can also be read as attributes"""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class HotQuery:
+    def __init__(self, name: str, sql: str, write: bool = False):
+        self.name = name
+        self.sql = sql
+        self.write = write
+        self.enabled = (
+            ("all" in HOT_QUERIES or name in HOT_QUERIES) and not database_settings.pgbouncer
+        )
+
+    async def _statement(self, db: AsyncSession):
+        connection = await db.connection()
+        if self.write:
+            db.info["wrote"] = True
+        # Begins the session transaction on the server too, so the statement commits or rolls back with it
+        raw_connection = await driver_connection(connection)
+        # connection.info lives as long as the pooled DBAPI connection, like the server-side statement
+        statements: Dict[str, Any] = connection.info.setdefault("hot_statements", {})
+        statement = statements.get(self.name)
+        if statement is None:
+            statement = await raw_connection.prepare(self.sql, record_class=HotRecord)
+            statements[self.name] = statement
+        return statement, statements
+
+    async def fetchrow(self, db: AsyncSession, *args) -> Optional[HotRecord]:
+        statement, statements = await self._statement(db)
+        try:
+            with span("db.hot_query", **{"db.query": self.name}):
+                return await statement.fetchrow(*args)
+        except asyncpg.FeatureNotSupportedError:
+            # The plan went stale after a schema change; the next call prepares it again
+            statements.pop(self.name, None)
+            raise
+
+    async def fetch(self, db: AsyncSession, *args) -> List[HotRecord]:
+        statement, statements = await self._statement(db)
+        try:
+            with span("db.hot_query", **{"db.query": self.name}):
+                return await statement.fetch(*args)
+        except asyncpg.FeatureNotSupportedError:
+            statements.pop(self.name, None)
+            raise
+
+
+registry: Dict[str, HotQuery] = {}
+
+
+def hot_query(name: str, sql: str, write: bool = False) -> HotQuery:
+    """Register a statement under `name`; `write` marks the session as having written (read-your-writes)"""
+    if name in registry:
+        raise ValueError(f"Hot query {name!r} is already registered")
+    query = registry[name] = HotQuery(name, sql, write)
+    return query
@@ -0,0 +1,274 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["service", "method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time until the last response byte was sent",
+    ["service", "method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled", ["service", "route"], multiprocess_mode="livesum"
+)
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed per route", ["service", "route"])
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time per route", ["service", "route"],
+    buckets=QUERY_BUCKETS,
+)
+INGESTED = Counter("ingested_records_total", "Records accepted by ingestion endpoints", ["service", "kind"])
+RATE_LIMITED = Counter("rate_limited_total", "Requests refused with 429 by rate limits", ["service", "scope"])
+ADMISSION_LIMIT = Gauge(
+    "admission_concurrency_limit", "Current adaptive concurrency limit", ["service", "priority"],
+    multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests shed with 503 by admission control", ["service", "priority"]
+)
+
+# (service, route template) of the request being handled; queries outside routes count as "background"
+current_route: ContextVar[Optional[Tuple[str, str]]] = ContextVar("current_route", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    service, route = current_route.get() or ("unknown", "background")
+    DB_QUERIES.labels(service, route).inc()
+    DB_QUERY_LATENCY.labels(service, route).observe(time.perf_counter() - started)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute never runs for a failed statement; drop its start time
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def _instrument_route(route: APIRoute, service: str) -> None:
+    handler = route.app
+    in_flight = IN_FLIGHT.labels(service, route.path)
+    # Children are bound once here so the hot path does no label lookups
+    latency = {method: REQUEST_LATENCY.labels(service, method, route.path) for method in route.methods}
+    requests: Dict[Tuple[str, int], Any] = {}
+    route_label = (service, route.path)
+
+    async def app(scope, receive, send):
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Background tasks run after this point and are not part of the latency
+                finished = True
+                latency[method].observe(time.perf_counter() - started)
+            await send(message)
+
+        in_flight.inc()
+        token = current_route.set(route_label)
+        try:
+            await handler(scope, receive, send_wrapper)
+        finally:
+            current_route.reset(token)
+            in_flight.dec()
+            if not finished:
+                latency[method].observe(time.perf_counter() - started)
+            counter = requests.get((method, status))
+            if counter is None:
+                counter = requests[(method, status)] = REQUESTS.labels(service, method, route.path, str(status))
+            counter.inc()
+
+    route.app = app
+
+
+class BackgroundLabelMiddleware:
+    """Sets the (service, "background") label for queries outside any route, e.g. in startup tasks"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.label = (service, "background")
+
+    async def __call__(self, scope, receive, send):
+        token = current_route.set(self.label)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
+
+
+class CacheCollector:
+    """Exposes hit/miss counts of in-process caches that keep `hits` and `misses` attributes"""
+
+    def __init__(self):
+        self.caches: Dict[str, Any] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Hits / lookups since start", labels=["cache"])
+        for name, cache in self.caches.items():
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            lookups = cache.hits + cache.misses
+            ratio.add_metric([name], cache.hits / lookups if lookups else 0.0)
+        yield from (hits, misses, ratio)
+
+
+class PoolCollector:
+    def collect(self):
+        # Imported lazily: shared.database builds the engine at import time
+        from shared.database import pool_status
+
+        status = pool_status()
+        pools = [("primary", status)] + [(replica["url"], replica) for replica in status["replicas"]]
+        families = {
+            "checked_out": GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["pool"]),
+            "overflow": GaugeMetricFamily("db_pool_overflow", "Connections above pool_size", labels=["pool"]),
+            "timeouts": CounterMetricFamily("db_pool_timeouts", "Checkouts that timed out", labels=["pool"]),
+            "wait_seconds_sum": CounterMetricFamily(
+                "db_pool_wait_seconds", "Total time spent waiting for a connection", labels=["pool"]
+            ),
+        }
+        for name, pool in pools:
+            for key, family in families.items():
+                family.add_metric([name], pool[key])
+        yield from families.values()
+
+
+class SMTPPoolCollector:
+    """Exposes SMTPConnectionPool.stats(): open connections, their throughput and lifetime totals"""
+
+    def __init__(self):
+        self.pools: Dict[str, Any] = {}
+
+    def collect(self):
+        connections = GaugeMetricFamily("smtp_pool_connections", "Open SMTP connections", labels=["pool", "state"])
+        throughput = GaugeMetricFamily(
+            "smtp_connection_messages_per_second",
+            "Messages per second of each open connection while it was sending",
+            labels=["pool", "connection"],
+        )
+        messages = CounterMetricFamily("smtp_messages", "Messages sent", labels=["pool"])
+        failures = CounterMetricFamily("smtp_failures", "Messages that failed to send", labels=["pool"])
+        sent_bytes = CounterMetricFamily("smtp_sent_bytes", "Bytes of messages sent", labels=["pool"])
+        recycled = CounterMetricFamily(
+            "smtp_connections_recycled", "Connections closed by the pool", labels=["pool", "reason"]
+        )
+        for name, pool in self.pools.items():
+            stats = pool.stats()
+            for state in ("idle", "active"):
+                connections.add_metric([name, state], len(stats[state]))
+                for connection in stats[state]:
+                    throughput.add_metric(
+                        [name, str(connection["connection_id"])], connection["messages_per_second"]
+                    )
+            messages.add_metric([name], stats["totals"]["messages"])
+            failures.add_metric([name], stats["totals"]["failures"])
+            sent_bytes.add_metric([name], stats["totals"]["bytes_sent"])
+            for reason, count in stats["recycled"].items():
+                recycled.add_metric([name, reason], count)
+        yield from (connections, throughput, messages, failures, sent_bytes, recycled)
+
+
+cache_collector = CacheCollector()
+smtp_pool_collector = SMTPPoolCollector()
+REGISTRY.register(cache_collector)
+REGISTRY.register(PoolCollector())
+REGISTRY.register(smtp_pool_collector)
+
+
+def register_cache(name: str, cache: Any) -> None:
+    cache_collector.caches[name] = cache
+
+
+def register_smtp_pool(name: str, pool: Any) -> None:
+    smtp_pool_collector.pools[name] = pool
+
+
+def _registry():
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    # Several uvicorn workers: aggregate their metric files on every scrape
+    from prometheus_client import multiprocess
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    # Custom collectors read this process's state; the multiprocess collector only merges metric files
+    registry.register(cache_collector)
+    registry.register(PoolCollector())
+    registry.register(smtp_pool_collector)
+    return registry
+
+
+def instrument(app: FastAPI, service: str, priorities: Optional[Dict[str, str]] = None) -> None:
+    """Instrument every route registered so far and add /metrics and /health; call after the routes.
+
+    `priorities` maps "METHOD /path" to an admission class from shared.admission.
+    """
+    from shared.admission import admit
+
+    # Inside the metrics wrapper, so shed requests are counted as 503s
+    admit(app.routes, service, priorities or {})
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            _instrument_route(route, service)
+
+    from shared.query_audit import QUERY_AUDIT, QueryAuditMiddleware
+
+    if QUERY_AUDIT:
+        app.add_middleware(QueryAuditMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
+
+    @app.get("/health")
+    async def health():
+        """Health check endpoint"""
+        return {"status": "healthy", "service": service}
+
+    from shared.tracing import TracingMiddleware, configure_logging
+
+    configure_logging()
+    # Per app, so several apps in one process keep their own service label
+    app.add_middleware(BackgroundLabelMiddleware, service=service)
+    # Outermost, so the root span covers admission waits and every other middleware
+    app.add_middleware(
+        TracingMiddleware,
+        service=service,
+        routes={route.endpoint: route.path for route in app.routes if isinstance(route, APIRoute)},
+    )
@@ -0,0 +1,46 @@
+"""pytest plugin: per-endpoint query budgets.
+
+Enable with `pytest -p shared.pytest_query_audit`, then in a test:
+
+    def test_read_inspections(client, query_budget):
+        with query_budget(max_queries=3):
+            client.get("/hives/1/inspections/", headers=auth)
+
+The block fails when it runs more statements than allowed, repeats one statement
+shape more than `max_repeats` times (N+1), or has a statement slower than `slow_ms`.
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import pytest
+
+from shared.query_audit import QUERY_AUDIT_SLOW_MS, QueryAudit, capture
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--query-report", action="store_true", default=False,
+        help="print every statement recorded by query_budget blocks",
+    )
+
+
+@pytest.fixture
+def query_budget(request):
+    verbose = request.config.getoption("--query-report")
+
+    @contextmanager
+    def budget(
+        max_queries: Optional[int] = None, max_repeats: int = 1, slow_ms: float = QUERY_AUDIT_SLOW_MS
+    ) -> Iterator[QueryAudit]:
+        with capture() as audit:
+            yield audit
+        if verbose:
+            for record in audit.records:
+                print(f"{record.duration * 1000:8.2f} ms  {record.route or '-'}  {record.shape}")
+        problems = []
+        if max_queries is not None and len(audit) > max_queries:
+            problems.append(f"{len(audit)} queries, budget is {max_queries}")
+        problems += audit.report(max_repeats + 1, slow_ms)
+        assert not problems, "Query budget exceeded:\n  " + "\n  ".join(problems)
+
+    return budget
@@ -0,0 +1,180 @@
+"""Per-request SQL auditing: repeated statement shapes (N+1) and slow statements.
+
+Off by default. QUERY_AUDIT=true logs a report for every request that trips a
+threshold; tests use `capture()` / the `query_budget` fixture from
+shared.pytest_query_audit to fail when an endpoint goes over its budget.
+"""
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from shared.metrics import current_route
+
+logger = logging.getLogger(__name__)
+
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "false").lower() == "true"
+QUERY_AUDIT_SLOW_MS = float(os.getenv("QUERY_AUDIT_SLOW_MS", "100"))
+# The same statement shape this many times in one request is reported as N+1
+QUERY_AUDIT_REPEAT_THRESHOLD = int(os.getenv("QUERY_AUDIT_REPEAT_THRESHOLD", "5"))
+QUERY_AUDIT_EXPLAIN = os.getenv("QUERY_AUDIT_EXPLAIN", "false").lower() == "true"
+
+_NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\$\d+"), "?"),
+    (re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE), "IN (...)"),
+    (re.compile(r"\bVALUES (?:\([^()]*\), )*\([^()]*\)", re.IGNORECASE), "VALUES (...)"),
+]
+
+
+def normalize(statement: str) -> str:
+    """Statement shape: literals and placeholders replaced, IN lists and VALUES rows collapsed"""
+    for pattern, replacement in _NORMALIZE:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    parameters: Any
+    executemany: bool
+    duration: float
+    route: Optional[str]
+
+    @property
+    def shape(self) -> str:
+        return normalize(self.statement)
+
+
+class QueryAudit:
+    def __init__(self):
+        self.records: List[QueryRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """(shape, count, total seconds) for shapes executed at least `threshold` times"""
+        counts: Counter = Counter()
+        durations: Dict[str, float] = {}
+        for record in self.records:
+            shape = record.shape
+            counts[shape] += 1
+            durations[shape] = durations.get(shape, 0.0) + record.duration
+        return [(shape, count, durations[shape]) for shape, count in counts.most_common() if count >= threshold]
+
+    def slow(self, threshold_ms: float) -> List[QueryRecord]:
+        return [record for record in self.records if record.duration * 1000 >= threshold_ms]
+
+    def by_route(self) -> Dict[Optional[str], int]:
+        return dict(Counter(record.route for record in self.records))
+
+    def report(self, repeat_threshold: int, slow_ms: float) -> List[str]:
+        lines = [
+            f"{count}x ({total * 1000:.1f} ms total) {shape}"
+            for shape, count, total in self.repeated(repeat_threshold)
+        ]
+        lines += [f"slow {record.duration * 1000:.1f} ms: {record.shape}" for record in self.slow(slow_ms)]
+        return lines
+
+
+# Audit of the request being handled, set by QueryAuditMiddleware
+_request_audit: ContextVar[Optional[QueryAudit]] = ContextVar("request_audit", default=None)
+# Audits that see every statement regardless of context (tests, where the app runs in another thread)
+_captures: List[QueryAudit] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _captures or _request_audit.get() is not None:
+        conn.info.setdefault("query_audit_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_audit_started")
+    if not started:
+        return
+    route = current_route.get()
+    record = QueryRecord(
+        statement, parameters, executemany, time.perf_counter() - started.pop(), route[1] if route else None
+    )
+    request_audit = _request_audit.get()
+    if request_audit is not None:
+        request_audit.records.append(record)
+    for audit in _captures:
+        audit.records.append(record)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_audit_started"):
+        connection.info["query_audit_started"].pop()
+
+
+@contextmanager
+def capture() -> Iterator[QueryAudit]:
+    """Record every statement executed inside the block, on any engine"""
+    audit = QueryAudit()
+    _captures.append(audit)
+    try:
+        yield audit
+    finally:
+        _captures.remove(audit)
+
+
+async def explain(record: QueryRecord) -> Optional[str]:
+    """Plan of a recorded SELECT on the primary; writes are never explained since EXPLAIN would not run them safely"""
+    if record.executemany or not record.statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    from shared.database import engine
+
+    async with engine.connect() as connection:
+        result = await connection.exec_driver_sql(f"EXPLAIN {record.statement}", tuple(record.parameters or ()))
+        return "\n".join(row[0] for row in result)
+
+
+class QueryAuditMiddleware:
+    """Logs N+1 suspects and slow statements per request; only installed when QUERY_AUDIT is on"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        audit = QueryAudit()
+        token = _request_audit.set(audit)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_audit.reset(token)
+            route = scope.get("route")
+            await self.log(audit, f"{scope['method']} {route.path if route else scope['path']}")
+
+    async def log(self, audit: QueryAudit, endpoint: str) -> None:
+        for shape, count, total in audit.repeated(QUERY_AUDIT_REPEAT_THRESHOLD):
+            logger.warning("Possible N+1 on %s: %d x %s (%.1f ms total)", endpoint, count, shape, total * 1000)
+        for record in audit.slow(QUERY_AUDIT_SLOW_MS):
+            logger.warning("Slow query on %s: %.1f ms %s", endpoint, record.duration * 1000, record.shape)
+            if QUERY_AUDIT_EXPLAIN:
+                try:
+                    plan = await explain(record)
+                except Exception:
+                    logger.warning("EXPLAIN failed for %s", record.shape, exc_info=True)
+                    continue
+                if plan:
+                    logger.warning("Plan:\n%s", plan)
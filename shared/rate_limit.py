@@ -0,0 +1,204 @@
+"""Token-bucket rate limits per plan, in-process or shared through Redis.
+
+A RateLimiter covers one scope, e.g. "user" or "sensor". Every plan gets its
+own (sustained rate, burst), read from RATE_LIMIT_<PLAN>_<SCOPE>_RATE and
+RATE_LIMIT_<PLAN>_<SCOPE>_BURST. In-process buckets cost a few microseconds per
+check. With RATE_LIMIT_REDIS=true, buckets live in Redis and every worker
+shares them; each check is then one script call. If Redis can't be reached
+within RATE_LIMIT_REDIS_TIMEOUT, the local buckets take over and Redis is left
+alone for RATE_LIMIT_REDIS_COOLDOWN seconds.
+"""
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_REDIS = os.getenv("RATE_LIMIT_REDIS", "false").lower() == "true"
+# Seconds; a check sits on the request path, so a slow store must fail fast
+RATE_LIMIT_REDIS_TIMEOUT = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT", "0.05"))
+RATE_LIMIT_REDIS_COOLDOWN = float(os.getenv("RATE_LIMIT_REDIS_COOLDOWN", "5"))
+
+DEFAULT_PLAN = "free"
+# scope -> plan -> (tokens per second, burst)
+DEFAULT_PLAN_LIMITS: Dict[str, Dict[str, Tuple[float, float]]] = {
+    "user": {"free": (5.0, 50.0), "pro": (50.0, 500.0)},
+    # A sensor reporting every few seconds is normal; a gateway stuck at 100 Hz is not
+    "sensor": {"free": (1.0, 10.0), "pro": (5.0, 50.0)},
+}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated_at", "clock")
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` are available (0 if available now); consumes nothing"""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (tokens - self.tokens) / self.rate
+
+    def consume(self, tokens: float = 1.0) -> None:
+        # Negative for refunds, which never lift the bucket past its burst
+        self.tokens = min(self.burst, self.tokens - tokens)
+
+
+class KeyedTokenBuckets:
+    """One bucket per key with LRU eviction, so memory stays bounded"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def get(self, key: Hashable) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+
+# Refill and take in one step, so workers can't race; returns {wait seconds, tokens left}.
+# Numbers go back as strings because Redis truncates Lua numbers to integers.
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = math.min(burst, tokens - cost)
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {tostring(wait), tostring(tokens)}
+"""
+
+
+def plan_limits(scope: str) -> Dict[str, Tuple[float, float]]:
+    return {
+        plan: (
+            float(os.getenv(f"RATE_LIMIT_{plan.upper()}_{scope.upper()}_RATE", rate)),
+            float(os.getenv(f"RATE_LIMIT_{plan.upper()}_{scope.upper()}_BURST", burst)),
+        )
+        for plan, (rate, burst) in DEFAULT_PLAN_LIMITS[scope].items()
+    }
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        scope: str,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        redis_url: Optional[str] = None,
+        max_keys: int = 100_000,
+        redis_timeout: float = RATE_LIMIT_REDIS_TIMEOUT,
+        redis_cooldown: float = RATE_LIMIT_REDIS_COOLDOWN,
+    ):
+        self.scope = scope
+        self.limits = limits if limits is not None else plan_limits(scope)
+        self.local = {plan: KeyedTokenBuckets(rate, burst, max_keys) for plan, (rate, burst) in self.limits.items()}
+        self.redis = aioredis.from_url(
+            redis_url, socket_connect_timeout=redis_timeout, socket_timeout=redis_timeout
+        ) if redis_url else None
+        self.take_script = self.redis.register_script(TAKE_SCRIPT) if self.redis is not None else None
+        self.redis_cooldown = redis_cooldown
+        # time.monotonic() before which Redis is skipped after a failure
+        self.redis_retry_at = 0.0
+
+    def _plan(self, plan: Optional[str]) -> str:
+        return plan if plan in self.limits else DEFAULT_PLAN
+
+    def limit(self, plan: Optional[str]) -> Tuple[float, float]:
+        """(rate, burst) that applies to `plan`; unknown plans get the default one"""
+        return self.limits[self._plan(plan)]
+
+    def _use_redis(self) -> bool:
+        return self.take_script is not None and time.monotonic() >= self.redis_retry_at
+
+    def _redis_failed(self) -> None:
+        # Logged once per cool-down, since Redis isn't tried again before it ends
+        self.redis_retry_at = time.monotonic() + self.redis_cooldown
+        logger.warning(
+            "Rate limit store is unreachable, limiting per process for %.0fs", self.redis_cooldown, exc_info=True
+        )
+
+    def _script_call(self, plan: str, key: Hashable, cost: float) -> Dict[str, list]:
+        rate, burst = self.limits[plan]
+        name = ":".join(map(str, key)) if isinstance(key, tuple) else key
+        return {"keys": [f"ratelimit:{self.scope}:{plan}:{name}"], "args": [rate, burst, time.time(), cost]}
+
+    def _take_local(self, plan: str, key: Hashable, cost: float) -> Tuple[float, float]:
+        bucket = self.local[plan].get(key)
+        wait = bucket.delay(cost)
+        if wait == 0.0 and cost:
+            bucket.consume(cost)
+        return wait, bucket.tokens
+
+    async def _take(self, plan: str, key: Hashable, cost: float) -> Tuple[float, float]:
+        if self._use_redis():
+            try:
+                wait, tokens = await self.take_script(**self._script_call(plan, key, cost))
+                return float(wait), float(tokens)
+            except aioredis.RedisError:
+                self._redis_failed()
+        return self._take_local(plan, key, cost)
+
+    async def acquire(self, plan: Optional[str], key: Hashable) -> float:
+        """Take a token for `key`: 0.0 when allowed, otherwise seconds until one is available"""
+        wait, _ = await self._take(self._plan(plan), key, 1.0)
+        return wait
+
+    async def refund(self, plan: Optional[str], key: Hashable) -> None:
+        """Give back a token from acquire, when a later check refused the request anyway"""
+        await self._take(self._plan(plan), key, -1.0)
+
+    async def usage(self, plan: Optional[str], keys: Sequence[Hashable]) -> List[float]:
+        """Tokens left for each key, without taking any"""
+        plan = self._plan(plan)
+        if self._use_redis() and keys:
+            try:
+                # One round trip for all keys
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        await self.take_script(**self._script_call(plan, key, 0.0), client=pipe)
+                    return [float(tokens) for _, tokens in await pipe.execute()]
+            except aioredis.RedisError:
+                self._redis_failed()
+        return [self._take_local(plan, key, 0.0)[1] for key in keys]
+
+
+def retry_after(wait: float) -> str:
+    # Retry-After takes whole seconds
+    return str(max(1, math.ceil(wait)))
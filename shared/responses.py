@@ -0,0 +1,50 @@
+"""JSON responses that are validated once and serialized without the stdlib encoder.
+
+FastAPI validates an endpoint's return value against `response_model` and then
+encodes it again; a returned Response is sent as is. `respond` does the one
+validation itself (ORM objects, rows and dicts are all accepted) and pydantic-core
+writes the bytes. Keep `response_model` on the route: it still drives the docs.
+"""
+from functools import lru_cache
+from typing import Any, Iterable, Type
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+
+from shared.tracing import span
+
+
+class JSONBytesResponse(Response):
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def adapter(schema: Any) -> TypeAdapter:
+    # Building an adapter compiles a validator/serializer, so keep one per schema
+    return TypeAdapter(schema)
+
+
+def respond(schema: Any, content: Any, status_code: int = 200) -> Response:
+    """Validate `content` into `schema` (a model or e.g. List[model]) once and send it as JSON"""
+    type_adapter = adapter(schema)
+    with span("serialize", schema=getattr(schema, "__name__", str(schema))):
+        body = type_adapter.dump_json(type_adapter.validate_python(content, from_attributes=True))
+    return JSONBytesResponse(body, status_code=status_code)
+
+
+def respond_trusted(schema: Type[BaseModel], rows: Iterable[Any], status_code: int = 200) -> Response:
+    """List response for rows from our own queries: `schema`'s fields are read off each row, nothing is validated.
+
+    Only for flat schemas whose field values orjson can encode as they are.
+    """
+    fields = tuple(schema.model_fields)
+    with span("serialize", schema=schema.__name__, trusted=True):
+        rows = list(rows)
+        if rows and getattr(rows[0], "_fields", None) == fields:
+            # Rows from BaseService.select_fields already come in schema order
+            body = orjson.dumps([dict(zip(fields, row)) for row in rows])
+        else:
+            body = orjson.dumps([{name: getattr(row, name) for name in fields} for row in rows])
+    return JSONBytesResponse(body, status_code=status_code)
@@ -1,26 +1,33 @@
-from typing import Generic, TypeVar, Type, Optional, List
+from datetime import datetime
+from typing import Any, Dict, Generic, Iterator, TypeVar, Type, Optional, List, Sequence, Iterable
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from sqlalchemy.exc import SQLAlchemyError
-from .database import Base
+from pydantic import BaseModel
+from sqlalchemy import Row, Select, select, insert, update, delete, any_, literal
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.types import Integer
+from .database import Base, get_raw_connection
 
 ModelType = TypeVar("ModelType", bound=Base)
 
+# PostgreSQL's extended protocol caps one statement at 32767 bind parameters
+MAX_BIND_PARAMS = 32767
+
 
 class BaseService(Generic[ModelType]):
+    """CRUD helpers for one model.
+
+    Services never commit: everything runs in the request's unit of work and
+    get_db commits once (or rolls back) at the end. Writes return their rows via
+    RETURNING, so no refresh round-trip is needed.
+    """
+
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
     async def create(self, db: AsyncSession, **kwargs) -> ModelType:
-        try:
-            db_obj = self.model(**kwargs)
-            db.add(db_obj)
-            await db.commit()
-            await db.refresh(db_obj)
-            return db_obj
-        except SQLAlchemyError as e:
-            await db.rollback()
-            raise e
+        query = insert(self.model).values(**kwargs).returning(self.model)
+        result = await db.execute(query)
+        return result.scalar_one()
 
     async def get(self, db: AsyncSession, id: int) -> Optional[ModelType]:
         query = select(self.model).filter(self.model.id == id)
@@ -32,22 +39,132 @@ class BaseService(Generic[ModelType]):
         result = await db.execute(query)
         return result.scalars().all()
 
+    def select_fields(self, schema: Type[BaseModel]) -> Select:
+        """Lean read: SELECT just the table columns `schema` serializes.
+
+        Results are plain rows (named tuples), not entities, so nothing goes into the
+        identity map and no relationships load. Hand them to respond_trusted.
+        """
+        columns = self.model.__table__.columns
+        return select(*(columns[name] for name in schema.model_fields))
+
+    async def get_rows(self, db: AsyncSession, query: Select) -> Sequence[Row]:
+        result = await db.execute(query)
+        return result.all()
+
     async def update(self, db: AsyncSession, id: int, **kwargs) -> Optional[ModelType]:
-        try:
-            query = update(self.model).where(self.model.id == id).values(**kwargs).returning(self.model)
-            result = await db.execute(query)
-            await db.commit()
-            return result.scalar_one_or_none()
-        except SQLAlchemyError as e:
-            await db.rollback()
-            raise e
+        query = (
+            update(self.model)
+            .where(self.model.id == id)
+            .values(**kwargs)
+            .returning(self.model)
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
 
     async def delete(self, db: AsyncSession, id: int) -> bool:
-        try:
-            query = delete(self.model).where(self.model.id == id)
+        query = delete(self.model).where(self.model.id == id)
+        result = await db.execute(query)
+        return result.rowcount > 0
+
+    async def copy_many(
+        self, db: AsyncSession, columns: Sequence[str], records: Iterable[tuple]
+    ) -> int:
+        # COPY runs inside the session transaction, so it commits/rolls back with the request
+        records = list(records)
+        if not records:
+            return 0
+        connection = await get_raw_connection(db)
+        await connection.copy_records_to_table(
+            self.model.__tablename__, records=records, columns=list(columns)
+        )
+        return len(records)
+
+    def _chunks(self, rows: Sequence[Dict[str, Any]]) -> Iterator[Sequence[Dict[str, Any]]]:
+        if not rows:
+            return
+        # Python-side column defaults (timestamps) take parameters too
+        columns = max(len(row) for row in rows) + len(self.model.__table__.columns)
+        size = max(1, MAX_BIND_PARAMS // columns)
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    def _id_in(self, ids: Iterable[int]):
+        # One array parameter, however many ids
+        return self.model.id == any_(literal(list(ids), ARRAY(Integer)))
+
+    async def create_many(self, db: AsyncSession, rows: Sequence[Dict[str, Any]]) -> List[ModelType]:
+        created = []
+        for chunk in self._chunks(rows):
+            query = insert(self.model).values(list(chunk)).returning(self.model)
+            result = await db.execute(query)
+            created.extend(result.scalars().all())
+        return created
+
+    async def get_many(self, db: AsyncSession, ids: Iterable[int]) -> List[ModelType]:
+        ids = list(ids)
+        if not ids:
+            return []
+        query = select(self.model).filter(self._id_in(ids)).order_by(self.model.id)
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def update_many(
+        self, db: AsyncSession, where: Sequence[Any], values: Dict[str, Any]
+    ) -> List[ModelType]:
+        """UPDATE every row matching all `where` conditions; an empty filter is refused"""
+        if not where:
+            raise ValueError("update_many needs at least one filter condition")
+        query = (
+            update(self.model)
+            .where(*where)
+            .values(**values)
+            .returning(self.model)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        result = await db.execute(query)
+        return result.scalars().all()
+
+    async def upsert_many(
+        self,
+        db: AsyncSession,
+        rows: Sequence[Dict[str, Any]],
+        conflict_target: Sequence[str] = ("id",),
+        update_columns: Optional[Sequence[str]] = None,
+        index_where: Optional[Any] = None,
+    ) -> List[ModelType]:
+        """INSERT ... ON CONFLICT (conflict_target) DO UPDATE; update_columns=() means DO NOTHING.
+
+        Returns inserted and updated rows (only inserted ones with DO NOTHING).
+        """
+        # A statement may not touch the same row twice, the last duplicate wins
+        rows = list({tuple(row[column] for column in conflict_target): row for row in rows}.values())
+        if update_columns is None:
+            update_columns = [column for column in rows[0] if column not in conflict_target] if rows else []
+        upserted = []
+        for chunk in self._chunks(rows):
+            query = pg_insert(self.model).values(list(chunk))
+            if update_columns:
+                set_ = {column: query.excluded[column] for column in update_columns}
+                if "updated_at" in self.model.__table__.columns and "updated_at" not in set_:
+                    set_["updated_at"] = datetime.utcnow()
+                query = query.on_conflict_do_update(
+                    index_elements=list(conflict_target), index_where=index_where, set_=set_
+                )
+            else:
+                query = query.on_conflict_do_nothing(
+                    index_elements=list(conflict_target), index_where=index_where
+                )
+            query = query.returning(self.model).execution_options(populate_existing=True)
             result = await db.execute(query)
-            await db.commit()
-            return result.rowcount > 0
-        except SQLAlchemyError as e:
-            await db.rollback()
-            raise e 
\ No newline at end of file
+            upserted.extend(result.scalars().all())
+        return upserted
+
+    async def delete_many(self, db: AsyncSession, ids: Iterable[int]) -> List[int]:
+        ids = list(ids)
+        if not ids:
+            return []
+        query = delete(self.model).where(self._id_in(ids)).returning(self.model.id)
+        result = await db.execute(query)
+        return result.scalars().all()
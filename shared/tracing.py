@@ -0,0 +1,442 @@
+"""Request tracing: request IDs across services and sampled span timings.
+
+Every request gets a request ID, taken from X-Request-ID or generated, and
+echoes it back in the response. Pass the header on, and the same ID shows up
+in every service's traces.
+
+A W3C `traceparent` header joins the caller's trace and follows its sampling
+decision. Without one, TRACING_SAMPLE_RATE of requests are traced. A traced
+request records spans for:
+- get_current_user
+- every SQL statement (including the hot queries)
+- template cache lookups
+- response serialization
+
+Spans go to TRACING_EXPORTER from a background thread:
+- file: JSON lines in TRACING_FILE
+- otlp: OTLP/HTTP JSON posted to TRACING_OTLP_ENDPOINT
+- none: the default; only request IDs are handled
+
+Log records carry the request ID as `request_id` ("-" outside requests), added
+by RequestIdFilter; configure_logging() installs it with LOG_FORMAT.
+
+Requests that aren't sampled cost one header lookup. Show a request's spans as
+a tree with:
+
+    python -m shared.tracing traces.jsonl [request_id]
+"""
+import abc
+import argparse
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+# Finished traces waiting for the exporter; more than this are dropped, never waited for
+TRACING_QUEUE_SIZE = int(os.getenv("TRACING_QUEUE_SIZE", "10000"))
+
+# Longest statement text kept on a span
+MAX_STATEMENT_LENGTH = 1000
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """Sets `request_id` on every record, so formats can use %(request_id)s"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get() or "-"
+        return True
+
+
+def configure_logging() -> None:
+    """Root handler with the request ID in LOG_FORMAT; handlers that are already set up get the filter"""
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+    for handler in root.handlers:
+        if not any(isinstance(existing, RequestIdFilter) for existing in handler.filters):
+            handler.addFilter(RequestIdFilter())
+
+
+def _span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, attributes: Dict[str, Any]):
+        self.trace_id = trace_id
+        self.span_id = _span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self.start = time.time_ns()
+        self.end = 0
+
+    def finish(self) -> None:
+        self.end = time.time_ns()
+
+
+class Trace:
+    __slots__ = ("trace_id", "request_id", "spans")
+
+    def __init__(self, trace_id: str, request_id: str):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.spans: List[Span] = []
+
+    def start_span(self, name: str, attributes: Dict[str, Any]) -> Span:
+        parent = _current_span.get()
+        return Span(self.trace_id, parent.span_id if parent else None, name, attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the block as a child of the current span; yields None when the request isn't traced"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        trace.spans.append(current)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    if trace is not None:
+        statement_span = trace.start_span("db.statement", {"db.statement": statement[:MAX_STATEMENT_LENGTH]})
+        conn.info.setdefault("trace_spans", []).append(statement_span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_statement_span(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    if trace is not None and conn.info.get("trace_spans"):
+        statement_span = conn.info["trace_spans"].pop()
+        statement_span.finish()
+        trace.spans.append(statement_span)
+
+
+@event.listens_for(Engine, "handle_error")
+def _fail_statement_span(exception_context):
+    trace = _trace.get()
+    connection = exception_context.connection
+    if trace is not None and connection is not None and connection.info.get("trace_spans"):
+        statement_span = connection.info["trace_spans"].pop()
+        statement_span.error = type(exception_context.original_exception).__name__
+        statement_span.finish()
+        trace.spans.append(statement_span)
+
+
+def span_record(service: str, trace: Trace, record: Span) -> Dict[str, Any]:
+    return {
+        "service": service,
+        "request_id": trace.request_id,
+        "trace_id": record.trace_id,
+        "span_id": record.span_id,
+        "parent_id": record.parent_id,
+        "name": record.name,
+        "start": record.start,
+        "duration_ms": round((record.end - record.start) / 1e6, 3),
+        "attributes": record.attributes,
+        "error": record.error,
+    }
+
+
+class SpanExporter(abc.ABC):
+    """Ships finished traces from a background thread, so requests never wait on I/O"""
+
+    BATCH_SIZE = 512
+
+    def __init__(self, service: str, queue_size: int = TRACING_QUEUE_SIZE):
+        self.service = service
+        self.queue: "queue.Queue[Trace]" = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def submit(self, trace: Trace) -> None:
+        if self.thread is None:
+            self.start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.run, name="trace-exporter", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            batch.extend(self.drain())
+            self.send(batch)
+
+    def drain(self) -> List[Trace]:
+        traces = []
+        while len(traces) < self.BATCH_SIZE:
+            try:
+                traces.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return traces
+
+    def flush(self) -> None:
+        while not self.queue.empty():
+            self.send(self.drain())
+
+    def send(self, traces: List[Trace]) -> None:
+        with self.lock:
+            try:
+                self.export(traces)
+            except Exception:
+                logger.warning("Could not export %d traces", len(traces), exc_info=True)
+
+    @abc.abstractmethod
+    def export(self, traces: List[Trace]) -> None:
+        """Write one batch; runs on the exporter thread"""
+
+
+class FileExporter(SpanExporter):
+    """One JSON object per span, appended to a local file"""
+
+    def __init__(self, service: str, path: str = TRACING_FILE):
+        super().__init__(service)
+        self.path = path
+
+    def export(self, traces: List[Trace]) -> None:
+        lines = [
+            orjson.dumps(span_record(self.service, trace, record))
+            for trace in traces
+            for record in trace.spans
+        ]
+        with open(self.path, "ab") as file:
+            file.write(b"\n".join(lines) + b"\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter(SpanExporter):
+    """OTLP/HTTP with JSON encoding, which any OpenTelemetry collector accepts on :4318"""
+
+    def __init__(self, service: str, endpoint: str = TRACING_OTLP_ENDPOINT):
+        super().__init__(service)
+        self.endpoint = endpoint
+        self.client = httpx.Client(timeout=5.0)
+
+    def otlp_span(self, trace: Trace, record: Span) -> Dict[str, Any]:
+        attributes = {**record.attributes, "request.id": trace.request_id}
+        return {
+            "traceId": record.trace_id,
+            "spanId": record.span_id,
+            "parentSpanId": record.parent_id or "",
+            "name": record.name,
+            # 2 = server for the request itself, 1 = internal
+            "kind": 1 if record.parent_id else 2,
+            "startTimeUnixNano": str(record.start),
+            "endTimeUnixNano": str(record.end),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+            "status": {"code": 2, "message": record.error} if record.error else {},
+        }
+
+    def export(self, traces: List[Trace]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "shared.tracing"},
+                    "spans": [self.otlp_span(trace, record) for trace in traces for record in trace.spans],
+                }],
+            }]
+        }
+        response = self.client.post(
+            self.endpoint, content=orjson.dumps(payload), headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+
+
+def create_exporter(service: str) -> Optional[SpanExporter]:
+    if TRACING_EXPORTER == "file":
+        return FileExporter(service)
+    if TRACING_EXPORTER == "otlp":
+        return OTLPExporter(service)
+    return None
+
+
+def _parse_traceparent(value: bytes):
+    """(trace_id, parent span id, sampled) from `00-<trace id>-<span id>-<flags>`, or None"""
+    parts = value.decode("latin-1").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class TracingMiddleware:
+    """Request IDs for every request; a root span, its children and export for sampled ones"""
+
+    def __init__(self, app, service: str, routes: Optional[Dict[Any, str]] = None):
+        self.app = app
+        self.service = service
+        # endpoint function -> route template, so spans are named like the metrics
+        self.routes = routes or {}
+        self.exporter = create_exporter(service)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming_id = traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                incoming_id = value.decode("latin-1")[:128]
+            elif name == b"traceparent":
+                traceparent = _parse_traceparent(value)
+        rid = incoming_id or uuid.uuid4().hex
+
+        trace = root = None
+        if self.exporter is not None:
+            if traceparent is not None:
+                trace_id, parent_id, sampled = traceparent
+            else:
+                trace_id, parent_id, sampled = uuid.uuid4().hex, None, random.random() < TRACING_SAMPLE_RATE
+            if sampled:
+                trace = Trace(trace_id, rid)
+                root = Span(trace_id, parent_id, scope["method"], {"request.id": rid})
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [*message.get("headers", []), (b"x-request-id", rid.encode("latin-1"))]
+                if trace is not None:
+                    headers.append((b"traceparent", f"00-{trace.trace_id}-{root.span_id}-01".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        rid_token = request_id.set(rid)
+        if trace is None:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                request_id.reset(rid_token)
+            return
+
+        trace_token = _trace.set(trace)
+        span_token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(span_token)
+            _trace.reset(trace_token)
+            request_id.reset(rid_token)
+            root.finish()
+            route = self.routes.get(scope.get("endpoint"), scope["path"])
+            root.name = f"{scope['method']} {route}"
+            root.attributes["http.status_code"] = status
+            trace.spans.append(root)
+            self.exporter.submit(trace)
+
+
+def print_tree(spans: List[Dict[str, Any]]) -> None:
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    span_ids = {record["span_id"] for record in spans}
+    for record in sorted(spans, key=lambda record: record["start"]):
+        # Spans whose parent is in another service's trace start a new root here
+        parent = record["parent_id"] if record["parent_id"] in span_ids else None
+        children.setdefault(parent, []).append(record)
+    started = min(record["start"] for record in spans)
+
+    def show(parent: Optional[str], depth: int) -> None:
+        for record in children.get(parent, []):
+            offset = (record["start"] - started) / 1e6
+            detail = record["attributes"].get("db.statement") or record["attributes"].get("db.query") or ""
+            error = f" !{record['error']}" if record["error"] else ""
+            print(
+                f"{offset:>9.2f} ms {record['duration_ms']:>9.2f} ms  {'  ' * depth}"
+                f"[{record['service']}] {record['name']}{error} {detail[:100]}"
+            )
+            show(record["span_id"], depth + 1)
+
+    show(None, 0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show traced requests from a file written by the file exporter")
+    parser.add_argument("path", nargs="?", default=TRACING_FILE)
+    parser.add_argument("request_id", nargs="?", help="default: the slowest request in the file")
+    args = parser.parse_args()
+
+    requests: Dict[str, List[Dict[str, Any]]] = {}
+    with open(args.path, "rb") as file:
+        for line in file:
+            if line.strip():
+                record = orjson.loads(line)
+                requests.setdefault(record["request_id"], []).append(record)
+    if not requests:
+        raise SystemExit(f"No spans in {args.path}")
+    if args.request_id is None:
+        # The request with the slowest span
+        args.request_id = max(requests, key=lambda rid: max(record["duration_ms"] for record in requests[rid]))
+    if args.request_id not in requests:
+        raise SystemExit(f"Request {args.request_id} is not in {args.path}")
+    print(f"request {args.request_id}")
+    print_tree(requests[args.request_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import httpx
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# Every model, so relationships resolve and create_all knows all tables
+import services.auth.models  # noqa: F401
+import services.hive.models  # noqa: F401
+import services.monitoring.models  # noqa: F401
+import services.notification.models  # noqa: F401
+from services.auth.models import User
+from services.hive.models import Hive
+from shared.database import Base, get_db, get_read_db
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    """SQLite stand-in for Postgres: the schema without partial indexes and row locks"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def register_postgres_builtins(dbapi_connection, connection_record):
+        # hives.geohash is declared with Postgres' byte-ordered "C" collation
+        dbapi_connection.run_async(
+            lambda connection: connection._execute(
+                connection._conn.create_collation, "C", lambda a, b: (a > b) - (a < b)
+            )
+        )
+        # Clamps use least()/greatest(); SQLite only has scalar min()/max()
+        for name, function in (("least", min), ("greatest", max)):
+            dbapi_connection.run_async(
+                lambda connection, name=name, function=function: connection._execute(
+                    connection._conn.create_function, name, -1, function
+                )
+            )
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def user(session_factory):
+    async with session_factory() as db:
+        async with db.begin():
+            user = User(
+                email="keeper@example.com", username="keeper", hashed_password="x" * 60,
+                is_active=True, is_superuser=True,
+            )
+            db.add(user)
+    return user
+
+
+@pytest.fixture
+def client(session_factory, user):
+    """Client for one service's app, on the test database and logged in as `user`"""
+    clients = []
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+            await session.commit()
+
+    def make(module) -> httpx.AsyncClient:
+        module.app.dependency_overrides[get_db] = override_get_db
+        module.app.dependency_overrides[get_read_db] = override_get_db
+        module.app.dependency_overrides[module.user_service.get_current_user] = lambda: user
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=module.app), base_url="http://test")
+        clients.append((module, client))
+        return client
+
+    yield make
+    for module, _ in clients:
+        module.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+async def hive(session_factory, user):
+    async with session_factory() as db:
+        async with db.begin():
+            hive = Hive(
+                name="Hive 1", location="Meadow", status="active", queen_year=2024, frames_count=10,
+                latitude=55.75, longitude=37.62, user_id=user.id,
+            )
+            db.add(hive)
+    return hive
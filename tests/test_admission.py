@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from shared.admission import (
+    ADMIN, BULK, INGESTION, INTERACTIVE, AdaptiveLimit, AdmissionController, AdmissionSettings, admit,
+)
+
+
+def test_slow_response_cuts_its_class_and_every_lower_one():
+    controller = AdmissionController("test", AdmissionSettings())
+    before = {priority: limit.limit for priority, limit in controller.limits.items()}
+
+    controller.record(INTERACTIVE, latency=10.0, failed=False)
+    after = {priority: limit.limit for priority, limit in controller.limits.items()}
+    assert after[INGESTION] == before[INGESTION]
+    for priority in (INTERACTIVE, ADMIN, BULK):
+        assert after[priority] == pytest.approx(max(controller.limits[priority].min_limit, before[priority] * 0.9))
+
+    controller.record(INGESTION, latency=0.0, failed=True)
+    assert controller.limits[INGESTION].limit == pytest.approx(before[INGESTION] * 0.9)
+
+
+def test_limit_is_cut_once_per_target_latency_and_never_below_the_minimum():
+    limit = AdaptiveLimit(min_limit=5, max_limit=100, target_latency=1.0, backoff=0.5)
+    limit.decrease(now=10.0)
+    limit.decrease(now=10.5)
+    assert limit.limit == 50
+    limit.decrease(now=11.0)
+    assert limit.limit == 25
+    for step in range(10):
+        limit.decrease(now=12.0 + step)
+    assert limit.limit == 5
+
+
+def test_on_time_responses_grow_a_busy_limit_back():
+    limit = AdaptiveLimit(min_limit=1, max_limit=10, target_latency=1.0, backoff=0.5)
+    limit.decrease(now=0.0)
+    # Idle: no growth
+    limit.increase()
+    assert limit.limit == 5
+    limit.in_flight = 3
+    limit.increase()
+    assert limit.limit == pytest.approx(5.2)
+
+
+@pytest.fixture
+def blocked_app():
+    """App whose ingestion and interactive routes wait on `release`; one slot each"""
+    app = FastAPI()
+    app.state.release = asyncio.Event()
+
+    @app.post("/measurements/")
+    async def ingest():
+        await app.state.release.wait()
+        return {"ok": True}
+
+    @app.get("/hives/")
+    async def read():
+        await app.state.release.wait()
+        return {"ok": True}
+
+    settings = AdmissionSettings(
+        ingestion_min=1, ingestion_max=1, interactive_min=1, interactive_max=1,
+        ingestion_target_latency=60, interactive_target_latency=60, ingestion_queue_timeout=0.2, retry_after=7,
+    )
+    admit(app.routes, "test", {"POST /measurements/": INGESTION}, settings)
+    return app
+
+
+async def started(client, method, path):
+    task = asyncio.create_task(client.request(method, path))
+    # Let the request take its slot
+    for _ in range(10):
+        await asyncio.sleep(0)
+    return task
+
+
+async def test_full_class_is_shed_with_503_and_retry_after(blocked_app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=blocked_app), base_url="http://test") as client:
+        first = await started(client, "GET", "/hives/")
+        shed = await client.get("/hives/")
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "7"
+
+        blocked_app.state.release.set()
+        assert (await first).status_code == 200
+
+
+async def test_ingestion_waits_for_a_slot_up_to_the_queue_timeout(blocked_app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=blocked_app), base_url="http://test") as client:
+        first = await started(client, "POST", "/measurements/")
+        waited = time.perf_counter()
+        shed = await client.post("/measurements/")
+        assert shed.status_code == 503
+        assert time.perf_counter() - waited >= 0.2
+
+        # A slot freed within the timeout admits the queued request
+        queued = await started(client, "POST", "/measurements/")
+        blocked_app.state.release.set()
+        assert (await first).status_code == 200
+        assert (await queued).status_code == 200
@@ -0,0 +1,22 @@
+from sqlalchemy import event
+
+from shared.database import driver_connection
+
+
+async def test_driver_connection_begins_the_transaction_once(engine, session_factory):
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async with session_factory() as db:
+        # The first statement goes through SQLAlchemy, so its adapter has sent BEGIN
+        first = await driver_connection(await db.connection())
+        assert statements == ["SELECT 1"]
+        assert await driver_connection(await db.connection()) is first
+        assert statements == ["SELECT 1"]
+
+        await db.commit()
+        await driver_connection(await db.connection())
+        assert statements == ["SELECT 1", "SELECT 1"]
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from services.notification import models, schemas
+from services.notification.service import NotificationDigestService, NotificationService
+
+notification_service = NotificationService()
+digest_service = NotificationDigestService()
+
+
+async def test_held_notification_is_not_claimed_before_its_window_closes(session_factory):
+    async with session_factory() as db:
+        async with db.begin():
+            settings = models.NotificationSettings(user_id=1, digest_enabled=True, digest_window_minutes=60)
+            db.add(settings)
+            await db.flush()
+            held = await notification_service.create_notification(
+                db,
+                schemas.NotificationCreate(
+                    template_id=1,
+                    notification_type=models.NotificationType.PUSH,
+                    priority=models.NotificationPriority.MEDIUM,
+                    subject="Hive 1",
+                    body="Humidity is rising",
+                ),
+                user_id=1,
+                settings=settings,
+            )
+
+        async with db.begin():
+            assert held.digest_id is not None
+            assert await db.scalar(
+                select(models.Notification.next_attempt_at).where(models.Notification.id == held.id)
+            ) is None
+            assert await notification_service.claim_pending_notifications(
+                db, models.NotificationPriority.MEDIUM, 10
+            ) == []
+
+        # Close the window: the digest summary becomes due, the item itself stays unclaimable
+        async with db.begin():
+            await db.execute(
+                update(models.NotificationDigest).values(window_end=datetime.utcnow() - timedelta(seconds=1))
+            )
+            assert await digest_service.flush_due_digests(db) == 1
+        async with db.begin():
+            [summary] = await notification_service.claim_pending_notifications(
+                db, models.NotificationPriority.MEDIUM, 10
+            )
+    assert summary.id != held.id
+    assert summary.subject == "1 new notifications"
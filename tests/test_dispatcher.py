@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from services.notification import models
+from services.notification.channels import ChannelBackend, ChannelRegistry, OutboundMessage
+from services.notification.dispatcher import Dispatcher
+from services.notification.retry import CircuitBreaker
+from services.notification.scheduler import NotificationScheduler
+
+
+class ProbeBackend(ChannelBackend):
+    """Checks the database while a message is being sent"""
+
+    def __init__(self, session_factory, sessions):
+        self.session_factory = session_factory
+        self.sessions = sessions
+        self.seen = []
+
+    async def send(self, message: OutboundMessage) -> None:
+        # The dispatcher holds no transaction, so a concurrent mark-read goes through
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(
+                    update(models.Notification)
+                    .where(models.Notification.id == message.notification_id)
+                    .values(is_read=True)
+                )
+            next_attempt_at = await db.scalar(
+                select(models.Notification.next_attempt_at)
+                .where(models.Notification.id == message.notification_id)
+            )
+        self.seen.append(
+            (any(session.in_transaction() for session in self.sessions), next_attempt_at)
+        )
+
+
+async def test_delivery_runs_outside_the_claim_transaction(session_factory):
+    async with session_factory() as db:
+        async with db.begin():
+            db.add(models.Notification(
+                user_id=1,
+                notification_type=models.NotificationType.PUSH,
+                priority=models.NotificationPriority.HIGH,
+                subject="Hive 1",
+                body="Temperature is too high",
+                next_attempt_at=datetime.utcnow() - timedelta(seconds=1),
+            ))
+
+    sessions = []
+
+    def tracked_session():
+        session = session_factory()
+        sessions.append(session)
+        return session
+
+    backend = ProbeBackend(session_factory, sessions)
+    dispatcher = Dispatcher(
+        ChannelRegistry({models.NotificationType.PUSH: backend}),
+        session_factory=tracked_session,
+        lease_seconds=300,
+    )
+    started = datetime.utcnow()
+    assert await dispatcher.run_once() == 1
+
+    [(in_transaction, leased_until)] = backend.seen
+    assert not in_transaction
+    # Leased: another worker won't claim the row while it is being delivered
+    assert leased_until >= started + timedelta(seconds=300)
+
+    async with session_factory() as db:
+        notification = await db.scalar(select(models.Notification))
+    assert notification.is_sent
+    assert notification.is_read
+
+
+def test_lease_outlasts_a_full_batch():
+    dispatcher = Dispatcher(ChannelRegistry({}), batch_size=100, concurrency=20, send_timeout=30, lease_seconds=60)
+    # Five rounds of 20 sends, each up to 30 s
+    assert dispatcher.lease_seconds > 150
+
+
+class ReclaimingBackend(ChannelBackend):
+    """Simulates the lease running out mid-send and another worker taking the row over"""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def send(self, message: OutboundMessage) -> None:
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(
+                    update(models.Notification)
+                    .where(models.Notification.id == message.notification_id)
+                    .values(next_attempt_at=datetime(2030, 1, 1))
+                )
+
+
+async def test_results_are_not_written_after_the_lease_is_lost(session_factory):
+    async with session_factory() as db:
+        async with db.begin():
+            db.add(models.Notification(
+                user_id=1,
+                notification_type=models.NotificationType.PUSH,
+                priority=models.NotificationPriority.HIGH,
+                subject="Hive 1",
+                body="Temperature is too high",
+                next_attempt_at=datetime.utcnow() - timedelta(seconds=1),
+            ))
+
+    dispatcher = Dispatcher(
+        ChannelRegistry({models.NotificationType.PUSH: ReclaimingBackend(session_factory)}),
+        session_factory=session_factory,
+    )
+    assert await dispatcher.run_once() == 1
+
+    async with session_factory() as db:
+        notification = await db.scalar(select(models.Notification))
+    # The new owner's state is left alone
+    assert not notification.is_sent
+    assert notification.next_attempt_at == datetime(2030, 1, 1)
+
+
+def admit_dispatcher(clock):
+    """Dispatcher whose push breaker runs on `clock` and whose recipients get one token"""
+    scheduler = NotificationScheduler(recipient_limit=(0.001, 1.0))
+    dispatcher = Dispatcher(ChannelRegistry({}), scheduler=scheduler)
+    breaker = dispatcher.breakers.breakers[models.NotificationType.PUSH] = CircuitBreaker(
+        failure_threshold=1, reset_timeout=30, clock=clock
+    )
+    return dispatcher, breaker
+
+
+def push(user_id: int) -> models.Notification:
+    return models.Notification(
+        id=user_id, user_id=user_id, notification_type=models.NotificationType.PUSH,
+        priority=models.NotificationPriority.HIGH, subject="Hive 1", body="Swarm alert",
+    )
+
+
+def test_open_breaker_spends_no_rate_limit_tokens():
+    now = [0.0]
+    dispatcher, breaker = admit_dispatcher(lambda: now[0])
+    breaker.record_failure()
+
+    assert dispatcher._admit(push(1)) == 30
+    now[0] = 10
+    assert dispatcher._admit(push(1)) == 20
+    # The recipient's only token is still there for the first real attempt
+    now[0] = 30
+    assert dispatcher._admit(push(1)) == 0.0
+    assert breaker.probe_in_flight
+
+
+def test_deferred_send_gives_the_half_open_probe_back():
+    now = [0.0]
+    dispatcher, breaker = admit_dispatcher(lambda: now[0])
+    assert dispatcher._admit(push(1)) == 0.0
+    breaker.record_failure()
+    now[0] = 30
+
+    # Recipient 1 is out of tokens, so its send is deferred without holding the probe
+    assert dispatcher._admit(push(1)) > 0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.probe_in_flight
+    assert dispatcher._admit(push(2)) == 0.0
+    assert breaker.probe_in_flight
@@ -0,0 +1,53 @@
+from typing import List
+
+import pytest
+
+import services.hive.main as hive_main
+from services.hive import geo, schemas
+
+
+def covered(cells: List[str], latitude: float, longitude: float) -> bool:
+    point = geo.encode(latitude, longitude)
+    return any(point.startswith(cell) for cell in cells)
+
+
+def test_radius_cells_cover_nearby_point():
+    cells = geo.radius_cells(55.75, 37.61, 5)
+    assert covered(cells, 55.76, 37.62)
+    assert not covered(cells, 40.0, -74.0)
+
+
+def test_radius_cells_cross_antimeridian():
+    cells = geo.radius_cells(0.0, 179.99, 10)
+    assert covered(cells, 0.0, -179.99)
+    assert covered(cells, 0.0, 179.95)
+
+
+@pytest.mark.parametrize("latitude, longitude, radius_km, target", [
+    # Across the pole: the other side of the globe is only ~22 km away
+    (89.9, 0.0, 50, (89.9, 179.5)),
+    (-89.9, 10.0, 50, (-89.95, -170.0)),
+    # Radius wider than half the circumference at this latitude
+    (60.0, 0.0, 15000, (60.0, 180.0)),
+])
+def test_radius_cells_cover_every_meridian_when_circle_wraps(latitude, longitude, radius_km, target):
+    cells = geo.radius_cells(latitude, longitude, radius_km)
+    assert geo.haversine_km(latitude, longitude, *target) <= radius_km
+    assert covered(cells, *target)
+
+
+async def test_nearby_hives_come_nearest_first_with_distance(client):
+    hives = client(hive_main)
+    for name, latitude, longitude in [("Far", 55.79, 37.62), ("Near", 55.751, 37.62), ("Away", 40.0, -74.0)]:
+        response = await hives.post("/hives/", json={
+            "name": name, "location": "Meadow", "queen_year": 2024, "frames_count": 10,
+            "latitude": latitude, "longitude": longitude,
+        })
+        assert response.status_code == 200, response.text
+
+    response = await hives.get("/hives/nearby/", params={"latitude": 55.75, "longitude": 37.62, "radius_km": 10})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [hive["name"] for hive in body] == ["Near", "Far"]
+    assert body[0]["distance_km"] == pytest.approx(geo.haversine_km(55.75, 37.62, 55.751, 37.62), rel=1e-6)
+    assert set(body[0]) == set(schemas.HiveNearby.model_fields)
@@ -0,0 +1,52 @@
+"""Hot queries and COPY against PostgreSQL; set TEST_DATABASE_URL (postgresql+asyncpg://...) to run"""
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from shared.database import get_raw_connection
+from shared.hot_queries import HotQuery
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+INSERT = HotQuery("test_insert", "INSERT INTO hot_query_test (value) VALUES ($1) RETURNING id", write=True)
+
+
+@pytest.fixture
+async def pg_engine():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    async with engine.begin() as connection:
+        await connection.execute(text("CREATE TABLE hot_query_test (id serial PRIMARY KEY, value integer)"))
+    yield engine
+    async with engine.begin() as connection:
+        await connection.execute(text("DROP TABLE hot_query_test"))
+    await engine.dispose()
+
+
+async def count(engine) -> int:
+    async with engine.connect() as connection:
+        return await connection.scalar(text("SELECT count(*) FROM hot_query_test"))
+
+
+async def test_rolled_back_session_discards_hot_insert(pg_engine):
+    # The hot insert is the session's first statement, before SQLAlchemy has sent BEGIN itself
+    async with AsyncSession(pg_engine) as db:
+        assert (await INSERT.fetchrow(db, 1)).id
+        await db.rollback()
+    assert await count(pg_engine) == 0
+
+    async with AsyncSession(pg_engine) as db:
+        await INSERT.fetchrow(db, 2)
+        await db.commit()
+    assert await count(pg_engine) == 1
+
+
+async def test_rolled_back_session_discards_copy(pg_engine):
+    async with AsyncSession(pg_engine) as db:
+        raw_connection = await get_raw_connection(db)
+        await raw_connection.copy_records_to_table("hot_query_test", records=[(1,), (2,)], columns=["value"])
+        await db.rollback()
+    assert await count(pg_engine) == 0
@@ -0,0 +1,58 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from shared import metrics
+from shared.query_audit import capture
+
+
+async def test_failed_statements_leave_no_start_times(engine):
+    async with engine.connect() as connection:
+        with capture():
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    await connection.execute(text("SELECT * FROM missing_table"))
+            await connection.execute(text("SELECT 1"))
+        info = (await connection.get_raw_connection()).info
+        assert not info.get("query_started")
+        assert not info.get("query_audit_started")
+
+
+def test_multiprocess_registry_has_the_custom_collectors(monkeypatch, tmp_path):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    names = {family.name for family in metrics._registry().collect()}
+    assert {"db_pool_checked_out", "cache_hits", "smtp_messages"} <= names
+
+
+async def test_queries_outside_routes_count_under_their_own_app(engine):
+    def app_with_startup_query(service: str) -> FastAPI:
+        @asynccontextmanager
+        async def lifespan(app):
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            yield
+
+        app = FastAPI(lifespan=lifespan)
+        metrics.instrument(app, service)
+        return app
+
+    first = app_with_startup_query("first")
+    # Instrumented last, which must not relabel the first app's queries
+    app_with_startup_query("second")
+    labels = {"service": "first", "route": "background"}
+    before = REGISTRY.get_sample_value("db_queries_total", labels) or 0
+
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        pass
+
+    await first({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send)
+    assert REGISTRY.get_sample_value("db_queries_total", labels) == before + 1
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from services.notification import models, schemas
+from services.notification.retry import RetryPolicy
+from services.notification.service import NotificationService
+
+notification_service = NotificationService()
+
+
+@pytest.fixture
+async def notification(session_factory):
+    async with session_factory() as db:
+        async with db.begin():
+            notification = models.Notification(
+                user_id=1,
+                notification_type=models.NotificationType.EMAIL,
+                priority=models.NotificationPriority.HIGH,
+                subject="Hive 1",
+                body="Temperature is too high",
+                next_attempt_at=datetime.utcnow(),
+            )
+            db.add(notification)
+    return notification
+
+
+async def test_failed_delivery_is_scheduled_for_retry(session_factory, notification, query_budget):
+    async with session_factory() as db:
+        async with db.begin():
+            # Lookup, then UPDATE ... RETURNING; no refresh
+            with query_budget(max_queries=2):
+                updated = await notification_service.mark_as_sent(db, notification.id, "timeout")
+    assert updated.attempts == 1
+    assert updated.error_message == "timeout"
+    assert updated.next_attempt_at > datetime.utcnow()
+    assert not updated.is_sent
+
+
+async def test_exhausted_delivery_is_dead_lettered(session_factory, notification):
+    async with session_factory() as db:
+        async with db.begin():
+            updated = await notification_service.mark_as_sent(
+                db, notification.id, "mailbox full", RetryPolicy(max_attempts=1)
+            )
+        assert updated.next_attempt_at is None
+        assert await db.scalar(select(func.count()).select_from(models.NotificationDeadLetter)) == 1
+
+
+async def create_notifications(session_factory, user_id, kinds):
+    ids = []
+    async with session_factory() as db:
+        async with db.begin():
+            for notification_type, priority in kinds:
+                created = await notification_service.create_notification(db, schemas.NotificationCreate(
+                    template_id=1, notification_type=notification_type, priority=priority,
+                    subject="Hive 1", body="Swarm alert",
+                ), user_id)
+                ids.append(created.id)
+    return ids
+
+
+async def counts(session_factory, user_id):
+    async with session_factory() as db:
+        return await notification_service.counter_service.get_counts(db, user_id)
+
+
+async def test_counters_follow_mark_one_and_mark_all_read(session_factory, query_budget):
+    email, push = models.NotificationType.EMAIL, models.NotificationType.PUSH
+    high, low = models.NotificationPriority.HIGH, models.NotificationPriority.LOW
+    ids = await create_notifications(session_factory, 1, [(email, high), (email, high), (push, low), (push, high)])
+    await create_notifications(session_factory, 2, [(email, high)])
+    assert (await counts(session_factory, 1))["unread"] == 4
+
+    async with session_factory() as db:
+        async with db.begin():
+            # UPDATE ... RETURNING, then one counter upsert
+            with query_budget(max_queries=2):
+                assert await notification_service.mark_as_read(db, 1, notification_id=ids[0]) == 1
+            assert await notification_service.mark_as_read(db, 1, notification_id=ids[0]) == 0
+    assert await counts(session_factory, 1) == {
+        "unread": 3, "by_type": {email: 1, push: 2}, "by_priority": {high: 2, low: 1},
+    }
+
+    async with session_factory() as db:
+        async with db.begin():
+            assert await notification_service.mark_as_read(db, 1, up_to_id=ids[2]) == 2
+            assert (await notification_service.counter_service.get_counts(db, 1))["by_type"] == {push: 1}
+            assert await notification_service.mark_as_read(db, 1) == 1
+    assert (await counts(session_factory, 1))["unread"] == 0
+    # Someone else's counters are untouched
+    assert (await counts(session_factory, 2))["unread"] == 1
+
+
+async def test_mark_read_recreates_a_missing_counter_row(session_factory):
+    email, high = models.NotificationType.EMAIL, models.NotificationPriority.HIGH
+    await create_notifications(session_factory, 1, [(email, high), (email, high)])
+    async with session_factory() as db:
+        async with db.begin():
+            await db.execute(delete(models.NotificationCounter))
+        async with db.begin():
+            # Counted by the notifications actually marked, not by the counter rows found
+            assert await notification_service.mark_as_read(db, 1) == 2
+        rows = (await db.execute(select(models.NotificationCounter))).scalars().all()
+    assert [(row.user_id, row.notification_type, row.unread) for row in rows] == [(1, email, 0)]
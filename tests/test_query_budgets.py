@@ -0,0 +1,167 @@
+"""Statements per write endpoint: one INSERT/UPDATE ... RETURNING, no refresh SELECT"""
+import pytest
+
+import services.auth.main as auth_main
+import services.hive.main as hive_main
+import services.monitoring.main as monitoring_main
+import services.notification.main as notification_main
+from services.monitoring.models import Alert, Sensor
+from services.notification.models import NotificationTemplate
+
+
+@pytest.fixture
+async def sensor(session_factory, hive):
+    async with session_factory() as db:
+        async with db.begin():
+            sensor = Sensor(name="Brood", sensor_type="temperature", hive_id=hive.id, user_id=hive.user_id)
+            db.add(sensor)
+    return sensor
+
+
+@pytest.fixture
+async def alert(session_factory, sensor):
+    async with session_factory() as db:
+        async with db.begin():
+            alert = Alert(
+                alert_type="temperature", message="Too hot", sensor_id=sensor.id, hive_id=sensor.hive_id,
+                user_id=sensor.user_id,
+            )
+            db.add(alert)
+    return alert
+
+
+@pytest.fixture
+async def template(session_factory):
+    async with session_factory() as db:
+        async with db.begin():
+            template = NotificationTemplate(
+                name="alert", subject="Alert", body="{{ alert.message }}", notification_type="email",
+            )
+            db.add(template)
+    return template
+
+
+async def test_update_user(client, user, query_budget):
+    auth = client(auth_main)
+    with query_budget(max_queries=1):
+        response = await auth.put(f"/users/{user.id}", json={"username": "beekeeper"})
+    assert response.status_code == 200, response.text
+    assert response.json()["username"] == "beekeeper"
+
+
+async def test_create_hive(client, query_budget):
+    hives = client(hive_main)
+    with query_budget(max_queries=1):
+        response = await hives.post("/hives/", json={
+            "name": "Hive 2", "location": "Orchard", "queen_year": 2025, "frames_count": 8,
+            "latitude": 55.7, "longitude": 37.6,
+        })
+    assert response.status_code == 200, response.text
+    assert response.json()["id"]
+
+
+async def test_update_hive(client, hive, query_budget):
+    hives = client(hive_main)
+    # Ownership check, then UPDATE ... RETURNING
+    with query_budget(max_queries=2):
+        response = await hives.put(f"/hives/{hive.id}", json={"frames_count": 12})
+    assert response.status_code == 200, response.text
+    assert response.json()["frames_count"] == 12
+
+
+async def test_create_inspection(client, hive, query_budget):
+    hives = client(hive_main)
+    with query_budget(max_queries=2):
+        response = await hives.post("/inspections/", json={
+            "hive_id": hive.id, "temperature": 34.5, "humidity": 60.0, "weight": 42.0,
+        })
+    assert response.status_code == 200, response.text
+
+
+async def test_create_sensor(client, hive, query_budget):
+    monitoring = client(monitoring_main)
+    with query_budget(max_queries=1):
+        response = await monitoring.post("/sensors/", json={
+            "name": "Brood", "sensor_type": "temperature", "hive_id": hive.id,
+        })
+    assert response.status_code == 200, response.text
+
+
+async def test_create_measurement(client, sensor, query_budget):
+    monitoring = client(monitoring_main)
+    # The hottest write: ownership check, then INSERT ... RETURNING
+    with query_budget(max_queries=2):
+        response = await monitoring.post("/measurements/", json={
+            "sensor_id": sensor.id, "value": 34.5, "battery_level": 90.0,
+        })
+    assert response.status_code == 200, response.text
+    assert response.json()["id"]
+
+
+async def test_create_alert(client, sensor, query_budget):
+    monitoring = client(monitoring_main)
+    with query_budget(max_queries=2):
+        response = await monitoring.post("/alerts/", json={
+            "alert_type": "temperature", "message": "Too hot", "sensor_id": sensor.id, "hive_id": sensor.hive_id,
+        })
+    assert response.status_code == 200, response.text
+    assert response.json()["id"]
+
+
+async def test_resolve_alert(client, alert, query_budget):
+    monitoring = client(monitoring_main)
+    # Ownership check is part of the UPDATE ... RETURNING
+    with query_budget(max_queries=1):
+        response = await monitoring.put(f"/alerts/{alert.id}/resolve/")
+    assert response.status_code == 200, response.text
+    assert response.json()["is_resolved"] is True
+
+
+async def test_create_sensors_in_bulk(client, hive, query_budget):
+    monitoring = client(monitoring_main)
+    # One multi-row INSERT ... RETURNING however many sensors
+    with query_budget(max_queries=1):
+        response = await monitoring.post("/sensors/bulk/", json=[
+            {"name": f"Frame {i}", "sensor_type": "weight", "hive_id": hive.id} for i in range(20)
+        ])
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 20
+
+
+async def test_create_and_update_template(client, query_budget):
+    notifications = client(notification_main)
+    with query_budget(max_queries=1):
+        response = await notifications.post("/templates/", json={
+            "name": "alert", "subject": "Alert", "body": "{{ alert.message }}", "notification_type": "email",
+        })
+    assert response.status_code == 200, response.text
+
+    with query_budget(max_queries=1):
+        response = await notifications.put(f"/templates/{response.json()['id']}", json={"subject": "Hive alert"})
+    assert response.status_code == 200, response.text
+    assert response.json()["subject"] == "Hive alert"
+
+
+async def test_create_notification(client, template, query_budget):
+    notifications = client(notification_main)
+    # Template and settings lookups, INSERT ... RETURNING, counter upsert
+    with query_budget(max_queries=4):
+        response = await notifications.post("/notifications/", json={
+            "template_id": template.id, "notification_type": "email", "priority": "high",
+            "subject": "Alert", "body": "Too hot",
+        })
+    assert response.status_code == 200, response.text
+    assert response.json()["id"]
+
+
+async def test_create_and_update_settings(client, query_budget):
+    notifications = client(notification_main)
+    # Existing-settings check, then INSERT ... RETURNING
+    with query_budget(max_queries=2):
+        response = await notifications.post("/settings/", json={"email_address": "keeper@example.com"})
+    assert response.status_code == 200, response.text
+
+    with query_budget(max_queries=1):
+        response = await notifications.put("/settings/me/", json={"digest_enabled": True})
+    assert response.status_code == 200, response.text
+    assert response.json()["digest_enabled"] is True
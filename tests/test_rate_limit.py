@@ -0,0 +1,122 @@
+import logging
+import socket
+import time
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+import services.monitoring.main as monitoring_main
+from services.auth.models import User
+from shared import rate_limit
+from shared.rate_limit import RateLimiter
+
+LIMITS = {"free": (1.0, 2.0)}
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Every limiter created in the test shares one in-memory Redis"""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        rate_limit.aioredis, "from_url", lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server)
+    )
+    return server
+
+
+def closed_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def test_workers_share_buckets_through_redis(redis_server):
+    first = RateLimiter("user", LIMITS, redis_url="redis://redis")
+    second = RateLimiter("user", LIMITS, redis_url="redis://redis")
+
+    assert await first.acquire("free", 1) == 0.0
+    assert await second.acquire("free", 1) == 0.0
+    assert await first.acquire("free", 1) > 0.0
+    assert await second.acquire("free", 2) == 0.0
+
+
+async def test_usage_reads_every_key_in_one_pipeline(redis_server):
+    limiter = RateLimiter("sensor", LIMITS, redis_url="redis://redis")
+    await limiter.acquire("free", (1, 10))
+    calls = []
+    execute = fakeredis.FakeAsyncRedis.execute_command
+
+    async def counting_execute(self, *args, **kwargs):
+        calls.append(args[0])
+        return await execute(self, *args, **kwargs)
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(fakeredis.FakeAsyncRedis, "execute_command", counting_execute)
+        usage = await limiter.usage("free", [(1, 10), (1, 11), (1, 12)])
+
+    assert usage == pytest.approx([1.0, 2.0, 2.0], abs=0.1)
+    # Queued on the pipeline, not sent one by one
+    assert calls == []
+
+
+async def test_unreachable_redis_falls_back_and_cools_down(caplog):
+    limiter = RateLimiter("user", LIMITS, redis_url=f"redis://127.0.0.1:{closed_port()}", redis_cooldown=60)
+    attempts = 0
+    take_script = limiter.take_script
+
+    async def counting_take_script(**kwargs):
+        nonlocal attempts
+        attempts += 1
+        return await take_script(**kwargs)
+
+    limiter.take_script = counting_take_script
+    started = time.perf_counter()
+    with caplog.at_level(logging.WARNING, logger=rate_limit.__name__):
+        assert await limiter.acquire("free", 1) == 0.0
+        assert await limiter.acquire("free", 1) == 0.0
+        assert await limiter.acquire("free", 1) > 0.0
+        assert await limiter.usage("free", [1, 2]) == pytest.approx([0.0, 2.0], abs=0.1)
+
+    assert time.perf_counter() - started < 1.0
+    # Only the first call went to Redis; the rest used local buckets during the cool-down
+    assert attempts == 1
+    assert len(caplog.records) == 1
+    await limiter.redis.aclose()
+
+
+async def test_redis_is_retried_after_the_cool_down(redis_server):
+    limiter = RateLimiter("user", LIMITS, redis_url="redis://redis", redis_cooldown=60)
+    limiter.redis_retry_at = time.monotonic() + 60
+    await limiter.acquire("free", 1)
+    assert await limiter.redis.keys("ratelimit:*") == []
+
+    limiter.redis_retry_at = 0.0
+    await limiter.acquire("free", 1)
+    assert await limiter.redis.keys("ratelimit:*") == [b"ratelimit:user:free:1"]
+
+
+@pytest.mark.parametrize("redis_url", [None, "redis://redis"])
+async def test_refund_returns_a_token_up_to_the_burst(redis_server, redis_url):
+    limiter = RateLimiter("user", LIMITS, redis_url=redis_url)
+    await limiter.refund("free", 1)
+    assert await limiter.usage("free", [1]) == pytest.approx([2.0], abs=0.1)
+
+    await limiter.acquire("free", 1)
+    await limiter.acquire("free", 1)
+    await limiter.refund("free", 1)
+    assert await limiter.acquire("free", 1) == 0.0
+    assert await limiter.acquire("free", 1) > 0.0
+
+
+async def test_refused_ingestion_leaves_the_sensor_budget_alone(monkeypatch):
+    monkeypatch.setattr(monitoring_main, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(monitoring_main, "user_rate_limit", RateLimiter("user", {"free": (0.001, 1.0)}))
+    monkeypatch.setattr(monitoring_main, "sensor_rate_limit", RateLimiter("sensor", {"free": (0.001, 1.0)}))
+    user = User(id=1, plan="free")
+
+    await monitoring_main.check_ingestion_rate(user, 10)
+    with pytest.raises(HTTPException) as refused:
+        await monitoring_main.check_ingestion_rate(user, 11)
+    assert refused.value.status_code == 429
+    # Sensor 11's only token was given back when the user bucket said no
+    assert await monitoring_main.sensor_rate_limit.usage("free", [(1, 11)]) == pytest.approx([1.0], abs=0.01)
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from services.notification import models, retry
+from services.notification.retry import CircuitBreaker, RetryPolicy
+from services.notification.service import NotificationService
+
+
+@pytest.mark.parametrize("attempts, ceiling", [(1, 30), (2, 60), (3, 120), (5, 480), (8, 1000), (30, 1000)])
+def test_backoff_grows_exponentially_up_to_the_cap(attempts, ceiling):
+    policy = RetryPolicy(max_attempts=50, base_delay=30, max_delay=1000)
+    delays = [policy.delay(attempts) for _ in range(500)]
+    # Jitter never goes below half the base delay, nor above the exponential ceiling
+    assert min(delays) >= 15
+    assert max(delays) <= ceiling
+    assert max(delays) > ceiling * 0.8
+
+
+def test_exhausted_after_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    assert not policy.exhausted(2)
+    assert policy.exhausted(3)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=lambda: now[0])
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.acquire()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.acquire()
+    now[0] = 20
+    assert breaker.retry_after() == 10
+
+    # After the timeout exactly one probe goes through
+    now[0] = 30
+    assert breaker.acquire()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.acquire()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+    assert breaker.acquire()
+
+
+def test_failed_probe_reopens_the_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 30
+    assert breaker.acquire()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after() == 30
+
+
+async def test_notification_is_dead_lettered_after_max_attempts(session_factory):
+    notification_service = NotificationService()
+    async with session_factory() as db:
+        async with db.begin():
+            notification = models.Notification(
+                user_id=1,
+                notification_type=models.NotificationType.SMS,
+                priority=models.NotificationPriority.MEDIUM,
+                subject="Hive 1",
+                body="Swarm alert",
+                next_attempt_at=datetime.utcnow(),
+            )
+            db.add(notification)
+
+    for attempt in range(1, retry.MAX_ATTEMPTS + 1):
+        async with session_factory() as db:
+            async with db.begin():
+                current = await notification_service.get(db, notification.id)
+                dead = await notification_service.record_failures(db, [(current, "gateway timeout", False)])
+        assert dead == (1 if attempt == retry.MAX_ATTEMPTS else 0)
+
+    async with session_factory() as db:
+        current = await notification_service.get(db, notification.id)
+        [dead_letter] = (await db.execute(select(models.NotificationDeadLetter))).scalars().all()
+    assert current.attempts == retry.MAX_ATTEMPTS
+    assert current.next_attempt_at is None
+    assert dead_letter.notification_id == notification.id
+    assert dead_letter.attempts == retry.MAX_ATTEMPTS
+    assert dead_letter.last_error == "gateway timeout"
+
+
+async def test_permanent_failure_is_dead_lettered_at_once(session_factory):
+    notification_service = NotificationService()
+    async with session_factory() as db:
+        async with db.begin():
+            notification = models.Notification(
+                user_id=1,
+                notification_type=models.NotificationType.EMAIL,
+                priority=models.NotificationPriority.LOW,
+                subject="Hive 1",
+                body="Weekly report",
+                next_attempt_at=datetime.utcnow(),
+            )
+            db.add(notification)
+        async with db.begin():
+            assert await notification_service.record_failures(db, [(notification, "no such mailbox", True)]) == 1
@@ -0,0 +1,16 @@
+from services.notification.models import NotificationType
+from services.notification.scheduler import NotificationScheduler
+
+
+def test_quotas_are_split_across_replicas(monkeypatch):
+    monkeypatch.setenv("EMAIL_RATE", "50")
+    monkeypatch.setenv("EMAIL_BURST", "100")
+    single = NotificationScheduler.from_env(replicas=1).channel_buckets[NotificationType.EMAIL]
+    shared = NotificationScheduler.from_env(replicas=4).channel_buckets[NotificationType.EMAIL]
+    assert (single.rate, single.burst) == (50.0, 100.0)
+    assert (shared.rate, shared.burst) == (12.5, 25.0)
+
+
+def test_split_burst_still_admits_one_message():
+    scheduler = NotificationScheduler.from_env(replicas=1000)
+    assert scheduler.acquire(NotificationType.SMS, user_id=1) == 0.0
@@ -0,0 +1,96 @@
+"""BaseService bulk helpers on SQLite; Postgres-only array filters are checked as compiled SQL"""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from services.hive.models import Hive
+from shared import service
+from shared.query_audit import capture
+from shared.service import BaseService
+
+
+class HiveService(BaseService[Hive]):
+    def __init__(self):
+        super().__init__(Hive)
+
+    def _id_in(self, ids):
+        # SQLite has no arrays
+        return self.model.id.in_(list(ids))
+
+
+def hive_rows(user, count, **values):
+    return [
+        {"name": f"Hive {i}", "status": "active", "queen_year": 2024, "frames_count": 10, "user_id": user.id, **values}
+        for i in range(count)
+    ]
+
+
+def test_ids_are_one_array_parameter_on_postgres():
+    query = select(Hive.id).where(BaseService(Hive)._id_in(range(5000)))
+    compiled = query.compile(dialect=postgresql.dialect())
+    assert "= ANY (" in str(compiled)
+    assert len(compiled.params) == 1
+
+
+def test_chunks_stay_under_the_bind_parameter_limit(monkeypatch):
+    # 2 given columns plus every table column that may get a default
+    per_row = 2 + len(Hive.__table__.columns)
+    monkeypatch.setattr(service, "MAX_BIND_PARAMS", per_row * 10 + 1)
+    rows = [{"name": "Hive", "frames_count": 10}] * 25
+    hive_service = HiveService()
+    assert [len(chunk) for chunk in hive_service._chunks(rows)] == [10, 10, 5]
+    assert list(hive_service._chunks([])) == []
+
+
+async def test_create_many_inserts_one_statement_per_chunk(session_factory, user, monkeypatch):
+    monkeypatch.setattr(service, "MAX_BIND_PARAMS", 200)
+    hive_service = HiveService()
+    rows = hive_rows(user, 50)
+    async with session_factory() as db:
+        with capture() as audit:
+            hives = await hive_service.create_many(db, rows)
+        await db.commit()
+    assert [hive.name for hive in hives] == [row["name"] for row in rows]
+    assert len(audit.records) == len(list(hive_service._chunks(rows))) > 1
+
+
+async def test_get_many_and_delete_many_return_what_they_touched(session_factory, user):
+    hive_service = HiveService()
+    async with session_factory() as db:
+        hives = await hive_service.create_many(db, hive_rows(user, 3))
+        ids = [hive.id for hive in hives]
+        assert [hive.id for hive in await hive_service.get_many(db, reversed(ids))] == ids
+        assert await hive_service.get_many(db, []) == []
+
+        # DELETE ... RETURNING reports only the rows that were there
+        assert sorted(await hive_service.delete_many(db, [ids[0], ids[2], 999])) == [ids[0], ids[2]]
+        assert await hive_service.delete_many(db, []) == []
+        assert [hive.id for hive in await hive_service.get_many(db, ids)] == [ids[1]]
+
+
+async def test_update_many_refuses_an_empty_filter(session_factory, user):
+    hive_service = HiveService()
+    async with session_factory() as db:
+        await hive_service.create_many(db, hive_rows(user, 2))
+        with pytest.raises(ValueError):
+            await hive_service.update_many(db, [], {"frames_count": 0})
+        updated = await hive_service.update_many(db, [Hive.user_id == user.id], {"frames_count": 12})
+    assert [hive.frames_count for hive in updated] == [12, 12]
+
+
+async def test_upsert_many_collapses_duplicate_keys(session_factory, user):
+    hive_service = HiveService()
+    async with session_factory() as db:
+        [hive] = await hive_service.create_many(db, hive_rows(user, 1))
+        rows = [
+            {"id": hive.id, "name": "Renamed", "frames_count": 8},
+            {"id": hive.id, "name": "Renamed again", "frames_count": 9},
+            {"id": hive.id + 1, "name": "New", "frames_count": 6},
+        ]
+        # One statement may not update a row twice; the last duplicate wins
+        upserted = await hive_service.upsert_many(db, rows)
+        assert sorted((hive.name, hive.frames_count) for hive in upserted) == [("New", 6), ("Renamed again", 9)]
+
+        untouched = await hive_service.upsert_many(db, [{"id": hive.id, "name": "Ignored"}], update_columns=())
+        assert untouched == []
+        assert (await hive_service.get(db, hive.id)).name == "Renamed again"
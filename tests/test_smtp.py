@@ -0,0 +1,166 @@
+import asyncio
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from services.notification.channels import DeliveryError, OutboundMessage
+from services.notification.models import NotificationPriority, NotificationType
+from services.notification.smtp import SMTPConnectionPool, SMTPEmailBackend
+from shared.metrics import SMTPPoolCollector
+
+
+class Mailbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("nobody@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if "slow@example.com" in envelope.rcpt_tos:
+            await asyncio.sleep(1)
+        if "busy@example.com" in envelope.rcpt_tos:
+            return "451 Try again later"
+        self.messages.append((session.peer, envelope.rcpt_tos))
+        return "250 Message accepted"
+
+
+class SMTPServer:
+    """aiosmtpd on a free local port; restart() drops every open session"""
+
+    def __init__(self):
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.mailbox = Mailbox()
+        self.controller = None
+
+    def start(self) -> None:
+        self.controller = Controller(self.mailbox, hostname="127.0.0.1", port=self.port)
+        self.controller.start()
+
+    def stop(self) -> None:
+        self.controller.stop()
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+async def backend(smtp_server):
+    pool = SMTPConnectionPool(hostname="127.0.0.1", port=smtp_server.port, max_size=2, timeout=5)
+    backend = SMTPEmailBackend(pool, sender="hive@example.com")
+    yield backend
+    await backend.close()
+
+
+def message(recipient: str, notification_id: int = 1) -> OutboundMessage:
+    return OutboundMessage(
+        notification_id=notification_id,
+        user_id=1,
+        notification_type=NotificationType.EMAIL,
+        priority=NotificationPriority.HIGH,
+        subject="Hive 1",
+        body="Temperature is too high",
+        recipient=recipient,
+    )
+
+
+async def test_connection_is_reused(smtp_server, backend):
+    mailbox = smtp_server.mailbox
+    for notification_id in range(3):
+        await backend.send(message("keeper@example.com", notification_id))
+
+    stats = backend.pool.stats()
+    assert len(mailbox.messages) == 3
+    # One SMTP session carried every message
+    assert len({peer for peer, _ in mailbox.messages}) == 1
+    assert [connection["messages"] for connection in stats["idle"]] == [3]
+    assert stats["totals"]["messages"] == 3
+    assert stats["recycled"] == {}
+
+
+async def test_reconnects_after_the_server_drops_the_connection(smtp_server, backend):
+    mailbox = smtp_server.mailbox
+    await backend.send(message("keeper@example.com"))
+    smtp_server.restart()
+    # Let the client notice the closed socket
+    for _ in range(50):
+        if not backend.pool.idle[0].is_connected:
+            break
+        await asyncio.sleep(0.01)
+
+    await backend.send(message("keeper@example.com", 2))
+
+    stats = backend.pool.stats()
+    assert len(mailbox.messages) == 2
+    assert stats["recycled"] == {"disconnected": 1}
+    assert [connection["connection_id"] for connection in stats["idle"]] == [2]
+    assert stats["totals"]["messages"] == 2
+
+
+async def test_refused_recipient_is_permanent_and_keeps_the_connection(backend):
+    with pytest.raises(DeliveryError) as error:
+        await backend.send(message("nobody@example.com"))
+    assert error.value.permanent
+
+    stats = backend.pool.stats()
+    assert len(stats["idle"]) == 1
+    assert stats["recycled"] == {}
+
+
+async def test_transient_failure_discards_the_connection(smtp_server, backend):
+    mailbox = smtp_server.mailbox
+    with pytest.raises(DeliveryError) as error:
+        await backend.send(message("busy@example.com"))
+    assert not error.value.permanent
+
+    stats = backend.pool.stats()
+    assert stats["idle"] == [] and stats["active"] == []
+    assert stats["recycled"] == {"error": 1}
+    assert stats["totals"]["failures"] == 1
+
+    await backend.send(message("keeper@example.com", 2))
+    assert len(mailbox.messages) == 1
+
+
+async def test_cancelled_send_discards_the_connection(smtp_server, backend):
+    # The dispatcher's send timeout cancels the send in the middle of DATA
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(backend.send(message("slow@example.com")), 0.2)
+
+    stats = backend.pool.stats()
+    assert stats["idle"] == [] and stats["active"] == []
+    assert stats["recycled"] == {"error": 1}
+
+    await backend.send(message("keeper@example.com", 2))
+    assert smtp_server.mailbox.messages[-1][1] == ["keeper@example.com"]
+
+
+async def test_collector_exports_pool_stats(backend):
+    await backend.send(message("keeper@example.com"))
+    collector = SMTPPoolCollector()
+    collector.pools["email"] = backend.pool
+
+    samples = {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in collector.collect()
+        for sample in family.samples
+    }
+    assert samples[("smtp_pool_connections", (("pool", "email"), ("state", "idle")))] == 1
+    assert samples[("smtp_messages_total", (("pool", "email"),))] == 1
+    assert samples[("smtp_sent_bytes_total", (("pool", "email"),))] > 0
+    assert samples[("smtp_connection_messages_per_second", (("connection", "1"), ("pool", "email")))] > 0
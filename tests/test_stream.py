@@ -0,0 +1,13 @@
+from services.notification.main import _resync_events
+from services.notification.stream import RESYNC_FRAME, StreamHub, StreamPublisher
+
+
+async def test_broadcast_recipients_get_a_resync_event():
+    hub = StreamHub()
+    subscriber = hub.subscribe(1)
+    publisher = StreamPublisher(hub, redis_url=None)
+
+    await publisher.publish_many(_resync_events([1, 2]))
+
+    assert subscriber.queue.get_nowait() == RESYNC_FRAME
+    assert subscriber.queue.empty()
@@ -0,0 +1,67 @@
+import enum
+from datetime import datetime
+from types import SimpleNamespace
+
+from services.notification import models
+from services.notification.templating import CompiledTemplate, TemplateCache, row_to_context
+
+
+def template(id=1, subject="{{ hive.name }}", body="Temperature {{ sensor.value }}", updated_at=None):
+    return SimpleNamespace(
+        id=id, subject=subject, body=body, created_at=datetime(2025, 5, 1), updated_at=updated_at
+    )
+
+
+def test_compiler_splits_literals_and_placeholders():
+    compiled = CompiledTemplate("Hive {{hive.name}}: {{ alert.message }}!")
+    assert compiled.parts == ["Hive ", ("hive", "name"), ": ", ("alert", "message"), "!"]
+    assert compiled.placeholders == {"hive.name", "alert.message"}
+    assert CompiledTemplate("No placeholders").parts == ["No placeholders"]
+    assert CompiledTemplate("").parts == []
+
+
+def test_render_formats_values():
+    class Level(enum.Enum):
+        HIGH = "high"
+
+    compiled = CompiledTemplate("{{ a }} {{ b }} {{ c }} {{ d.e }}")
+    context = {"a": 35.50, "b": Level.HIGH, "c": datetime(2025, 5, 1, 9, 30, 15), "d": {"e": 7}}
+    assert compiled.render(context) == "35.5 high 2025-05-01 09:30 7"
+
+
+def test_missing_placeholders_render_empty():
+    compiled = CompiledTemplate("[{{ hive.name }}][{{ sensor.value }}][{{ hive.name.first }}][{{ none }}]")
+    assert compiled.render({"hive": {"name": "Hive 1"}, "none": None}) == "[Hive 1][][][]"
+    assert compiled.render({}) == "[][][][]"
+    # Malformed placeholders are left as text
+    assert CompiledTemplate("{{ 1bad }} {{}}").render({}) == "{{ 1bad }} {{}}"
+
+
+def test_cache_reuses_until_updated_at_changes():
+    cache = TemplateCache()
+    first = cache.get(template())
+    assert cache.get(template()) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    edited = cache.get(template(subject="Edited {{ hive.name }}", updated_at=datetime(2025, 5, 2)))
+    assert edited is not first
+    assert edited.render({"hive": {"name": "Hive 1"}}) == ("Edited Hive 1", "Temperature ")
+    assert cache.get(template(updated_at=datetime(2025, 5, 2))) is edited
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TemplateCache(max_size=2)
+    cache.get(template(id=1))
+    cache.get(template(id=2))
+    cache.get(template(id=1))
+    cache.get(template(id=3))
+    assert list(cache.entries) == [1, 3]
+
+
+def test_row_to_context_copies_column_values():
+    row = models.NotificationTemplate(id=3, name="alert", subject="Alert", body="Body")
+    context = row_to_context(row)
+    assert context["name"] == "alert"
+    assert set(context) == {column.key for column in models.NotificationTemplate.__table__.columns}
+    assert row_to_context(None) == {}
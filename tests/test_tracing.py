@@ -0,0 +1,51 @@
+import io
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from shared.tracing import LOG_FORMAT, RequestIdFilter, SpanExporter, TracingMiddleware
+
+logger = logging.getLogger("tests.tracing")
+
+
+@pytest.fixture
+def log_output():
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RequestIdFilter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield output
+    logger.removeHandler(handler)
+
+
+async def test_log_records_carry_the_request_id(log_output):
+    app = FastAPI()
+
+    @app.get("/hives/")
+    async def read_hives():
+        logger.info("listing hives")
+        return []
+
+    app.add_middleware(TracingMiddleware, service="hive")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/hives/", headers={"X-Request-ID": "req-42"})
+
+    assert response.headers["x-request-id"] == "req-42"
+    assert "[req-42] listing hives" in log_output.getvalue()
+
+
+def test_records_outside_requests_get_a_placeholder(log_output):
+    logger.info("startup")
+    assert "[-] startup" in log_output.getvalue()
+
+
+def test_exporters_must_implement_export():
+    class Incomplete(SpanExporter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("hive")